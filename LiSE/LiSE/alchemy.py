@@ -536,6 +536,12 @@ def queries(table):
             if branch in key and turn in key and tick in key:
                 key = [branch, turn, tick]
         r[t.name + '_dump'] = select(list(t.c.values())).order_by(*key)
+        if 'branch' in t.columns and 'turn' in t.columns:
+            r[t.name + '_load_window'] = select(list(t.c.values())).where(and_(
+                t.c.branch == bindparam('branch'),
+                t.c.turn >= bindparam('turn_from'),
+                t.c.turn < bindparam('turn_to')
+            )).order_by(*key)
         r[t.name + '_insert'] = t.insert().values(tuple(bindparam(cname) for cname in t.c.keys()))
         r[t.name + '_count'] = select([func.COUNT('*')]).select_from(t)
 
@@ -547,6 +553,13 @@ def queries(table):
         table['avatars'].c.character_graph == bindparam('character')
     )
     things = table['things']
+    r['things_history'] = select([things.c.turn, things.c.tick, things.c.location]).where(and_(
+        things.c.character == bindparam('character'),
+        things.c.thing == bindparam('thing'),
+        things.c.branch == bindparam('branch'),
+        things.c.turn >= bindparam('turn_from'),
+        things.c.turn < bindparam('turn_to')
+    )).order_by(things.c.turn, things.c.tick)
     r['del_things_after'] = things.delete().where(and_(
         things.c.character == bindparam('character'),
         things.c.thing == bindparam('thing'),
@@ -373,12 +373,71 @@ class ORM(object):
         indicating whether a node or edge exists.
 
         """
-        from functools import partial
         if turn_from == turn_to:
             return self.get_turn_delta(branch, turn_from, tick_from, tick_to)
         delta = {}
+        self._window_delta(delta, branch, turn_from, tick_from, turn_to, tick_to)
+        return delta
+
+    def get_branch_delta(self, branch_from, turn_from, tick_from, branch_to, turn_to, tick_to):
+        """Get a dictionary describing the changes from one time to another.
+
+        The times may be in different branches. Then I'll undo the changes
+        back to where the branches diverged, and apply those from there
+        to ``branch_to``.
+
+        The delta is in the same format as that of ``get_delta``.
+
+        """
+        delta = {}
+        for window in self._branch_windows(
+                branch_from, turn_from, tick_from, branch_to, turn_to, tick_to):
+            self._window_delta(delta, *window)
+        return delta
+
+    def _branch_windows(self, branch_from, turn_from, tick_from, branch_to, turn_to, tick_to):
+        """Private use. Return a list of windows of time, each as a tuple
+        ``(branch, turn_from, tick_from, turn_to, tick_to)``, that lead from
+        one time to the other by way of the branches' common ancestor.
+
+        """
+        lineage_from = list(self._iter_parent_btt(branch_from, turn_from, tick_from))
+        lineage_to = list(self._iter_parent_btt(branch_to, turn_to, tick_to))
+        index_from = {
+            branch: i for (i, (branch, _, _)) in enumerate(lineage_from)
+            if branch is not None
+        }
+        for index_to, (ancestor, _, _) in enumerate(lineage_to):
+            if ancestor in index_from:
+                break
+        else:
+            raise HistoryError("Branches {} and {} have no common ancestor".format(
+                branch_from, branch_to))
+        index_from = index_from[ancestor]
+        _, *ancestor_from = lineage_from[index_from]
+        _, *ancestor_to = lineage_to[index_to]
+        forked = min((ancestor_from, ancestor_to))
+        windows = []
+        for branch, turn, tick in lineage_from[:index_from]:
+            windows.append((branch, turn, tick, *self._branches[branch][1:3]))
+        windows.append((ancestor, *ancestor_from, *forked))
+        windows.append((ancestor, *forked, *ancestor_to))
+        for branch, turn, tick in reversed(lineage_to[:index_to]):
+            windows.append((branch, *self._branches[branch][1:3], turn, tick))
+        return [
+            window for window in windows if window[1:3] != window[3:]
+        ]
+
+    def _window_delta(self, delta, branch, turn_from, tick_from, turn_to, tick_to):
+        """Private use. Put the changes in a window of time in one branch
+        into ``delta``.
+
+        """
+        from functools import partial
+        if self._loaded is not None:
+            self._ensure_loaded(branch, min((turn_from, turn_to)))
         graph_objs = self._graph_objs
-        if turn_to < turn_from:
+        if (turn_to, tick_to) < (turn_from, tick_from):
             updater = partial(update_backward_window, turn_from, tick_from, turn_to, tick_to)
             gvbranches = self._graph_val_cache.presettings
             nbranches = self._nodes_cache.presettings
@@ -408,8 +467,6 @@ class ORM(object):
         if branch in evbranches:
             updater(partial(setedgeval, delta, lambda g: graph_objs[g].is_multigraph()), evbranches[branch])
 
-        return delta
-
     def get_turn_delta(self, branch=None, turn=None, tick_from=0, tick_to=None):
         """Get a dictionary describing changes made on a given turn.
 
@@ -430,6 +487,8 @@ class ORM(object):
         branch = branch or self.branch
         turn = turn or self.turn
         tick_to = tick_to or self.tick
+        if self._loaded is not None:
+            self._ensure_loaded(branch, turn)
         delta = {}
         if tick_from < tick_to:
             gvbranches = self._graph_val_cache.settings
@@ -524,6 +583,8 @@ class ORM(object):
         self._turn_end_plan = defaultdict(lambda: 0)
         """Tick on which a (branch, turn) ends, even if it hasn't been simulated"""
         self._graph_objs = {}
+        self._keyframe_turns = defaultdict(lambda: defaultdict(set))
+        """Turns on which each graph has a keyframe, keyed by branch"""
         self._plans = {}
         self._branches_plans = defaultdict(set)
         self._plan_ticks = defaultdict(lambda: defaultdict(list))
@@ -553,7 +614,13 @@ class ORM(object):
             dbstring,
             alchemy=True,
             connect_args={},
-            validate=False
+            validate=False,
+            history_window=None,
+            keyframe_interval=None,
+            keyframe_changes=None,
+            keyframe_on_branch=False,
+            write_behind=None,
+            shallowest_maxsize=None
     ):
         """Make a SQLAlchemy engine if possible, else a sqlite3 connection. In
         either case, begin a transaction.
@@ -563,13 +630,37 @@ class ORM(object):
         :arg alchemy: Set to ``False`` to use the precompiled SQLite queries even if
         SQLAlchemy is available.
         :arg connect_args: Dictionary of keyword arguments to be used for the database
-        connection.
+        connection. For SQLite, the key ``'profile'`` picks a set of pragmas
+        from ``LiSE.allegedb.query.SQLITE_PROFILES``, such as ``'fast'``.
         :arg validate: Whether to perform an integrity test on the data.
+        :arg history_window: If supplied, only load this many turns of
+        history before the current one, starting from the nearest keyframe.
+        Other history gets loaded from the database when it's needed.
+        :arg keyframe_interval: Snap a keyframe whenever time reaches a new
+        turn at least this many turns after the last keyframe.
+        :arg keyframe_changes: Snap a keyframe after this many changes
+        since the last one.
+        :arg keyframe_on_branch: Whether to snap a keyframe at the start of
+        every new branch.
+        :arg write_behind: Whether to write changes to the database in
+        a background thread, so that committing doesn't wait on the disk.
+        May be a dictionary of keyword arguments to
+        :meth:`QueryEngine.start_write_behind`. SQLite only.
+        :arg shallowest_maxsize: How many values each cache keeps in its
+        ``shallowest`` hint cache. Default ``SHALLOWEST_MAXSIZE`` from
+        :mod:`LiSE.allegedb.cache`.
 
         """
         self._planning = False
         self._forward = False
         self._no_kc = False
+        self._history_window = history_window
+        self._loaded = None
+        self.keyframe_interval = keyframe_interval
+        self.keyframe_changes = keyframe_changes
+        self.keyframe_on_branch = keyframe_on_branch
+        self._changes_since_keyframe = 0
+        self._shallowest_maxsize = shallowest_maxsize
         # in case this is the first startup
         self._obranch = 'trunk'
         self._otick = self._oturn = 0
@@ -579,7 +670,8 @@ class ORM(object):
         if not hasattr(self, 'query'):
             self.query = self.query_engine_cls(
                 dbstring, connect_args, alchemy,
-                getattr(self, 'pack', None), getattr(self, 'unpack', None)
+                getattr(self, 'pack', None), getattr(self, 'unpack', None),
+                write_behind=write_behind
             )
         self._edge_val_cache.setdb = self.query.edge_val_set
         self._edge_val_cache.deldb = self.query.edge_val_del_time
@@ -603,7 +695,7 @@ class ORM(object):
             self._turn_end_plan[branch, turn] = plan_end_tick
         if 'trunk' not in self._branches:
             self._branches['trunk'] = None, 0, 0, 0, 0
-        self._new_keyframes = set()
+        self._new_keyframes = []
         self._nbtt_stuff = (
             self._btt, self._turn_end_plan, self._turn_end,
             self._plan_ticks, self._plan_ticks_uncommitted,
@@ -631,6 +723,7 @@ class ORM(object):
             self._branch_parents[child].add(parent)
 
     def _snap_keyframe(self, graph, branch, turn, tick, nodes, edges, graph_val):
+        self._keyframe_turns[branch][graph].add(turn)
         nodes_keyframes_branch_d = self._nodes_cache.keyframe[
             graph,][branch]
         if turn in nodes_keyframes_branch_d:
@@ -651,6 +744,7 @@ class ORM(object):
         eck = self._edges_cache.keyframe
         evck = self._edge_val_cache.keyframe
         for orig, dests in edges.items():
+            self._edges_cache.keyframe_dests[graph, orig].update(dests)
             for dest, vals in dests.items():
                 edge_val_keyframe_branch_d = evck[
                     graph, orig, dest, 0][branch]
@@ -673,35 +767,48 @@ class ORM(object):
             gvkb[turn] = {tick: graph_val}
 
     def snap_keyframe(self):
+        """Record the state of all graphs at the present time.
+
+        The keyframe is written to the database on the next commit.
+
+        """
+        self._changes_since_keyframe = 0
         branch, turn, tick = self._btt()
         snapp = self._snap_keyframe
         for graphn, graph in self.graph.items():
-            snapp(graphn, branch, turn, tick,
-                  graph._nodes_state(), graph._edges_state(),
-                  graph._val_state())
-            self._new_keyframes.add((graphn, branch, turn, tick))
+            nodes = graph._nodes_state()
+            edges = graph._edges_state()
+            val = graph._val_state()
+            snapp(graphn, branch, turn, tick, nodes, edges, val)
+            self._new_keyframes.append(
+                (graphn, branch, turn, tick, nodes, edges, val))
+
+    def _snap_keyframe_if_due(self):
+        """Snap a keyframe if ``keyframe_interval`` turns or
+        ``keyframe_changes`` changes have passed since the last one"""
+        interval = self.keyframe_interval
+        if interval:
+            branch, turn, tick = self._btt()
+            last = self._keyframe_turn_before(branch, turn)
+            if last is None or turn - last >= interval:
+                self.snap_keyframe()
+                return
+        changes = self.keyframe_changes
+        if changes and self._changes_since_keyframe >= changes:
+            self.snap_keyframe()
 
     def _init_load(self, validate=False):
         assert hasattr(self, 'graph')
-        snap_keyframe = self._snap_keyframe
-        for (graph, branch, turn, tick, nodes, edges, graph_val) in \
-                self.query.keyframes_dump():
-            snap_keyframe(graph, branch, turn, tick, nodes, edges, graph_val)
-        noderows = [
-            (graph, node, branch, turn, tick, ex if ex else None)
-            for (graph, node, branch, turn, tick, ex)
-            in self.query.nodes_dump()
-        ]
-        self._nodes_cache.load(noderows)
-        edgerows = [
-            (graph, orig, dest, idx, branch, turn, tick, ex if ex else None)
-            for (graph, orig, dest, idx, branch, turn, tick, ex)
-            in self.query.edges_dump()
-        ]
-        self._edges_cache.load(edgerows)
-        self._graph_val_cache.load(self.query.graph_val_dump())
-        self._node_val_cache.load(self.query.node_val_dump())
-        self._edge_val_cache.load(self.query.edge_val_dump())
+        if self._history_window is None:
+            self._load_history()
+        else:
+            keyframe_turns = self._keyframe_turns
+            for graph, branch, turn, tick in self.query.keyframes_list():
+                keyframe_turns[branch][graph].add(turn)
+            self._loaded = {}
+            self._ensure_loaded(
+                self._obranch, max((self._oturn - self._history_window, 0))
+            )
         last_plan = -1
         plans = self._plans
         branches_plans = self._branches_plans
@@ -717,6 +824,94 @@ class ORM(object):
             plan_ticks[plan][turn].append(tick)
             time_plan[plans[plan][0], turn, tick] = plan
 
+    def _load_history(self, window=None):
+        """Load keyframes and the history of the graphs from the database.
+
+        With ``window=None``, load all of it. Otherwise ``window`` is a
+        triple of a branch, the first turn to load, and the turn to stop
+        before. Everything in the window has to be older than whatever I've
+        already loaded in that branch.
+
+        """
+        q = self.query
+        contra = window is None
+        snap_keyframe = self._snap_keyframe
+        for (graph, branch, turn, tick, nodes, edges, graph_val) in \
+                q.keyframes_dump(window):
+            snap_keyframe(graph, branch, turn, tick, nodes, edges, graph_val)
+        noderows = [
+            (graph, node, branch, turn, tick, ex if ex else None)
+            for (graph, node, branch, turn, tick, ex)
+            in q.nodes_dump(window)
+        ]
+        self._nodes_cache.load(noderows, contra=contra)
+        edgerows = [
+            (graph, orig, dest, idx, branch, turn, tick, ex if ex else None)
+            for (graph, orig, dest, idx, branch, turn, tick, ex)
+            in q.edges_dump(window)
+        ]
+        self._edges_cache.load(edgerows, contra=contra)
+        self._graph_val_cache.load(q.graph_val_dump(window), contra=contra)
+        self._node_val_cache.load(q.node_val_dump(window), contra=contra)
+        self._edge_val_cache.load(q.edge_val_dump(window), contra=contra)
+
+    def _keyframe_turn_before(self, branch, turn):
+        """Return the earliest turn I need to load to have every graph's
+        nearest keyframe at or before ``turn`` in ``branch``
+
+        Or ``None``, if some graph doesn't have a keyframe there.
+
+        """
+        if branch not in self._keyframe_turns or not self._graph_objs:
+            return
+        kfturns = self._keyframe_turns[branch]
+        ret = None
+        for graph in self._graph_objs:
+            if graph not in kfturns:
+                return
+            before = [trn for trn in kfturns[graph] if trn <= turn]
+            if not before:
+                return
+            latest = max(before)
+            if ret is None or latest < ret:
+                ret = latest
+        return ret
+
+    def _last_turn(self, branch):
+        """Return the last turn in ``branch`` that anything happened in"""
+        return max(
+            (trn for (b, trn) in self._turn_end_plan if b == branch),
+            default=self._branches[branch][3]
+        )
+
+    def _ensure_loaded(self, branch, turn):
+        """Make sure the history of ``branch`` is loaded from ``turn`` on
+
+        Only does anything if I was started with a ``history_window``.
+        Loads from the nearest keyframe, or else the start of the branch,
+        in which case the parent branch needs loading too.
+
+        """
+        loaded = self._loaded
+        if branch in loaded and loaded[branch] <= turn \
+                or branch not in self._branches:
+            return
+        parent, turn_start, tick_start, _, _ = self._branches[branch]
+        start = self._keyframe_turn_before(branch, turn)
+        from_keyframe = start is not None and start >= turn_start
+        if not from_keyframe:
+            start = turn_start
+        if branch in loaded:
+            end = loaded[branch]
+        else:
+            end = self._last_turn(branch) + 1
+        # mark it first, since loading may look things up in this branch
+        loaded[branch] = start
+        if not from_keyframe and parent is not None:
+            self._ensure_loaded(parent, turn_start)
+        if start < end:
+            self._load_history((branch, start, end))
+
     def __enter__(self):
         """Enable the use of the ``with`` keyword"""
         return self
@@ -778,7 +973,13 @@ class ORM(object):
         self._obranch = v
         self._otick = self._turn_end_plan[v, curturn]
         if branch_is_new:
+            if self._loaded is not None:
+                self._loaded[v] = curturn
             self._copy_plans(curbranch, curturn, curtick)
+            if self.keyframe_on_branch:
+                self.snap_keyframe()
+        elif self._loaded is not None:
+            self._ensure_loaded(v, curturn)
 
     def _copy_plans(self, branch_from, turn_from, tick_from):
         """Collect all plans that are active at the given time and copy them to the current branch"""
@@ -882,6 +1083,11 @@ class ORM(object):
                 )
         self._otick = tick
         self._oturn = v
+        if self._loaded is not None:
+            self._ensure_loaded(branch, v)
+        if v > turn_end and not self._planning:
+            self._snap_keyframe_if_due()
+            self.query.flush_behind()
 
     # easier to override things this way
     @property
@@ -965,6 +1171,10 @@ class ORM(object):
             plan_ticks[last_plan][turn].append(tick)
             plan_ticks_uncommitted.append((last_plan, turn, tick))
             time_plan[branch, turn, tick] = last_plan
+        elif self.keyframe_changes:
+            if self._changes_since_keyframe >= self.keyframe_changes:
+                self.snap_keyframe()
+            self._changes_since_keyframe += 1
         turn_end_plan[branch_turn] = tick
         branches[branch] = parent, turn_start, tick_start, turn_end, tick
         self._otick = tick
@@ -991,12 +1201,8 @@ class ORM(object):
         if self._plan_ticks_uncommitted:
             self.query.plan_ticks_insert_many(self._plan_ticks_uncommitted)
         kf_ins = self.query.keyframes_insert
-        graphmap = self.graph
-        for graphn, branch, turn, tick in self._new_keyframes:
-            graph = graphmap[graphn]
-            kf_ins(graphn, branch, turn, tick,
-                    graph._nodes_state(), graph._edges_state(),
-                    graph._val_state())
+        for keyframe in self._new_keyframes:
+            kf_ins(*keyframe)
         self._new_keyframes = []
         self.query.commit()
         self._plans_uncommitted = []
@@ -1016,18 +1222,26 @@ class ORM(object):
         if data:
             branch, turn, tick = self._btt()
             if isinstance(data, DiGraph):
-                self._snap_keyframe(name, branch, turn, tick, data._node_state(), data._edges_state(), data._val_state())
+                nodes = data._nodes_state()
+                edges = data._edges_state()
+                val = data._val_state()
             elif isinstance(data, nx.Graph):
-                self._snap_keyframe(name, branch, turn, tick, data._node, data._adj, data.graph)
+                nodes = data._node
+                edges = data._adj
+                val = data.graph
             elif isinstance(data, dict):
                 try:
                     data = nx.from_dict_of_dicts(data)
                 except AttributeError:
                     data = nx.from_dict_of_lists(data)
-                self._snap_keyframe(name, branch, turn, tick, data._node, data._adj, data.graph)
+                nodes = data._node
+                edges = data._adj
+                val = data.graph
             else:
-                self._snap_keyframe(name, branch, turn, tick, *data)
-            self._new_keyframes.add((name, branch, turn, tick))
+                nodes, edges, val = data
+            self._snap_keyframe(name, branch, turn, tick, nodes, edges, val)
+            self._new_keyframes.append(
+                (name, branch, turn, tick, nodes, edges, val))
 
     def new_graph(self, name, data=None, **attr):
         """Return a new instance of type Graph, initialized with the given
@@ -1169,6 +1383,28 @@ class ORM(object):
         )
         store(character, node, branch, turn, tick, exist)
 
+    def _set_node_vals(self, character, key, values):
+        """Set ``key`` on many nodes in ``character``
+
+        ``values`` is an iterable of ``(node, value)`` pairs. Each value
+        gets its own tick, as if set one at a time, but no node objects
+        are made, and no one listening to the nodes is told. As in
+        :meth:`batch`, the keycaches are invalidated rather than updated.
+
+        """
+        nbtt = self._nbtt
+        node_val_set = self.query.node_val_set
+        store = self._node_val_cache.store
+        no_kc = self._no_kc
+        self._no_kc = True
+        try:
+            for node, value in values:
+                branch, turn, tick = nbtt()
+                node_val_set(character, node, key, branch, turn, tick, value)
+                store(character, node, key, branch, turn, tick, value)
+        finally:
+            self._no_kc = no_kc
+
     def _edge_exists(self, character, orig, dest, idx=0):
         retrieve, btt = self._edge_exists_stuff
         try:
@@ -288,6 +288,16 @@ def queries_for_table_dict(table):
         'global_delete': table['global'].delete().where(
             table['global'].c.key == bindparam('key')
         ),
+        'keyframes_list': select([
+            table['keyframes'].c.graph,
+            table['keyframes'].c.branch,
+            table['keyframes'].c.turn,
+            table['keyframes'].c.tick
+        ]).order_by(
+            table['keyframes'].c.branch,
+            table['keyframes'].c.turn,
+            table['keyframes'].c.tick
+        ),
         'graphs_types': select([
             table['graphs'].c.graph,
             table['graphs'].c.type
@@ -324,9 +334,23 @@ def queries_for_table_dict(table):
                     t.c.tick == bindparam('tick')
                 ))
         r[t.name + '_dump'] = select(list(t.c.values())).order_by(*key)
+        if 'branch' in t.columns and 'turn' in t.columns:
+            r[t.name + '_load_window'] = select(list(t.c.values())).where(and_(
+                t.c.branch == bindparam('branch'),
+                t.c.turn >= bindparam('turn_from'),
+                t.c.turn < bindparam('turn_to')
+            )).order_by(*key)
         r[t.name + '_insert'] = t.insert().values(tuple(bindparam(cname) for cname in t.c.keys()))
         r[t.name + '_count'] = select([func.COUNT()]).select_from(t)
         r[t.name + '_del'] = t.delete().where(and_(*[c == bindparam(c.name) for c in t.primary_key]))
+    for t in (table['graph_val'], table['node_val'], table['edge_val']):
+        r[t.name + '_history'] = select([t.c.turn, t.c.tick, t.c.value]).where(and_(
+            *[c == bindparam(c.name) for c in t.primary_key
+              if c.name not in ('branch', 'turn', 'tick')],
+            t.c.branch == bindparam('branch'),
+            t.c.turn >= bindparam('turn_from'),
+            t.c.turn < bindparam('turn_to')
+        )).order_by(t.c.turn, t.c.tick)
     return r
 
 
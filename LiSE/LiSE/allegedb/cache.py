@@ -149,6 +149,7 @@ class StructuredDefaultDict(dict):
 
 
 KEYCACHE_MAXSIZE = 1024
+SHALLOWEST_MAXSIZE = 16384
 
 
 def lru_append(kc, lru, kckey, maxsize):
@@ -186,7 +187,9 @@ class Cache:
         'db', 'parents', 'keys', 'keycache', 'branches', 'shallowest',
         'settings', 'presettings', 'time_entity', '_kc_lru',
         '_store_stuff', '_remove_stuff', '_truncate_stuff',
-        'setdb', 'deldb', 'keyframe', 'name'
+        'setdb', 'deldb', 'keyframe', 'name', 'shallowest_maxsize',
+        'shallowest_hits', 'shallowest_misses', 'shallowest_evictions',
+        'watcher'
     )
 
     def __init__(self, db, kfkvs=None):
@@ -225,12 +228,29 @@ class Cache:
         self.keyframe = StructuredDefaultDict(1, SettingsTurnDict, **(kfkvs or {}))
         """Key-value dictionaries representing my state at a given time"""
         self.shallowest = OrderedDict()
-        """A dictionary for plain, unstructured hinting."""
+        """A dictionary for plain, unstructured hinting.
+
+        Holds at most ``shallowest_maxsize`` entries, evicting the least
+        recently used. See ``shallowest_stats`` for how well it's doing.
+
+        """
+        self.shallowest_maxsize = getattr(
+            db, '_shallowest_maxsize', None) or SHALLOWEST_MAXSIZE
+        self.shallowest_hits = 0
+        self.shallowest_misses = 0
+        self.shallowest_evictions = 0
         self.settings = PickyDefaultDict(SettingsTurnDict)
         """All the ``entity[key] = value`` operations that were performed on some turn"""
         self.presettings = PickyDefaultDict(SettingsTurnDict)
         """The values prior to ``entity[key] = value`` operations performed on some turn"""
         self.time_entity = {}
+        self.watcher = None
+        """Optional function to tell about every change I store.
+
+        It gets called with the tuple identifying the entity, the key
+        that changed, and the branch and turn of the change.
+
+        """
         self._kc_lru = OrderedDict()
         self._store_stuff = (
             self.parents, self.branches, self.keys, db.delete_plan,
@@ -248,12 +268,15 @@ class Cache:
             self.keycache
         )
 
-    def load(self, data):
+    def load(self, data, *, contra=True):
         """Add a bunch of data. Must be in chronological order.
 
         But it doesn't need to all be from the same branch, as long as
         each branch is chronological of itself.
 
+        With ``contra=False``, don't check the data for contradictions
+        with what's already loaded, as when loading older history.
+
         """
         branches = defaultdict(list)
         for row in data:
@@ -269,7 +292,7 @@ class Cache:
             while branch2do:
                 branch = branch2do.popleft()
                 for row in branches[branch]:
-                    store(*row, planning=False, loading=True)
+                    store(*row, planning=False, loading=True, contra=contra)
                 if branch in childbranch:
                     branch2do.extend(childbranch[branch])
 
@@ -527,7 +550,7 @@ class Cache:
                 self_iter_future_contradictions(entity, key, turns, branch,
                                                 turn, tick, value))
             if contras:
-                self.shallowest = OrderedDict()
+                self.shallowest.clear()
             for contra_turn, contra_tick in contras:
                 if (branch, contra_turn,
                     contra_tick) in time_plan:  # could've been deleted in this very loop
@@ -542,7 +565,7 @@ class Cache:
             db_branches[branch] = parbranch, turn_start, tick_start, turn, tick
             db_turn_end[branch, turn] = tick
         self_store_journal(*args)
-        self.shallowest[parent + (entity, key, branch, turn, tick)] = value
+        self._hint(parent + (entity, key, branch, turn, tick), value)
         if turn in turns:
             the_turn = turns[turn]
             the_turn.truncate(tick)
@@ -566,6 +589,11 @@ class Cache:
                 del keycache[keycache_key]
         if not db._no_kc:
             update_keycache(*args, forward=forward)
+        if self.watcher is not None:
+            self._changed(parent, entity, key, branch, turn, value)
+
+    def _changed(self, parent, entity, key, branch, turn, value):
+        self.watcher(parent + (entity,), key, branch, turn)
 
     def remove(self, branch, turn, tick):
         """Delete all data from a specific tick"""
@@ -640,7 +668,7 @@ class Cache:
         if not pbranhc:
             del settings[branch]
             del presettings[branch]
-        self.shallowest = OrderedDict()
+        self.shallowest.clear()
         remove_keycache(parent + (entity, branch), turn, tick)
 
     def _remove_keycache(self, entity_branch, turn, tick):
@@ -688,7 +716,7 @@ class Cache:
                 truncate_branhc(branches[branch])
         truncate_branhc(settings[branch])
         truncate_branhc(presettings[branch])
-        self.shallowest = OrderedDict()
+        self.shallowest.clear()
         for entity_branch in keycache:
             if entity_branch[-1] == branch:
                 truncate_branhc(keycache[entity_branch])
@@ -741,8 +769,29 @@ class Cache:
 
     def _base_retrieve(self, args):
         shallowest = self.shallowest
-        if args in shallowest:
-            return shallowest[args]
+        # another thread may evict args at any moment, so don't check
+        # that it's present before getting it
+        try:
+            ret = shallowest[args]
+        except KeyError:
+            pass
+        else:
+            self.shallowest_hits += 1
+            try:
+                shallowest.move_to_end(args)
+            except KeyError:
+                pass
+            return ret
+        self.shallowest_misses += 1
+        if self.db._loaded is not None:
+            self.db._ensure_loaded(args[-3], args[-2])
+        ret = self._retrieve_deep(args)
+        if ret is not KeyError:
+            self._hint(args, ret)
+        return ret
+
+    def _retrieve_deep(self, args):
+        """Look up a value in the real cache, ignoring ``shallowest``"""
         entity = args[:-4]
         key, branch, turn, tick = args[-4:]
         keyframes = self.keyframe.get(entity, {})
@@ -755,16 +804,13 @@ class Cache:
                 if turn in brancs:
                     if brancs[turn].rev_gettable(tick):
                         ret = brancs[turn][tick]
-                        shallowest[args] = ret
                         return ret
                     elif brancs.rev_gettable(turn-1):
                         b1 = brancs[turn-1]
                         ret = b1.final()
-                        shallowest[args] = ret
                         return ret
                 else:
                     ret = brancs[turn].final()
-                    shallowest[args] = ret
                     return ret
             for (b, r, t) in self.db._iter_parent_btt(branch):
                 brancs = branchentk.get(b)
@@ -779,10 +825,8 @@ class Cache:
                                 kf = kfbr[t]
                                 if key in kf:
                                     ret = kf[key]
-                                    shallowest[args] = ret
                                     return ret
                         ret = brancs[r][t]
-                        shallowest[args] = ret
                         return ret
                     elif brancs.rev_gettable(r - 1):
                         if b in keyframes and keyframes[b].rev_gettable(r - 1):
@@ -792,7 +836,6 @@ class Cache:
                                 kf = kfbr.final()
                                 if key in kf:
                                     ret = kf[key]
-                                    shallowest[args] = ret
                                     return ret
                             elif brancs.rev_before(r - 1) == kfb.rev_before(r - 1):
                                 kfbr = kfb[r - 1]
@@ -801,38 +844,32 @@ class Cache:
                                     kf = kfbr.final()
                                     if key in kf:
                                         ret = kf[key]
-                                        shallowest[args] = ret
                                         return ret
                         ret = brancs[r - 1].final()
-                        shallowest[args] = ret
                         return ret
                     elif b in keyframes and r in keyframes[b] \
                             and keyframes[b][r].rev_gettable(t) \
                             and key in keyframes[b][r][t]:
                         ret = keyframes[b][r][t][key]
-                        shallowest[args] = ret
                         return ret
                     elif b in keyframes and keyframes[b].rev_gettable(r - 1) \
                             and key in keyframes[b][r - 1].final():
                         ret = keyframes[b][r - 1].final()[key]
-                        shallowest[args] = ret
                         return ret
                 elif b in keyframes:
-                    kfb = keyframes[branch]
+                    kfb = keyframes[b]
                     if r in kfb:
-                        kfbr = kfb[turn]
-                        if kfbr.rev_gettable(tick):
-                            kf = kfbr[tick]
+                        kfbr = kfb[r]
+                        if kfbr.rev_gettable(t):
+                            kf = kfbr[t]
                             if key in kf:
                                 ret = kf[key]
-                                shallowest[args] = ret
                                 return ret
                     if kfb.rev_gettable(r - 1):
-                        kfbr = kfb[r]
+                        kfbr = kfb[r - 1]
                         kf = kfbr.final()
                         if key in kf:
                             ret = kf[key]
-                            shallowest[args] = ret
                             return ret
         else:
             if branch in keyframes:
@@ -843,35 +880,54 @@ class Cache:
                         kf = kfbr[tick]
                         if key in kf:
                             ret = kf[key]
-                            shallowest[args] = ret
                             return ret
                 if kfb.rev_gettable(turn-1):
-                    kfbr = kfb[turn]
+                    kfbr = kfb[turn-1]
                     kf = kfbr.final()
                     if key in kf:
                         ret = kf[key]
-                        shallowest[args] = ret
                         return ret
             for (b, r, t) in self.db._iter_parent_btt(branch):
                 if b in keyframes:
                     kfb = keyframes[b]
                     if r in kfb:
-                        kfbr = kfb[turn]
-                        if kfbr.rev_gettable(tick):
-                            kf = kfbr[tick]
+                        kfbr = kfb[r]
+                        if kfbr.rev_gettable(t):
+                            kf = kfbr[t]
                             if key in kf:
                                 ret = kf[key]
-                                shallowest[args] = ret
                                 return ret
                     if kfb.rev_gettable(r-1):
-                        kfbr = kfb[r]
+                        kfbr = kfb[r-1]
                         kf = kfbr.final()
                         if key in kf:
                             ret = kf[key]
-                            shallowest[args] = ret
                             return ret
         return KeyError
 
+    def _hint(self, args, value):
+        """Remember ``value`` for ``args`` in ``shallowest``, evicting if full"""
+        shallowest = self.shallowest
+        shallowest.pop(args, None)
+        shallowest[args] = value
+        if len(shallowest) > self.shallowest_maxsize:
+            try:
+                shallowest.popitem(False)
+            except KeyError:
+                # cleared by another thread
+                return
+            self.shallowest_evictions += 1
+
+    def shallowest_stats(self):
+        """Return a dict describing how the ``shallowest`` cache is used"""
+        return {
+            'size': len(self.shallowest),
+            'maxsize': self.shallowest_maxsize,
+            'hits': self.shallowest_hits,
+            'misses': self.shallowest_misses,
+            'evictions': self.shallowest_evictions
+        }
+
     def retrieve(self, *args):
         """Get a value previously .store(...)'d.
 
@@ -960,7 +1016,7 @@ class NodesCache(Cache):
 class EdgesCache(Cache):
     """A cache for remembering whether edges exist at a given time."""
     __slots__ = (
-        'destcache', 'origcache', 'predecessors',
+        'destcache', 'origcache', 'predecessors', 'keyframe_dests',
         '_origcache_lru', '_destcache_lru', '_get_destcache_stuff',
         '_get_origcache_stuff', '_additional_store_stuff'
     )
@@ -977,7 +1033,10 @@ class EdgesCache(Cache):
         Cache.__init__(self, db, kfkvs={'gettest': gettest, 'settest': settest})
         self.destcache = PickyDefaultDict(SettingsTurnDict)
         self.origcache = PickyDefaultDict(SettingsTurnDict)
-        self.predecessors = StructuredDefaultDict(3, TurnDict)
+        self.predecessors = StructuredDefaultDict(3, SettingsTurnDict)
+        # destinations with keyframes, by (graph, orig), so I needn't
+        # look through every keyframe to find an origin's
+        self.keyframe_dests = PickyDefaultDict(set)
         self._origcache_lru = OrderedDict()
         self._destcache_lru = OrderedDict()
         self._get_destcache_stuff = (
@@ -1044,12 +1103,8 @@ class EdgesCache(Cache):
             return added, deleted
         kf = self.keyframe
         itparbtt = self.db._iter_parent_btt
-        its = list(kf.items())
-        for ks, v in its:
-            assert len(ks) == 3, "Bad key in keyframe: " + repr(ks)
-        for (grap, org, dest), kfg in its:  # too much iteration!
-            if (grap, org) != (graph, orig):
-                continue
+        for dest in self.keyframe_dests.get((graph, orig), ()):
+            kfg = kf[graph, orig, dest]
             for branc, trn, tck in itparbtt(branch, turn, tick):
                 if branc not in kfg:
                     continue
@@ -1063,8 +1118,6 @@ class EdgesCache(Cache):
                 if kfgb.rev_gettable(trn):
                     if kfgb[trn].final()[0] and dest not in deleted:
                         added.add(dest)
-        for ks in kf.keys():
-            assert len(ks) == 3, "BBadd key in keyframe: " + repr(ks)
         return added, deleted
 
     def _adds_dels_predecessors(self, parentity, branch, turn, tick, *,
@@ -1182,6 +1235,11 @@ class EdgesCache(Cache):
             forward = self.db._forward
         return orig in self._get_origcache(graph, dest, branch, turn, tick, forward=forward)
 
+    def _changed(self, parent, dest, idx, branch, turn, ex):
+        graph, orig = parent
+        self.watcher((graph, orig), 'portals', branch, turn)
+        self.watcher((graph, dest), 'portals', branch, turn)
+
     def store(self, graph, orig, dest, idx, branch, turn, tick, ex, *, planning=None, forward=None, loading=False, contra=True):
         db, predecessors, successors = self._additional_store_stuff
         if not ex:
@@ -34,6 +34,8 @@ try:
 except ImportError:
     pass
 from time import monotonic
+from queue import Queue
+from threading import Thread, RLock
 
 IntegrityError = (
     alchemyIntegError, sqliteIntegError
@@ -44,6 +46,17 @@ class TimeError(ValueError):
     """Exception class for problems with the time model"""
 
 
+class NoLock(object):
+    """Stand-in for a lock, when there's no writer thread to contend with"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+
 class GlobalKeyValueStore(MutableMapping):
     """A dict-like object that keeps its contents in a table.
 
@@ -81,6 +94,49 @@ class GlobalKeyValueStore(MutableMapping):
             del self.qe._global_cache[k]
 
 
+SQLITE_PROFILES = {
+    'default': {},
+    'fast': {
+        'journal_mode': 'wal',
+        'synchronous': 'normal',
+        'mmap_size': 2 ** 28,
+        'cache_size': -2 ** 16,  # negative means KiB, so this is 64 MiB
+        'temp_store': 'memory'
+    }
+}
+"""Pragmas to set on SQLite connections, by the name of the profile
+
+Pick one with the ``profile`` key of ``connect_args``.
+
+"""
+
+
+_COMMIT = ('commit', ())
+"""Marker telling the write-behind thread to commit the transaction"""
+
+
+class FetchedCursor(object):
+    """The rows from a cursor, all fetched at once
+
+    Used when the connection is shared with the write-behind thread, so
+    nothing reads from it without holding the lock.
+
+    """
+    __slots__ = ('_rows',)
+
+    def __init__(self, cursor):
+        self._rows = iter(cursor.fetchall())
+
+    def __iter__(self):
+        return self._rows
+
+    def fetchone(self):
+        return next(self._rows, None)
+
+    def fetchall(self):
+        return list(self._rows)
+
+
 class QueryEngine(object):
     """Wrapper around either a DBAPI2.0 connection or an
     Alchemist. Provides methods to run queries using either.
@@ -90,7 +146,7 @@ class QueryEngine(object):
     flush_edges_t = 0
     def __init__(
             self, dbstring, connect_args, alchemy,
-            pack=None, unpack=None
+            pack=None, unpack=None, write_behind=None
     ):
         """If ``alchemy`` is True and ``dbstring`` is a legit database URI,
         instantiate an Alchemist and start a transaction with
@@ -100,11 +156,29 @@ class QueryEngine(object):
         object in place of ``dbstring`` if you wish. I'll still create
         my own transaction though.
 
+        With SQLite, ``connect_args`` may have a ``profile`` key, naming
+        one of the ``SQLITE_PROFILES``, or else a dictionary of pragmas
+        to set on the connection. With sqlite3, any profile but
+        ``'default'`` also makes me keep one cursor for each statement
+        that returns no rows, rather than making a new one every call.
+        With SQLAlchemy, the pragmas are set on each new connection,
+        and asking for them on another kind of database is a
+        :class:`ValueError`. Other ``connect_args`` are passed to the
+        driver's ``connect`` function.
+
+        If ``write_behind`` is true, buffered changes get written by a
+        background thread; see :meth:`start_write_behind`. It may be a
+        dictionary of keyword arguments to that method.
+
         """
         dbstring = dbstring or 'sqlite:///:memory:'
+        connect_args = dict(connect_args or {})
+        profile = connect_args.pop('profile', 'default')
+        if not isinstance(profile, dict):
+            profile = SQLITE_PROFILES[profile]
 
         def alchem_init(dbstring, connect_args):
-            from sqlalchemy import create_engine
+            from sqlalchemy import create_engine, event
             from sqlalchemy.engine.base import Engine
             from LiSE.allegedb.alchemy import Alchemist
             if isinstance(dbstring, Engine):
@@ -114,6 +188,17 @@ class QueryEngine(object):
                     dbstring,
                     connect_args=connect_args
                 )
+            if profile:
+                if self.engine.dialect.name != 'sqlite':
+                    raise ValueError(
+                        "SQLite profiles don't work with {}".format(
+                            self.engine.dialect.name))
+
+                @event.listens_for(self.engine, 'connect')
+                def set_pragmas(dbapi_connection, connection_record):
+                    for pragma, value in profile.items():
+                        dbapi_connection.execute(
+                            'PRAGMA {}={};'.format(pragma, value))
             self.alchemist = Alchemist(self.engine)
             self.transaction = self.alchemist.conn.begin()
 
@@ -122,13 +207,28 @@ class QueryEngine(object):
             from json import load
             with open(os.path.join(self.path, 'sqlite.json')) as strf:
                 self.strings = load(strf)
+            if profile:
+                connect_args.setdefault(
+                    'cached_statements', len(self.strings))
             if isinstance(dbstring, Connection):
                 self.connection = dbstring
             else:
                 if dbstring.startswith('sqlite:'):
                     slashidx = dbstring.rindex('/')
                     dbstring = dbstring[slashidx+1:]
-                self.connection = connect(dbstring)
+                connect_args.setdefault('check_same_thread', not write_behind)
+                self.connection = connect(dbstring, **connect_args)
+            for pragma, value in profile.items():
+                self.connection.execute(
+                    'PRAGMA {}={};'.format(pragma, value))
+            if profile:
+                self._cursors = {
+                    stringname: self.connection.cursor()
+                    for (stringname, s) in self.strings.items()
+                    if not s.lstrip().upper().startswith('SELECT')
+                }
+            else:
+                self._cursors = {}
 
         if alchemy:
             try:
@@ -152,6 +252,155 @@ class QueryEngine(object):
         self.unpack = unpack
         self._exist_edge_stuff = (self._btts, self._edges2set)
         self._edge_val_set_stuff = (self._btts, self._edgevals2set)
+        self._lock = NoLock()
+        self._writer = None
+        if write_behind:
+            self.start_write_behind(
+                **(write_behind if isinstance(write_behind, dict) else {}))
+
+    def start_write_behind(self, size=4096, interval=0.5, maxsize=8):
+        """Start a thread to write buffered changes to the database.
+
+        Changes get handed to the thread in batches, when
+        :meth:`flush_behind` finds at least ``size`` of them buffered, or
+        ``interval`` seconds since the last batch. When ``maxsize``
+        batches are waiting, handing over another blocks until the
+        thread catches up; :meth:`write_behind_stats` reports how often
+        and for how long that happened.
+
+        :meth:`commit` only queues a commit after the changes so far.
+        :meth:`flush`, :meth:`close`, and any query that reads the
+        buffered tables wait for the thread to finish what's queued.
+
+        Only works with the sqlite3 backend. The connection is shared
+        with the thread, so if you passed in your own, make it with
+        ``check_same_thread=False``.
+
+        """
+        if self._writer is not None:
+            return
+        if not hasattr(self, 'connection'):
+            raise ValueError("Write-behind needs the sqlite3 backend")
+        self._lock = RLock()
+        self._write_behind_size = size
+        self._write_behind_interval = interval
+        self._write_behind_stats = {
+            'batches': 0, 'rows': 0, 'commits': 0,
+            'blocked': 0, 'blocked_time': 0.
+        }
+        self._writer_error = None
+        self._batch = []
+        self._last_handoff = monotonic()
+        self._writeq = Queue(maxsize)
+        self._writer = Thread(
+            target=self._write_behind, name='allegedb write-behind',
+            daemon=True
+        )
+        self._writer.start()
+
+    def _write_behind(self):
+        """Loop run by the write-behind thread"""
+        q = self._writeq
+        stats = self._write_behind_stats
+        strings = self.strings
+        while True:
+            batch = q.get()
+            try:
+                if batch is None:
+                    return
+                if self._writer_error is not None:
+                    continue
+                for op in batch:
+                    with self._lock:
+                        if op is _COMMIT:
+                            self.connection.commit()
+                            stats['commits'] += 1
+                            continue
+                        stringname, rows = op
+                        cursor = self._cursors.get(stringname) \
+                            or self.connection.cursor()
+                        cursor.executemany(strings[stringname], rows)
+                        stats['rows'] += cursor.rowcount
+                stats['batches'] += 1
+            except Exception as ex:
+                self._writer_error = ex
+            finally:
+                q.task_done()
+
+    def _write_many(self, stringname, rows):
+        """Run a query for each of the ``rows``, or have the write-behind
+        thread do it later"""
+        if self._writer is None:
+            self.sqlmany(stringname, *rows)
+        else:
+            # pack the rows now, while the values are as they were set
+            self._batch.append((stringname, list(rows)))
+
+    def _raise_writer_error(self):
+        if self._writer_error is not None:
+            err = self._writer_error
+            self._writer_error = None
+            raise err
+
+    def _handoff(self, *ops):
+        """Give the write-behind thread what's been flushed so far"""
+        self._raise_writer_error()
+        batch = self._batch
+        batch.extend(ops)
+        self._batch = []
+        self._last_handoff = monotonic()
+        if not batch:
+            return
+        q = self._writeq
+        if q.full():
+            stats = self._write_behind_stats
+            stats['blocked'] += 1
+            start = monotonic()
+            q.put(batch)
+            stats['blocked_time'] += monotonic() - start
+        else:
+            q.put(batch)
+
+    def _pending(self):
+        return (
+            len(self._nodes2set) + len(self._edges2set)
+            + len(self._graphvals2set) + len(self._nodevals2set)
+            + len(self._edgevals2set)
+        )
+
+    def flush_behind(self):
+        """Hand buffered changes to the write-behind thread if there are
+        enough of them, or it's been long enough since the last time
+
+        Doesn't wait for them to be written. Does nothing if there's
+        no write-behind thread.
+
+        """
+        if self._writer is None:
+            return
+        if (
+            self._pending() >= self._write_behind_size
+            or monotonic() - self._last_handoff
+            >= self._write_behind_interval
+        ):
+            self._flush_buffers()
+            self._handoff()
+
+    def write_behind_stats(self):
+        """Return a dictionary describing the write-behind thread's work
+
+        ``queued`` is how many batches are waiting to be written, and
+        ``pending`` how many changes are buffered but not yet handed
+        over. ``blocked`` counts the times a batch had to wait for room
+        in the queue, and ``blocked_time`` is the seconds spent waiting.
+
+        """
+        if self._writer is None:
+            raise ValueError("No write-behind thread")
+        ret = dict(self._write_behind_stats)
+        ret['queued'] = self._writeq.qsize()
+        ret['pending'] = self._pending()
+        return ret
 
     def sql(self, stringname, *args, **kwargs):
         """Wrapper for the various prewritten or compiled SQL calls.
@@ -166,9 +415,29 @@ class QueryEngine(object):
             return getattr(self.alchemist, stringname)(*args, **kwargs)
         else:
             s = self.strings[stringname]
-            return self.connection.cursor().execute(
-                s.format(**kwargs) if kwargs else s, args
-            )
+            if self._writer is None:
+                return self._execute(stringname, s, args, kwargs)
+            with self._lock:
+                return FetchedCursor(
+                    self._execute(stringname, s, args, kwargs))
+
+    def _execute(self, stringname, s, args, kwargs):
+        if kwargs:
+            return self.connection.cursor().execute(s.format(**kwargs), args)
+        if stringname in self._cursors:
+            return self._cursors[stringname].execute(s, args)
+        return self.connection.cursor().execute(s, args)
+
+    def _dump(self, table, window=None):
+        """Select the rows of ``table``, maybe only those in a ``window``
+
+        ``window`` is a triple of a branch, the first turn to select,
+        and the turn to stop before.
+
+        """
+        if window is None:
+            return self.sql(table + '_dump')
+        return self.sql(table + '_load_window', *window)
 
     def sqlmany(self, stringname, *args):
         """Wrapper for executing many SQL calls on my connection.
@@ -182,7 +451,10 @@ class QueryEngine(object):
         if hasattr(self, 'alchemist'):
             return getattr(self.alchemist.many, stringname)(*args)
         s = self.strings[stringname]
-        return self.connection.cursor().executemany(s, args)
+        with self._lock:
+            if stringname in self._cursors:
+                return self._cursors[stringname].executemany(s, args)
+            return self.connection.cursor().executemany(s, args)
 
     def have_graph(self, graph):
         """Return whether I have a graph by this name."""
@@ -198,11 +470,17 @@ class QueryEngine(object):
         graph, nodes, edges, graph_val = map(self.pack, (graph, nodes, edges, graph_val))
         return self.sql('keyframes_insert', graph, branch, turn, tick, nodes, edges, graph_val)
 
-    def keyframes_dump(self):
+    def keyframes_dump(self, window=None):
         unpack = self.unpack
-        for (graph, branch, turn, tick, nodes, edges, graph_val) in self.sql('keyframes_dump'):
+        for (graph, branch, turn, tick, nodes, edges, graph_val) in self._dump('keyframes', window):
             yield unpack(graph), branch, turn, tick, unpack(nodes), unpack(edges), unpack(graph_val)
 
+    def keyframes_list(self):
+        """Yield the graph, branch, turn, and tick of every keyframe"""
+        unpack = self.unpack
+        for (graph, branch, turn, tick) in self.sql('keyframes_list'):
+            yield unpack(graph), branch, turn, tick
+
     def del_graph(self, graph):
         """Delete all records to do with the graph"""
         g = self.pack(graph)
@@ -308,11 +586,17 @@ class QueryEngine(object):
     def turns_dump(self):
         return self.sql('turns_dump')
 
-    def graph_val_dump(self):
-        """Yield the entire contents of the graph_val table."""
-        self._flush_graph_val()
+    def graph_val_dump(self, window=None):
+        """Yield the entire contents of the graph_val table.
+
+        Or, if ``window`` is a triple of branch, start turn, and end turn,
+        just what's in that branch from the start turn up to, but not
+        including, the end turn.
+
+        """
+        self.flush()
         unpack = self.unpack
-        for (graph, key, branch, turn, tick, value) in self.sql('graph_val_dump'):
+        for (graph, key, branch, turn, tick, value) in self._dump('graph_val', window):
             yield (
                 unpack(graph),
                 unpack(key),
@@ -322,6 +606,27 @@ class QueryEngine(object):
                 unpack(value)
             )
 
+    def _history(self, table, keys, branch, turn_from, turn_to):
+        """Yield ``(turn, tick, value)`` for each change to one stat
+
+        ``keys`` are the already packed values of the table's key
+        columns, other than the time. Only changes in ``branch`` from
+        ``turn_from`` up to, but not including, ``turn_to`` are yielded.
+
+        """
+        self.flush()
+        unpack = self.unpack
+        for turn, tick, value in self.sql(
+            table + '_history', *keys, branch, turn_from, turn_to
+        ):
+            yield turn, tick, unpack(value)
+
+    def graph_val_history(self, graph, key, branch, turn_from, turn_to):
+        """Yield ``(turn, tick, value)`` for each change to a graph stat"""
+        pack = self.pack
+        return self._history(
+            'graph_val', (pack(graph), pack(key)), branch, turn_from, turn_to)
+
     def _flush_graph_val(self):
         """Send all new and changed graph values to the database."""
         if not self._graphvals2set:
@@ -335,12 +640,12 @@ class QueryEngine(object):
                 ))
             else:
                 delafter[graph, key, branch] = (turn, tick)
-        self.sqlmany(
+        self._write_many(
             'del_graph_val_after',
-            *((graph, key, branch, turn, turn, tick)
-              for ((graph, key, branch), (turn, tick)) in delafter.items())
+            [(graph, key, branch, turn, turn, tick)
+             for ((graph, key, branch), (turn, tick)) in delafter.items()]
         )
-        self.sqlmany('graph_val_insert', *self._graphvals2set)
+        self._write_many('graph_val_insert', self._graphvals2set)
         self._graphvals2set = []
 
     def graph_val_set(self, graph, key, branch, turn, tick, value):
@@ -351,7 +656,7 @@ class QueryEngine(object):
         self._graphvals2set.append((graph, key, branch, turn, tick, value))
 
     def graph_val_del_time(self, branch, turn, tick):
-        self._flush_graph_val()
+        self.flush()
         self.sql('graph_val_del_time', branch, turn, tick)
         self._btts.discard((branch, turn, tick))
 
@@ -362,7 +667,7 @@ class QueryEngine(object):
     def _flush_nodes(self):
         if not self._nodes2set:
             return
-        self.sqlmany('nodes_insert', *self._nodes2set)
+        self._write_many('nodes_insert', self._nodes2set)
         self._nodes2set = []
 
     def exist_node(self, graph, node, branch, turn, tick, extant):
@@ -377,15 +682,15 @@ class QueryEngine(object):
         self._nodes2set.append((self.pack(graph), self.pack(node), branch, turn, tick, extant))
 
     def nodes_del_time(self, branch, turn, tick):
-        self._flush_nodes()
+        self.flush()
         self.sql('nodes_del_time', branch, turn, tick)
         self._btts.discard((branch, turn, tick))
 
-    def nodes_dump(self):
-        """Dump the entire contents of the nodes table."""
-        self._flush_nodes()
+    def nodes_dump(self, window=None):
+        """Dump the entire contents of the nodes table, or a ``window`` of it."""
+        self.flush()
         unpack = self.unpack
-        for (graph, node, branch, turn,tick, extant) in self.sql('nodes_dump'):
+        for (graph, node, branch, turn,tick, extant) in self._dump('nodes', window):
             yield (
                 unpack(graph),
                 unpack(node),
@@ -395,13 +700,13 @@ class QueryEngine(object):
                 bool(extant)
             )
 
-    def node_val_dump(self):
-        """Yield the entire contents of the node_val table."""
-        self._flush_node_val()
+    def node_val_dump(self, window=None):
+        """Yield the entire contents of the node_val table, or a ``window`` of it."""
+        self.flush()
         unpack = self.unpack
         for (
                 graph, node, key, branch, turn, tick, value
-        ) in self.sql('node_val_dump'):
+        ) in self._dump('node_val', window):
             yield (
                 unpack(graph),
                 unpack(node),
@@ -412,10 +717,18 @@ class QueryEngine(object):
                 unpack(value)
             )
 
+    def node_val_history(self, graph, node, key, branch, turn_from, turn_to):
+        """Yield ``(turn, tick, value)`` for each change to a node stat"""
+        pack = self.pack
+        return self._history(
+            'node_val', (pack(graph), pack(node), pack(key)),
+            branch, turn_from, turn_to
+        )
+
     def _flush_node_val(self):
         if not self._nodevals2set:
             return
-        self.sqlmany('node_val_insert', *self._nodevals2set)
+        self._write_many('node_val_insert', self._nodevals2set)
         self._nodevals2set = []
 
     def node_val_set(self, graph, node, key, branch, turn, tick, value):
@@ -427,17 +740,17 @@ class QueryEngine(object):
         self._nodevals2set.append((graph, node, key, branch, turn, tick, value))
 
     def node_val_del_time(self, branch, turn, tick):
-        self._flush_node_val()
+        self.flush()
         self.sql('node_val_del_time', branch, turn, tick)
         self._btts.discard((branch, turn, tick))
 
-    def edges_dump(self):
-        """Dump the entire contents of the edges table."""
-        self._flush_edges()
+    def edges_dump(self, window=None):
+        """Dump the entire contents of the edges table, or a ``window`` of it."""
+        self.flush()
         unpack = self.unpack
         for (
                 graph, orig, dest, idx, branch, turn, tick, extant
-        ) in self.sql('edges_dump'):
+        ) in self._dump('edges', window):
             yield (
                 unpack(graph),
                 unpack(orig),
@@ -458,8 +771,10 @@ class QueryEngine(object):
         start = monotonic()
         if not self._edges2set:
             return
-        self.sqlmany('edges_insert', *map(self._pack_edge2set, self._edges2set))
+        self._write_many(
+            'edges_insert', map(self._pack_edge2set, self._edges2set))
         self._edges2set = []
+        self._exist_edge_stuff = (self._btts, self._edges2set)
         QueryEngine.flush_edges_t += monotonic() - start
 
     def exist_edge(self, graph, orig, dest, idx, branch, turn, tick, extant):
@@ -471,17 +786,17 @@ class QueryEngine(object):
         edges2set.append((graph, orig, dest, idx, branch, turn, tick, extant))
 
     def edges_del_time(self, branch, turn, tick):
-        self._flush_edges()
+        self.flush()
         self.sql('edges_del_time', branch, turn, tick)
         self._btts.discard((branch, turn, tick))
 
-    def edge_val_dump(self):
-        """Yield the entire contents of the edge_val table."""
-        self._flush_edge_val()
+    def edge_val_dump(self, window=None):
+        """Yield the entire contents of the edge_val table, or a ``window`` of it."""
+        self.flush()
         unpack = self.unpack
         for (
                 graph, orig, dest, idx, key, branch, turn, tick, value
-        ) in self.sql('edge_val_dump'):
+        ) in self._dump('edge_val', window):
             yield (
                 unpack(graph),
                 unpack(orig),
@@ -494,6 +809,16 @@ class QueryEngine(object):
                 unpack(value)
             )
 
+    def edge_val_history(
+            self, graph, orig, dest, idx, key, branch, turn_from, turn_to
+    ):
+        """Yield ``(turn, tick, value)`` for each change to an edge stat"""
+        pack = self.pack
+        return self._history(
+            'edge_val', (pack(graph), pack(orig), pack(dest), idx, pack(key)),
+            branch, turn_from, turn_to
+        )
+
     def _pack_edgeval2set(self, tup):
         graph, orig, dest, idx, key, branch, turn, tick, value = tup
         pack = self.pack
@@ -502,8 +827,12 @@ class QueryEngine(object):
     def _flush_edge_val(self):
         if not self._edgevals2set:
             return
-        self.sqlmany('edge_val_insert', *map(self._pack_edgeval2set, self._edgevals2set))
+        self._write_many(
+            'edge_val_insert',
+            map(self._pack_edgeval2set, self._edgevals2set)
+        )
         self._edgevals2set = []
+        self._edge_val_set_stuff = (self._btts, self._edgevals2set)
 
     def edge_val_set(self, graph, orig, dest, idx, key, branch, turn, tick, value):
         """Set this key of this edge to this value."""
@@ -515,7 +844,7 @@ class QueryEngine(object):
         )
 
     def edge_val_del_time(self, branch, turn, tick):
-        self._flush_edge_val()
+        self.flush()
         self.sql('edge_val_del_time', branch, turn, tick)
         self._btts.discard((branch, turn, tick))
 
@@ -577,16 +906,36 @@ class QueryEngine(object):
             except OperationalError:
                 cursor.execute(strings['create_' + table])
 
-    def flush(self):
-        """Put all pending changes into the SQL transaction."""
+    def _flush_buffers(self):
         self._flush_nodes()
         self._flush_edges()
         self._flush_graph_val()
         self._flush_node_val()
         self._flush_edge_val()
 
+    def flush(self):
+        """Put all pending changes into the SQL transaction.
+
+        With write-behind, wait for the thread to do it.
+
+        """
+        self._flush_buffers()
+        if self._writer is not None:
+            self._handoff()
+            self._writeq.join()
+            self._raise_writer_error()
+
     def commit(self):
-        """Commit the transaction"""
+        """Commit the transaction
+
+        With write-behind, just have the thread commit after it's
+        written everything so far.
+
+        """
+        if self._writer is not None:
+            self._flush_buffers()
+            self._handoff(_COMMIT)
+            return
         self.flush()
         if hasattr(self, 'transaction') and self.transaction.is_active:
             self.transaction.commit()
@@ -596,5 +945,11 @@ class QueryEngine(object):
     def close(self):
         """Commit the transaction, then close the connection"""
         self.commit()
+        if self._writer is not None:
+            self._writeq.put(None)
+            self._writer.join()
+            self._writer = None
+            self._lock = NoLock()
+            self._raise_writer_error()
         if hasattr(self, 'connection'):
             self.connection.close()
@@ -0,0 +1,25 @@
+from .. import ORM
+from ..cache import Cache
+
+
+def test_shallowest_bounded():
+    orm = ORM('sqlite:///:memory:', shallowest_maxsize=8)
+    assert orm._node_val_cache.shallowest_maxsize == 8
+    cache = Cache(orm)
+    for i in range(20):
+        cache.store('g', 'n', 'k', 'trunk', i, 0, i)
+    stats = cache.shallowest_stats()
+    assert stats['size'] == 8
+    assert stats['maxsize'] == 8
+    assert stats['evictions'] == 12
+    hits, misses = stats['hits'], stats['misses']
+    assert cache.retrieve('g', 'n', 'k', 'trunk', 19, 0) == 19
+    assert cache.shallowest_stats()['hits'] == hits + 1
+    assert cache.retrieve('g', 'n', 'k', 'trunk', 0, 0) == 0
+    stats = cache.shallowest_stats()
+    assert stats['misses'] == misses + 1
+    assert stats['size'] == 8
+    assert stats['evictions'] == 13
+    # the entry just looked up is now the most recently used
+    assert next(reversed(cache.shallowest)) == ('g', 'n', 'k', 'trunk', 0, 0)
+    orm.close()
@@ -1,6 +1,7 @@
 import pytest
 import os
 from LiSE.allegedb import ORM
+from LiSE.allegedb.query import FetchedCursor
 import networkx as nx
 
 
@@ -108,4 +109,121 @@ def test_keyframe_load(db):
             if graph.is_multigraph():
                 assert db._edge_val_cache.keyframe[(graph.name,) + edge]['trunk'][0][0] == graph.edges[edge]
             else:
-                assert db._edge_val_cache.keyframe[(graph.name,) + edge + (0,)]['trunk'][0][0] == graph.edges[edge]
\ No newline at end of file
+                assert db._edge_val_cache.keyframe[(graph.name,) + edge + (0,)]['trunk'][0][0] == graph.edges[edge]
+
+
+def test_windowed_load(tmpdbfile):
+    def state(orm):
+        g = orm.graph['g']
+        return (
+            sorted(g.node), {n: dict(g.node[n]) for n in g.node},
+            sorted((o, d, dict(g.adj[o][d])) for o in g.adj for d in g.adj[o]),
+            dict(g.graph)
+        )
+    expected = {}
+    with ORM('sqlite:///' + tmpdbfile) as orm:
+        g = orm.new_digraph('g')
+        for i in range(5):
+            g.add_node(i, val=0)
+        for turn in range(1, 40):
+            orm.turn = turn
+            g.node[turn % 5]['val'] = turn
+            g.graph['turn'] = turn
+            if turn % 7 == 0:
+                g.add_node(100 + turn)
+            g.add_edge(turn % 5, (turn + 1) % 5, w=turn)
+            if turn % 10 == 0:
+                orm.snap_keyframe()
+        for turn in range(40):
+            orm.turn = turn
+            expected['trunk', turn] = state(orm)
+        orm.turn = 25
+        orm.branch = 'b'
+        for turn in range(25, 30):
+            orm.turn = turn
+            g.node[0]['val'] = -turn
+            expected['b', turn] = state(orm)
+        orm.branch = 'trunk'
+        orm.turn = 39
+    with ORM('sqlite:///' + tmpdbfile, history_window=5) as orm:
+        assert orm._loaded == {'trunk': 30}
+        for turn in range(39, 29, -1):
+            orm.turn = turn
+            assert state(orm) == expected['trunk', turn]
+        assert orm._loaded == {'trunk': 30}
+        delta = orm.get_delta('trunk', 39, 0, 15, 0)
+        assert orm._loaded == {'trunk': 10}
+        assert delta['g']['turn'] == 14  # turn 15 hasn't happened at tick 0
+        orm.turn = 25
+        orm.branch = 'b'
+        for turn in range(29, 24, -1):
+            orm.turn = turn
+            assert state(orm) == expected['b', turn]
+        orm.branch = 'trunk'
+        for turn in range(29, -1, -1):
+            orm.turn = turn
+            assert state(orm) == expected['trunk', turn]
+        assert orm._loaded == {'trunk': 0, 'b': 25}
+
+
+def test_keyframe_policy(tmpdbfile):
+    with ORM(
+        'sqlite:///' + tmpdbfile, keyframe_interval=5, keyframe_changes=10,
+        keyframe_on_branch=True
+    ) as orm:
+        g = orm.new_digraph('g')
+        g.add_node(0)
+        for turn in range(1, 13):
+            orm.turn = turn
+            g.node[0]['turn'] = turn
+        assert orm._keyframe_turns['trunk']['g'] == {1, 6, 11}
+        for i in range(25):
+            g.node[0][i] = i
+        assert len(orm._new_keyframes) == 5
+        orm.branch = 'b'
+        assert orm._keyframe_turns['b']['g'] == {12}
+    with ORM('sqlite:///' + tmpdbfile) as orm:
+        assert len(list(orm.query.keyframes_list())) == 6
+        assert orm._keyframe_turns['trunk']['g'] == {1, 6, 11, 12}
+
+
+def test_write_behind(tmpdbfile):
+    def state(orm):
+        g = orm.graph['g']
+        return (
+            {n: dict(g.node[n]) for n in g.node},
+            sorted((o, d, dict(g.adj[o][d])) for o in g.adj for d in g.adj[o])
+        )
+    expected = {}
+    with ORM(
+        'sqlite:///' + tmpdbfile, write_behind={'size': 10, 'maxsize': 1}
+    ) as orm:
+        g = orm.new_digraph('g')
+        for turn in range(1, 30):
+            orm.turn = turn
+            g.add_node(turn, val=turn)
+            g.add_edge(turn - 1, turn, w=turn)
+            g.node[0]['turn'] = turn
+            if turn % 10 == 0:
+                orm.commit()
+        for turn in range(30):
+            orm.turn = turn
+            expected[turn] = state(orm)
+        stats = orm.query.write_behind_stats()
+        assert stats['batches'] > 1
+        # reads don't leave a cursor open on the writer's connection
+        assert isinstance(orm.query.sql('graphs_types'), FetchedCursor)
+        assert stats['commits'] == 2
+    with ORM('sqlite:///' + tmpdbfile) as orm:
+        for turn in range(30):
+            orm.turn = turn
+            assert state(orm) == expected[turn]
+
+
+def test_profile_alchemy(tmpdbfile):
+    pytest.importorskip('sqlalchemy')
+    with ORM(
+        'sqlite:///' + tmpdbfile, connect_args={'profile': 'fast'}
+    ) as orm:
+        assert orm.query.alchemist.conn.execute(
+            'PRAGMA journal_mode;').fetchone()[0] == 'wal'
@@ -1,4 +1,7 @@
-from ..window import WindowDict
+from ..window import (
+    WindowDict, ArrayWindowDict, FuturistArrayWindowDict, SettingsTurnDict,
+    TurnDict, FuturistWindowDict
+)
 from .. import HistoryError, ORM
 from itertools import cycle
 import pytest
@@ -164,3 +167,184 @@ def test_set():
         wd[5] = g.node[5]['ham']
         assert wd[5] == {'spam': 'beans'}
         assert wd[5] == g.node[5]['ham']
+
+
+def test_seek_far():
+    wd = WindowDict({i * 2: i for i in range(1000)})
+    for rev in (1999, 0, 1500, 1, 777, 778, 1998, -1, 5000, 3):
+        wd.seek(rev)
+        assert all(r <= rev for r, _ in wd._past)
+        assert all(r > rev for r, _ in wd._future)
+        assert [r for r, _ in wd._past] == sorted(r for r, _ in wd._past)
+        assert [r for r, _ in wd._future] == sorted(
+            (r for r, _ in wd._future), reverse=True)
+        if rev < 0:
+            with pytest.raises(HistoryError):
+                wd[rev]
+        else:
+            assert wd[rev] == min((rev // 2, 999))
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('n', [10 ** 3, 10 ** 4, 10 ** 5, 10 ** 6])
+def test_random_access_benchmark(n, record_property):
+    from random import Random
+    from time import monotonic
+    wd = WindowDict(zip(range(0, n * 3, 3), range(n)))
+    rando = Random(n)
+    revs = [rando.randrange(n * 3) for _ in range(1000)]
+    start = monotonic()
+    for rev in revs:
+        assert wd[rev] == rev // 3
+    elapsed = monotonic() - start
+    record_property('microseconds_per_lookup', elapsed * 1000)
+    assert len(wd._past) + len(wd._future) == n
+    assert wd._past[-1][0] <= revs[-1]
+    assert not wd._future or wd._future[-1][0] > revs[-1]
+    assert all(a[0] < b[0] for a, b in zip(wd._past, wd._past[1:]))
+    assert all(a[0] > b[0] for a, b in zip(wd._future, wd._future[1:]))
+
+
+def test_array_windowdict():
+    from random import Random
+    rando = Random(0)
+    data = [(i, rando.randrange(1000)) for i in range(0, 300, 3)]
+    windd = WindowDict(data)
+    arrd = ArrayWindowDict(data)
+    assert arrd._vals.typecode == 'q'
+    for _ in range(200):
+        rev = rando.randrange(-5, 320)
+        if rev < 0:
+            with pytest.raises(HistoryError):
+                arrd[rev]
+            windd.seek(rev)
+        else:
+            assert arrd[rev] == windd[rev]
+        assert list(arrd.past().items()) == list(windd.past().items())
+        assert list(arrd.future().items()) == list(windd.future().items())
+        assert arrd.rev_before(rev) == windd.rev_before(rev)
+        assert arrd.rev_after(rev) == windd.rev_after(rev)
+        assert (rev in arrd) == (rev in windd)
+    assert list(arrd.keys()) == list(windd.keys())
+    assert list(arrd.items()) == sorted(windd.items())
+    assert list(arrd[30:60]) == list(WindowDict(data)[30:60])
+    assert list(arrd[60:30]) == list(WindowDict(data)[60:30])
+    arrd[31] = windd[31] = 5
+    arrd[150] = windd[150] = 6
+    del arrd[33]
+    del windd[33]
+    assert list(arrd.items()) == sorted(windd.items())
+    arrd.truncate(200)
+    windd.truncate(200)
+    assert list(arrd.items()) == sorted(windd.items())
+    assert arrd.end == 198
+    assert arrd.initial() == windd.initial()
+    assert arrd.final() == windd.final()
+
+
+def test_array_windowdict_slices():
+    data = [(i, i * 10) for i in range(0, 30, 3)]
+    arrd = ArrayWindowDict(data)
+    assert not hasattr(arrd, '_past')
+    bounds = [None, 0, 4, 6, 15, 27, 40]
+    for start in bounds:
+        for stop in bounds:
+            for step in (None, 2, -2):
+                slic = slice(start, stop, step)
+                if step == -2 and not (start or 27) > (stop or 0):
+                    continue
+                assert list(arrd[slic]) == list(WindowDict(data)[slic]), slic
+                assert list(reversed(arrd[slic])) \
+                    == list(reversed(WindowDict(data)[slic])), slic
+    past = arrd.past(10)
+    assert 9 in past and 12 not in past
+    assert past[6] == 60
+    assert dict(arrd.future(10)) == {i: i * 10 for i in range(12, 30, 3)}
+    assert (9, 90) in arrd.items() and (9, 91) not in arrd.items()
+    assert 90 in arrd.values()
+    assert arrd.snapshot() == data
+
+
+def test_array_windowdict_fallback():
+    arrd = ArrayWindowDict({0: 1.5, 1: 2.5})
+    assert arrd._vals.typecode == 'd'
+    arrd[2] = 3
+    assert type(arrd._vals) is list
+    arrd[3] = None
+    assert arrd[2] == 3
+    assert type(arrd[2]) is int
+    assert arrd[3] is None
+    assert arrd[1] == 2.5
+    assert ArrayWindowDict({0: True})._vals == [True]
+    assert ArrayWindowDict({0: 2 ** 64})._vals == [2 ** 64]
+
+
+def test_futurist_array_windowdict():
+    arrd = FuturistArrayWindowDict({0: 1})
+    arrd[5] = 2
+    arrd[5] = 3
+    with pytest.raises(HistoryError):
+        arrd[4] = 4
+    assert arrd[5] == 3
+
+    class Wrapper:
+        def unwrap(self):
+            return 'unwrapped'
+
+    arrd[6] = Wrapper()
+    assert arrd[6] == 'unwrapped'
+
+
+def test_turndicts_choose_arrays():
+    std = SettingsTurnDict()
+    std[0] = {0: 1, 2: 3}
+    std[1] = {0: 'spam'}
+    std[2] = {0: 1, 1: 2.0}
+    std[3] = FuturistWindowDict({0: 0.5})
+    assert type(std[0]) is ArrayWindowDict
+    assert type(std[1]) is WindowDict
+    assert type(std[2]) is WindowDict
+    assert type(std[3]) is ArrayWindowDict
+    assert std[3][0] == 0.5
+    td = TurnDict()
+    td[0] = {0: 1}
+    td[1] = {0: None}
+    assert type(td[0]) is FuturistArrayWindowDict
+    assert type(td[1]) is FuturistWindowDict
+
+
+def test_numeric_stat_cache():
+    with ORM('sqlite:///:memory:') as orm:
+        g = orm.new_digraph('g')
+        g.add_node(0)
+        for turn in range(10):
+            orm.turn = turn
+            g.node[0]['hunger'] = turn * 2
+        branch = orm._node_val_cache.branches['g', 0, 'hunger']['trunk']
+        assert type(branch[5]) is ArrayWindowDict
+        g.node[0]['hunger'] = 'ravenous'
+        for turn in range(9):
+            orm.turn = turn
+            assert g.node[0]['hunger'] == turn * 2
+        orm.turn = 9
+        assert g.node[0]['hunger'] == 'ravenous'
+
+
+def test_snapshot():
+    data = [(i * 2, i) for i in range(100)]
+    for cls in (WindowDict, ArrayWindowDict):
+        wd = cls(data)
+        for rev in (-1, 37, 199, 100):
+            wd.seek(rev)
+            assert wd.snapshot() == data
+
+
+def test_replace():
+    for cls in (FuturistWindowDict, FuturistArrayWindowDict):
+        wd = cls({0: 1, 2: 3, 4: 5})
+        wd.replace(2, 4)
+        wd.replace(0, 2)
+        assert wd.snapshot() == [(0, 2), (2, 4), (4, 5)]
+        assert wd[3] == 4
+        with pytest.raises(HistoryError):
+            wd.replace(3, 0)
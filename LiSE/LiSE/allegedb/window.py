@@ -21,8 +21,12 @@ you asked for (and thus, keys must be orderable). It is optimized for retrieval
 of the same key and neighboring ones repeatedly and in sequence.
 
 """
+from array import array
+from bisect import bisect_left, bisect_right
 from collections import deque
-from collections.abc import Mapping, MutableMapping, KeysView, ItemsView, ValuesView
+from collections.abc import (
+    Mapping, MutableMapping, Sequence, KeysView, ItemsView, ValuesView
+)
 from operator import itemgetter, lt, le
 from itertools import chain
 try:
@@ -40,12 +44,20 @@ except ImportError:
 get0 = itemgetter(0)
 get1 = itemgetter(1)
 
+SEEK_BISECT_THRESHOLD = 32
+"""How many revisions a seek has to skip before I bisect instead of stepping"""
+
 # TODO: cancel changes that would put something back to where it was at the start
 # This will complicate the update_window functions though, and I don't think it'll
 # improve much apart from a bit of efficiency in that the deltas are smaller
 # sometimes.
 def update_window(turn_from, tick_from, turn_to, tick_to, updfun, branchd):
     """Iterate over a window of time in ``branchd`` and call ``updfun`` on the values"""
+    if turn_from == turn_to:
+        if turn_from in branchd:
+            for past_state in branchd[turn_from][tick_from+1:tick_to+1]:
+                updfun(*past_state)
+        return
     if turn_from in branchd:
         # Not including the exact tick you started from because deltas are *changes*
         for past_state in branchd[turn_from][tick_from+1:]:
@@ -61,8 +73,14 @@ def update_window(turn_from, tick_from, turn_to, tick_to, updfun, branchd):
 
 def update_backward_window(turn_from, tick_from, turn_to, tick_to, updfun, branchd):
     """Iterate backward over a window of time in ``branchd`` and call ``updfun`` on the values"""
+    if turn_from == turn_to:
+        if turn_from in branchd:
+            for future_state in reversed(
+                    branchd[turn_from][tick_to+1:tick_from+1]):
+                updfun(*future_state)
+        return
     if turn_from in branchd:
-        for future_state in reversed(branchd[turn_from][:tick_from]):
+        for future_state in reversed(branchd[turn_from][:tick_from+1]):
             updfun(*future_state)
     for midturn in range(turn_from-1, turn_to, -1):
         if midturn in branchd:
@@ -92,10 +110,37 @@ def within_history(rev, windowdict):
     return begin <= rev <= end
 
 
+def bisect_past(past, rev):
+    """Return the index of the first item in ``past`` that is after ``rev``
+
+    ``past`` is in ascending order, like ``WindowDict._past``.
+
+    """
+    # Comparing with a 1-tuple means the values never get compared
+    return bisect_left(past, (rev + 1,))
+
+
+def bisect_future(future, rev):
+    """Return the index of the first item in ``future`` at or before ``rev``
+
+    ``future`` is in descending order, like ``WindowDict._future``.
+
+    """
+    lo = 0
+    hi = len(future)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if future[mid][0] <= rev:
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
 class WindowDictKeysView(KeysView):
     """Look through all the keys a WindowDict contains."""
     def __contains__(self, rev):
-        return rev in self._mapping._keys
+        return rev in self._mapping
 
     def __iter__(self):
         past = self._mapping._past
@@ -323,11 +368,10 @@ class WindowDictSlice:
                     return
                 cmp = le
             it = iter(past)
-            p0, p1 = next(it)
-            while cmp(p0, left):
-                p0, p1 = next(it)
-            else:
-                yield p1
+            for p0, p1 in it:
+                if not cmp(p0, left):
+                    yield p1
+                    break
             yield from map(get1, it)
         elif slic.start is None:
             stac = dic._past + list(reversed(dic._future))
@@ -380,7 +424,8 @@ class WindowDictReverseSlice:
                 left, right = slic.start, slic.stop
                 dic.seek(right)
                 it = reversed(dic._past)
-                next(it)
+                if dic._past and dic._past[-1][0] == right:
+                    next(it)
                 cmp = lt
             else:
                 left, right = slic.stop, slic.start
@@ -449,15 +494,34 @@ class WindowDict(MutableMapping):
 
     @cython.locals(rev=cython.int, past_end=cython.int, future_start=cython.int)
     def seek(self, rev):
-        """Arrange the caches to help look up the given revision."""
-        # TODO: binary search? Perhaps only when one or the other
-        # stack is very large?
+        """Arrange the caches to help look up the given revision.
+
+        Short hops move revisions from one stack to the other one at a
+        time. When at least ``SEEK_BISECT_THRESHOLD`` revisions are in the
+        way, bisect to find where to split the stack, and move the whole
+        run at once.
+
+        """
         if rev == self._last:
             return
         if type(rev) is not int:
             raise TypeError("rev must be int")
         past = self._past
         future = self._future
+        if len(future) > SEEK_BISECT_THRESHOLD \
+                and future[-SEEK_BISECT_THRESHOLD][0] <= rev:
+            i = bisect_future(future, rev)
+            past.extend(reversed(future[i:]))
+            del future[i:]
+            self._last = rev
+            return
+        if len(past) > SEEK_BISECT_THRESHOLD \
+                and past[-SEEK_BISECT_THRESHOLD][0] > rev:
+            i = bisect_past(past, rev)
+            future.extend(reversed(past[i:]))
+            del past[i:]
+            self._last = rev
+            return
         if future:
             appender = past.append
             popper = future.pop
@@ -522,6 +586,33 @@ class WindowDict(MutableMapping):
         if not self._past:
             self.beginning = self.end = None
 
+    def replace(self, rev, v):
+        """Change the value I already have at ``rev``
+
+        Unlike setting it, this doesn't add a revision, so it's allowed
+        even in a :class:`FuturistWindowDict` with history after ``rev``.
+
+        """
+        if rev not in self._keys:
+            raise HistoryError("Rev not present: {}".format(rev))
+        self.seek(rev)
+        self._past[-1] = (rev, v)
+
+    def snapshot(self):
+        """Return a list of all my ``(rev, value)`` pairs, in order.
+
+        Unlike iterating over me, this doesn't seek, so another thread
+        may look things up in me meanwhile. If it moves revisions
+        between my stacks while I'm copying them, I try again.
+
+        """
+        while True:
+            items = self._past[:]
+            items.extend(reversed(self._future[:]))
+            if len(items) == len(self._keys) and all(
+                    a[0] < b[0] for (a, b) in zip(items, items[1:])):
+                return items
+
     def keys(self):
         return WindowDictKeysView(self)
 
@@ -659,21 +750,392 @@ class FuturistWindowDict(WindowDict):
         self._keys.add(rev)
 
 
+ARRAY_TYPECODES = {int: 'q', float: 'd'}
+
+
+def array_typecode(values):
+    """Return the type code for an array that could hold all the values
+
+    Or ``None`` if they aren't all ``int``, or all ``float``, or if there
+    aren't any.
+
+    """
+    typ = None
+    for v in values:
+        if typ is None:
+            typ = type(v)
+            if typ not in ARRAY_TYPECODES:
+                return
+        elif type(v) is not typ:
+            return
+        if typ is int and not -2 ** 63 <= v < 2 ** 63:
+            return
+    if typ is not None:
+        return ARRAY_TYPECODES[typ]
+
+
+class ArrayWindowDictStack(Sequence):
+    """Some of an ArrayWindowDict's ``(rev, value)`` pairs, without copying
+
+    Looks like a WindowDict's ``_past``, or with ``reverse=True``, like
+    its ``_future``, so the past and future views can use it.
+
+    """
+    __slots__ = ('_revs', '_vals', '_start', '_stop', '_reverse')
+
+    def __init__(self, revs, vals, start, stop, reverse=False):
+        self._revs = revs
+        self._vals = vals
+        self._start = start
+        self._stop = stop
+        self._reverse = reverse
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, i):
+        n = self._stop - self._start
+        if i < 0:
+            i += n
+        if not 0 <= i < n:
+            raise IndexError(i)
+        j = self._stop - 1 - i if self._reverse else self._start + i
+        return self._revs[j], self._vals[j]
+
+
+class ArrayWindowDictItemsView(ItemsView):
+    def __contains__(self, item):
+        (rev, v) = item
+        mapp = self._mapping
+        return rev in mapp and mapp[rev] == v
+
+    def __iter__(self):
+        mapp = self._mapping
+        return zip(mapp._revs, mapp._vals)
+
+
+class ArrayWindowDictValuesView(ValuesView):
+    def __contains__(self, value):
+        return value in self._mapping._vals
+
+    def __iter__(self):
+        return iter(self._mapping._vals)
+
+
+class ArrayWindowDictSlice:
+    """A slice of an ArrayWindowDict's history
+
+    Gets the same values as :class:`WindowDictSlice` or, with
+    ``reverse=True``, :class:`WindowDictReverseSlice`, but by bisecting.
+
+    """
+    __slots__ = ['dict', 'slice', 'reverse']
+
+    def __init__(self, dict, slice, reverse=False):
+        self.dict = dict
+        self.slice = slice
+        self.reverse = reverse
+
+    def __reversed__(self):
+        return iter(ArrayWindowDictSlice(
+            self.dict, self.slice, not self.reverse))
+
+    def __iter__(self):
+        dic = self.dict
+        if not dic:
+            return
+        slic = self.slice
+        start, stop = slic.start, slic.stop
+        if slic.step is not None:
+            if self.reverse:
+                revs = range(start or dic.end, stop or dic.beginning,
+                             slic.step)
+            else:
+                revs = range(start or dic.beginning, stop or dic.end + 1,
+                             slic.step)
+            for i in revs:
+                yield dic[i]
+            return
+        revs = dic._revs
+        if start is None and stop is None:
+            lo, hi = 0, len(revs)
+        elif start is None:
+            lo, hi = 0, bisect_left(revs, stop)
+        elif stop is None:
+            lo, hi = bisect_left(revs, start), len(revs)
+        elif start == stop:
+            yield dic[stop]
+            return
+        elif start < stop:
+            lo, hi = bisect_left(revs, start), bisect_left(revs, stop)
+        else:
+            lo, hi = bisect_right(revs, stop), bisect_right(revs, start)
+        vals = dic._vals[lo:hi]
+        if self.reverse:
+            yield from reversed(vals)
+        else:
+            yield from vals
+
+
+class ArrayWindowDict(WindowDict):
+    """A WindowDict that keeps its revisions and values in arrays.
+
+    Meant for stats that are always numbers. Rather than a tuple per
+    revision, I keep one ``array('q')`` of revisions and one array of
+    values, of ``int`` or ``float`` according to what I was made with.
+    Seeking is a bisection of the revisions.
+
+    If you put a value in me that the values array can't hold, I'll move
+    the values into a plain list and carry on as before, using about as
+    much memory as a normal WindowDict.
+
+    """
+    __slots__ = ('_revs', '_vals', '_idx')
+
+    def future(self, rev=None):
+        """Return a Mapping of items after the given revision.
+
+        Default revision is the last one looked up.
+
+        """
+        if rev is not None:
+            self.seek(rev)
+        return WindowDictFutureView(ArrayWindowDictStack(
+            self._revs, self._vals, self._idx, len(self._revs),
+            reverse=True))
+
+    def past(self, rev=None):
+        """Return a Mapping of items at or before the given revision.
+
+        Default revision is the last one looked up.
+
+        """
+        if rev is not None:
+            self.seek(rev)
+        return WindowDictPastView(ArrayWindowDictStack(
+            self._revs, self._vals, 0, self._idx))
+
+    def keys(self):
+        return KeysView(self)
+
+    def items(self):
+        return ArrayWindowDictItemsView(self)
+
+    def values(self):
+        return ArrayWindowDictValuesView(self)
+
+    def __init__(self, data=None):
+        if not data:
+            items = []
+        elif hasattr(data, 'items'):
+            items = sorted(data.items(), key=get0)
+        else:
+            items = sorted(data, key=get0)
+        self._revs = revs = array('q', map(get0, items))
+        vals = list(map(get1, items))
+        typecode = array_typecode(vals)
+        self._vals = vals if typecode is None else array(typecode, vals)
+        self._idx = len(revs)
+        self.beginning = revs[0] if revs else None
+        self.end = revs[-1] if revs else None
+        self._last = None
+
+    def seek(self, rev):
+        """Arrange the caches to help look up the given revision."""
+        if rev == self._last:
+            return
+        if type(rev) is not int:
+            raise TypeError("rev must be int")
+        self._idx = bisect_right(self._revs, rev)
+        self._last = rev
+
+    def rev_before(self, rev: int) -> int:
+        """Return the latest past rev on which the value changed."""
+        self.seek(rev)
+        if self._idx:
+            return self._revs[self._idx - 1]
+
+    def rev_after(self, rev: int) -> int:
+        """Return the earliest future rev on which the value will change."""
+        self.seek(rev)
+        if self._idx < len(self._revs):
+            return self._revs[self._idx]
+
+    def initial(self):
+        """Return the earliest value we have"""
+        if not self._vals:
+            raise KeyError("No data")
+        return self._vals[0]
+
+    def final(self):
+        """Return the latest value we have"""
+        if not self._vals:
+            raise KeyError("No data")
+        return self._vals[-1]
+
+    def truncate(self, rev: int) -> None:
+        """Delete everything after the given revision."""
+        self.seek(rev)
+        idx = self._idx
+        del self._revs[idx:]
+        del self._vals[idx:]
+        if self._revs:
+            self.end = self._revs[-1]
+        else:
+            self.beginning = self.end = None
+
+    def replace(self, rev, v):
+        """Change the value I already have at ``rev``"""
+        if rev not in self:
+            raise HistoryError("Rev not present: {}".format(rev))
+        ArrayWindowDict.__setitem__(self, rev, v)
+
+    def snapshot(self):
+        """Return a list of all my ``(rev, value)`` pairs, in order.
+
+        If another thread changes me while I'm copying my revisions and
+        values, I try again.
+
+        """
+        while True:
+            revs = self._revs[:]
+            vals = self._vals[:]
+            if len(vals) == len(revs) and self._revs == revs:
+                return list(zip(revs, vals))
+
+    def __bool__(self):
+        return bool(self._revs)
+
+    def __iter__(self):
+        return iter(self._revs)
+
+    def __contains__(self, item):
+        if type(item) is not int:
+            return False
+        revs = self._revs
+        i = bisect_left(revs, item)
+        return i < len(revs) and revs[i] == item
+
+    def __len__(self):
+        return len(self._revs)
+
+    def __getitem__(self, rev):
+        if isinstance(rev, slice):
+            return ArrayWindowDictSlice(
+                self, rev, None not in (rev.start, rev.stop)
+                and rev.start > rev.stop)
+        self.seek(rev)
+        if not self._idx:
+            raise HistoryError(
+                "Revision {} is before the start of history".format(rev)
+            )
+        return self._vals[self._idx - 1]
+
+    def _check_val(self, v):
+        vals = self._vals
+        if type(vals) is not list and \
+                array_typecode((v,)) != vals.typecode:
+            self._vals = list(vals)
+
+    def __setitem__(self, rev, v):
+        self.seek(rev)
+        self._check_val(v)
+        revs = self._revs
+        vals = self._vals
+        idx = self._idx
+        if idx and revs[idx - 1] == rev:
+            vals[idx - 1] = v
+            return
+        revs.insert(idx, rev)
+        vals.insert(idx, v)
+        self._idx = idx + 1
+        if self.beginning is None or rev < self.beginning:
+            self.beginning = rev
+        if self.end is None or rev > self.end:
+            self.end = rev
+
+    def __delitem__(self, rev):
+        if not self:
+            raise HistoryError("Tried to delete from an empty WindowDict")
+        if not self.beginning <= rev <= self.end:
+            raise HistoryError("Rev outside of history: {}".format(rev))
+        self.seek(rev)
+        revs = self._revs
+        idx = self._idx
+        if not idx or revs[idx - 1] != rev:
+            raise HistoryError("Rev not present: {}".format(rev))
+        del revs[idx - 1]
+        del self._vals[idx - 1]
+        self._idx = idx - 1
+        if revs:
+            self.beginning = revs[0]
+            self.end = revs[-1]
+        else:
+            self.beginning = self.end = None
+
+    def __repr__(self):
+        return "{}({})".format(
+            self.__class__.__name__, dict(zip(self._revs, self._vals)))
+
+
+class FuturistArrayWindowDict(ArrayWindowDict):
+    """An ArrayWindowDict that does not let you rewrite the past."""
+    __slots__ = ()
+
+    def __setitem__(self, rev, v):
+        if hasattr(v, 'unwrap') and not hasattr(v, 'no_unwrap'):
+            v = v.unwrap()
+        if self.end is not None and rev < self.end:
+            raise HistoryError(
+                "Already have some history after {}".format(rev)
+            )
+        super().__setitem__(rev, v)
+
+
+def coerce_turn(turndict, value):
+    """Return ``value`` as the kind of WindowDict ``turndict`` holds turns in
+
+    That's ``turndict.array_cls`` if every value is a number of the same
+    type, otherwise ``turndict.cls``.
+
+    """
+    typ = type(value)
+    if typ is turndict.cls or typ is turndict.array_cls:
+        return value
+    if turndict.array_cls is not None and array_typecode(
+            value.values() if hasattr(value, 'values')
+            else map(get1, value)) is not None:
+        return turndict.array_cls(value)
+    return turndict.cls(value)
+
+
 class TurnDict(FuturistWindowDict):
+    """A FuturistWindowDict of FuturistWindowDicts, keyed by turn, then tick
+
+    Turns whose values are all numbers get FuturistArrayWindowDicts
+    instead, unless ``array_cls`` is ``None``.
+
+    """
     __slots__ = ('_future', '_past')
     cls = FuturistWindowDict
+    array_cls = FuturistArrayWindowDict
 
     def __setitem__(self, turn, value):
-        if type(value) is not FuturistWindowDict:
-            value = FuturistWindowDict(value)
+        value = coerce_turn(self, value)
         FuturistWindowDict.__setitem__(self, turn, value)
 
 
 class SettingsTurnDict(WindowDict):
+    """A WindowDict of WindowDicts, keyed by turn, then tick
+
+    Turns whose values are all numbers get ArrayWindowDicts instead,
+    unless ``array_cls`` is ``None``.
+
+    """
     __slots__ = ('_future', '_past')
     cls = WindowDict
+    array_cls = ArrayWindowDict
 
     def __setitem__(self, turn, value):
-        if type(value) is not WindowDict:
-            value = WindowDict(value)
+        value = coerce_turn(self, value)
         WindowDict.__setitem__(self, turn, value)
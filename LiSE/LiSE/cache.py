@@ -13,6 +13,17 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
+from collections import OrderedDict
+
+from networkx import (
+    DiGraph,
+    astar_path,
+    astar_path_length,
+    shortest_path,
+    shortest_path_length,
+    single_source_dijkstra_path_length
+)
+
 from .allegedb.cache import (
     Cache,
     PickyDefaultDict,
@@ -21,7 +32,6 @@ from .allegedb.cache import (
     HistoryError
 )
 from .util import singleton_get, sort_set
-from collections import OrderedDict
 
 
 class InitializedCache(Cache):
@@ -474,6 +484,8 @@ class ThingsCache(Cache):
         except KeyError:
             oldloc = None
         super().store(*args, planning=planning, loading=loading, contra=contra)
+        if oldloc is not None and self.watcher is not None:
+            self.watcher((character, oldloc), 'contents', branch, turn)
         node_contents_cache = self.db._node_contents_cache
         # Cache the contents of nodes
         if oldloc is not None:
@@ -481,19 +493,10 @@ class ThingsCache(Cache):
             newconts_orig = oldconts_orig.difference({thing})
             node_contents_cache.store(character, oldloc, branch, turn, tick, newconts_orig, contra=False,
                                       loading=True)
-            future_location_data = node_contents_cache.settings[branch].future(turn)
-            todo = []
-            for trn in future_location_data:
-                for tck in future_location_data[trn]:
-                    char, loca, contents = future_location_data[trn][tck]
-                    if char == character and loca == oldloc:
-                        todo.append((trn, tck))
-            for trn, tck in todo:
-                node_contents_cache.store(
-                    character, oldloc, branch, trn, tck,
-                    node_contents_cache.retrieve(character, oldloc, branch, trn, tck).difference({thing}),
-                    planning=False, contra=False, loading=True
-                )
+            node_contents_cache.update_future(
+                character, oldloc, branch, turn,
+                lambda conts: conts.difference({thing}) if thing in conts else conts
+            )
         if location is not None:
             try:
                 oldconts_dest = node_contents_cache.retrieve(character, location, branch, turn, tick)
@@ -501,19 +504,23 @@ class ThingsCache(Cache):
                 oldconts_dest = frozenset()
             newconts_dest = oldconts_dest.union({thing})
             node_contents_cache.store(character, location, branch, turn, tick, newconts_dest, contra=False, loading=True)
-            future_location_data = node_contents_cache.settings[branch].future(turn)
-            todo = []
-            for trn in future_location_data:
-                for tck in sorted(future_location_data[trn]):
-                    char, loca, contents = future_location_data[trn][tck]
-                    if char == character and loca == location:
-                        todo.append((trn, tck))
-            for trn, tck in todo:
-                node_contents_cache.store(
-                    character, location, branch, trn, tck,
-                    node_contents_cache.retrieve(character, location, branch, trn, tck).union({thing}),
-                    planning=False, contra=False, loading=True
-                )
+            node_contents_cache.update_future(
+                character, location, branch, turn,
+                lambda conts: conts if thing in conts else conts.union({thing})
+            )
+
+    def _update_keycache(self, *args, forward):
+        # Cache.store already dropped the keycache from this turn on.
+        # Plans are mostly for turns that nobody's looked at yet, and
+        # working out which things exist takes a look at every thing,
+        # so leave that for whenever it's asked for.
+        if not self.db._planning:
+            super()._update_keycache(*args, forward=forward)
+
+    def _changed(self, parent, character, thing, branch, turn, location):
+        self.watcher((character, thing), 'location', branch, turn)
+        if location is not None:
+            self.watcher((character, location), 'contents', branch, turn)
 
     def turn_before(self, character, thing, branch, turn):
         try:
@@ -531,9 +538,52 @@ class ThingsCache(Cache):
 
 
 class NodeContentsCache(Cache):
+    def update_future(self, character, place, branch, turn, update):
+        """Rewrite the contents of ``place`` wherever they change after ``turn``
+
+        ``update`` is a function that takes the contents and returns the
+        new contents, or the same object if there's no change.
+
+        Only ``place``'s own change-points are visited, in place, so this
+        takes time in proportion to how many there are, not to how much
+        is planned for the whole branch.
+
+        """
+        branches = self.branches.get((character, place))
+        if not branches or branch not in branches:
+            return
+        future = list(branches[branch].future(turn).items())
+        settings_turns = self.settings[branch]
+        changed = False
+        for trn, ticks in future:
+            setticks = settings_turns[trn] if trn in settings_turns else {}
+            for tck, contents in ticks.snapshot():
+                newconts = update(contents)
+                if newconts is contents:
+                    continue
+                ticks.replace(tck, newconts)
+                if tck in setticks:
+                    setticks[tck] = (character, place, newconts)
+                changed = True
+        if changed:
+            # Hints for this place, from this turn on, may have come from
+            # one of the rewritten change-points. Branches descended
+            # from this one only see it at or after this turn, too.
+            shallowest = self.shallowest
+            stale = [hint for hint in shallowest
+                     if hint[:2] == (character, place) and hint[3] >= turn]
+            for hint in stale:
+                shallowest.pop(hint, None)
+
     def _iter_future_contradictions(self, entity, key, turns, branch, turn, tick, value):
         return self.db._things_cache._iter_future_contradictions(entity, key, turns, branch, turn, tick, value)
 
+    def _update_keycache(self, *args, forward):
+        # Contents are only ever looked up by place, never iterated over
+        # by character, so there's no use keeping track of which places
+        # have them
+        pass
+
     def slow_iter_contents(self, character, place, branch, turn, tick):
         branch_now, turn_now, tick_now = self.db._btt()
         self.db.time = branch, turn
@@ -639,7 +689,7 @@ class NodeContentsCache(Cache):
                 kc.truncate(turn)
                 if not kc:
                     del self.keycache[entity, brnch]
-        self.shallowest = OrderedDict()
+        self.shallowest.clear()
 
     def truncate_loc(self, character, location, branch, turn, tick):
         """Remove future data about a particular location
@@ -691,5 +741,332 @@ class NodeContentsCache(Cache):
                 if not sets_branch:
                     del sets[branch]
                     assert r, "Found an empty cache when I didn't delete anything"
-        self.shallowest = OrderedDict()
+        self.shallowest.clear()
         return r
+
+
+def _last_change(settings, branch, turn, tick):
+    """Return the ``(turn, tick)`` of the latest entry in a cache's journal
+    for ``branch`` at or before the given time
+
+    Or ``None``, if there isn't any.
+
+    """
+    if branch not in settings:
+        return
+    turns = settings[branch]
+    last_turn = turns.rev_before(turn)
+    if last_turn == turn:
+        last_tick = turns[turn].rev_before(tick)
+        if last_tick is not None:
+            return turn, last_tick
+        last_turn = turns.rev_before(turn - 1)
+    if last_turn is None:
+        return
+    return last_turn, turns[last_turn].end
+
+
+def _iter_journal(settings, branch, turn_from, tick_from, turn_to, tick_to):
+    """Iterate over the entries in a cache's journal for ``branch`` after
+    ``(turn_from, tick_from)``, up to and including ``(turn_to, tick_to)``
+
+    """
+    if branch not in settings:
+        return
+    turns = settings[branch]
+    if turn_from in turns:
+        for tck, entry in turns[turn_from].future(tick_from).items():
+            if turn_from < turn_to or tck <= tick_to:
+                yield entry
+    for trn, ticks in turns.future(turn_from).items():
+        if trn > turn_to:
+            continue
+        for tck, entry in ticks.items():
+            if trn < turn_to or tck <= tick_to:
+                yield entry
+
+
+class LandmarkIndex(object):
+    """Distances from and to some nodes in a character, for guessing how
+    far apart any other two are
+
+    By the triangle inequality, the path from ``u`` to ``t`` is no
+    shorter than the difference in their distances from a landmark, or
+    to it. The biggest such difference is a lower bound, which makes
+    a good heuristic for A*.
+
+    It stays a lower bound when portals are deleted or get heavier. When
+    they are added, or get lighter, I only recompute the distances of
+    the landmarks that they would make wrong.
+
+    """
+    __slots__ = ('weight', 'count', 'landmarks', 'dist_from', 'dist_to',
+                 'btt', 'version')
+
+    def __init__(self, snap, weight, count, btt, version):
+        self.weight = weight
+        self.count = count
+        self.landmarks = []
+        self.dist_from = []
+        self.dist_to = []
+        self.btt = btt
+        self.version = version
+        self._choose(snap)
+
+    def _distances(self, snap, landmark):
+        if landmark not in snap:
+            return {}, {}
+        weight = self.weight
+        return (
+            single_source_dijkstra_path_length(snap, landmark, weight=weight),
+            single_source_dijkstra_path_length(
+                snap.reverse(copy=False), landmark, weight=weight)
+        )
+
+    def _choose(self, snap):
+        """Pick landmarks far apart from one another, and index them
+
+        The first is the farthest node from whichever comes first. Each
+        next one is some node no landmark reaches, or else whichever's
+        farthest from the landmarks so far.
+
+        """
+        if not snap:
+            return
+        start = next(iter(snap))
+        dists = single_source_dijkstra_path_length(
+            snap, start, weight=self.weight)
+        landmark = max(dists, key=dists.get)
+        nearest = {}
+        while landmark is not None and len(self.landmarks) < self.count:
+            self.landmarks.append(landmark)
+            dist_from, dist_to = self._distances(snap, landmark)
+            self.dist_from.append(dist_from)
+            self.dist_to.append(dist_to)
+            for node, dist in dist_from.items():
+                if node not in nearest or dist < nearest[node]:
+                    nearest[node] = dist
+            landmark = next((node for node in snap if node not in nearest),
+                            None)
+            if landmark is None:
+                landmark = max(
+                    (node for node in nearest if node not in self.landmarks),
+                    key=nearest.get, default=None)
+
+    def _violated(self, i, snap, edges):
+        """Return whether any of ``edges`` make landmark ``i``'s distances
+        overestimate"""
+        dist_from = self.dist_from[i]
+        dist_to = self.dist_to[i]
+        weight = self.weight
+        for orig, dest in edges:
+            w = snap[orig][dest].get(weight, 1)
+            if orig in dist_from and (
+                    dest not in dist_from
+                    or dist_from[dest] > dist_from[orig] + w):
+                return True
+            if dest in dist_to and (
+                    orig not in dist_to
+                    or dist_to[orig] > w + dist_to[dest]):
+                return True
+        return False
+
+    def repair(self, snap, edges):
+        """Recompute distances for the landmarks that ``edges`` in ``snap``
+        invalidate
+
+        Return how many that was.
+
+        """
+        edges = list(edges)
+        stale = [i for i in range(len(self.landmarks))
+                 if self._violated(i, snap, edges)]
+        for i in stale:
+            self.dist_from[i], self.dist_to[i] = self._distances(
+                snap, self.landmarks[i])
+        return len(stale)
+
+    def heuristic(self, node, target):
+        """Return a lower bound on the distance from ``node`` to ``target``"""
+        return self.heuristic_to(target)(node, target)
+
+    def heuristic_to(self, target):
+        """Return a function of ``(node, target)`` like :meth:`heuristic`,
+        that only works for the given ``target``, faster"""
+        # node's distance is subtracted from target's for dist_from,
+        # and the reverse for dist_to
+        terms = [(dist_from, dist_from[target], 1)
+                 for dist_from in self.dist_from if target in dist_from]
+        terms.extend((dist_to, -dist_to[target], -1)
+                     for dist_to in self.dist_to if target in dist_to)
+
+        def heuristic(node, _):
+            best = 0
+            for dists, offset, sign in terms:
+                if node in dists:
+                    d = offset - sign * dists[node]
+                    if d > best:
+                        best = d
+            return best
+        return heuristic
+
+
+class PathCache(object):
+    """Shortest paths through characters, kept until their portals change
+
+    Paths are found in a plain :class:`networkx.DiGraph` copied out of
+    the caches, holding only the stat used for weight. I keep that
+    copy, and the paths found in it, under the character, the weight
+    stat, the branch, and the time of the last change to any node,
+    portal, or portal stat, according to the journals of the caches
+    for those. So a copy is good for as many turns as nothing changes.
+
+    Only the ``maxsize`` most recently used copies are kept.
+
+    Characters that :meth:`add_landmarks` get a :class:`LandmarkIndex`
+    for the weight, and their paths are found with A*.
+
+    """
+    __slots__ = ('db', '_snapshots', '_landmarks')
+    maxsize = 16
+
+    def __init__(self, db):
+        self.db = db
+        self._snapshots = OrderedDict()
+        self._landmarks = {}
+
+    def _version(self, branch, turn, tick):
+        db = self.db
+        return tuple(
+            _last_change(cache.settings, branch, turn, tick) for cache in (
+                db._nodes_cache, db._edges_cache, db._edge_val_cache))
+
+    def _get(self, character, weight):
+        branch, turn, tick = self.db._btt()
+        key = (character, weight, branch,
+               self._version(branch, turn, tick))
+        snapshots = self._snapshots
+        if key in snapshots:
+            snapshots.move_to_end(key)
+            ret = snapshots[key]
+        else:
+            ret = snapshots[key] = (
+                self._snap(character, weight, branch, turn, tick), {}, {})
+            if len(snapshots) > self.maxsize:
+                snapshots.popitem(last=False)
+        if (character, weight) in self._landmarks:
+            index = self._landmarks[character, weight]
+            if index.version != key[3]:
+                self._refresh_landmarks(
+                    index, character, ret[0], (branch, turn, tick), key[3])
+        return ret
+
+    def _refresh_landmarks(self, index, character, snap, btt, version):
+        """Repair ``index`` for the portals that changed since it was last
+        used
+
+        Within a branch, those are the portals in the journals between
+        then and now, whether now is later or earlier. Otherwise, every
+        portal gets checked.
+
+        """
+        then = index.btt
+        if then[0] == btt[0]:
+            db = self.db
+            weight = index.weight
+            start, end = sorted((then[1:], btt[1:]))
+            changed = set()
+            for entry in _iter_journal(
+                    db._edges_cache.settings, btt[0], *start, *end):
+                if entry[0] == character:
+                    changed.add(entry[1:3])
+            for entry in _iter_journal(
+                    db._edge_val_cache.settings, btt[0], *start, *end):
+                if entry[0] == character and entry[4] == weight:
+                    changed.add(entry[1:3])
+            edges = [(orig, dest) for (orig, dest) in changed
+                     if snap.has_edge(orig, dest)]
+        else:
+            edges = snap.edges
+        index.repair(snap, edges)
+        index.btt = btt
+        index.version = version
+
+    def add_landmarks(self, character, weight=None, count=8):
+        """Make a :class:`LandmarkIndex` to find paths in ``character`` by
+        ``weight``, and return it"""
+        branch, turn, tick = btt = self.db._btt()
+        self._landmarks.pop((character, weight), None)
+        snap = self._get(character, weight)[0]
+        ret = self._landmarks[character, weight] = LandmarkIndex(
+            snap, weight, count, btt, self._version(branch, turn, tick))
+        return ret
+
+    def del_landmarks(self, character, weight=None):
+        """Stop using landmarks to find paths in ``character`` by
+        ``weight``"""
+        del self._landmarks[character, weight]
+
+    def _snap(self, character, weight, branch, turn, tick):
+        db = self.db
+        iter_successors = db._edges_cache.iter_successors
+        retrieve = db._edge_val_cache.retrieve
+        nodes = list(db._nodes_cache.iter_entities(
+            character, branch, turn, tick))
+        snap = DiGraph()
+        snap.add_nodes_from(nodes)
+        add_edge = snap.add_edge
+        for orig in nodes:
+            for dest in iter_successors(character, orig, branch, turn, tick):
+                if weight is None:
+                    add_edge(orig, dest)
+                    continue
+                try:
+                    w = retrieve(
+                        character, orig, dest, 0, weight, branch, turn, tick)
+                except KeyError:
+                    w = None
+                if w is None:
+                    add_edge(orig, dest)
+                else:
+                    add_edge(orig, dest, **{weight: w})
+        return snap
+
+    def snapshot(self, character, weight=None):
+        """Return a :class:`networkx.DiGraph` of the character as it is now
+
+        Its portals have no stats but ``weight``. It's shared with
+        everyone else who asks, so don't change it.
+
+        """
+        return self._get(character, weight)[0]
+
+    def shortest_path(self, character, orig, dest, weight=None):
+        """Return a list of node names leading from ``orig`` to ``dest``"""
+        snap, paths, _ = self._get(character, weight)
+        if (orig, dest) not in paths:
+            if (character, weight) in self._landmarks:
+                heuristic = self._landmarks[character, weight].heuristic_to(
+                    dest)
+                paths[orig, dest] = astar_path(
+                    snap, orig, dest, heuristic, weight)
+            else:
+                paths[orig, dest] = shortest_path(snap, orig, dest, weight)
+        return list(paths[orig, dest])
+
+    def shortest_path_length(self, character, orig, dest, weight=None):
+        """Return the length of the path from ``orig`` to ``dest``"""
+        snap, _, lengths = self._get(character, weight)
+        if (orig, dest) not in lengths:
+            if (character, weight) in self._landmarks:
+                heuristic = self._landmarks[character, weight].heuristic_to(
+                    dest)
+                lengths[orig, dest] = astar_path_length(
+                    snap, orig, dest, heuristic, weight)
+            else:
+                lengths[orig, dest] = shortest_path_length(
+                    snap, orig, dest, weight)
+        return lengths[orig, dest]
+
+    def clear(self):
+        self._snapshots.clear()
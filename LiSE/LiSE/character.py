@@ -41,6 +41,7 @@ from collections.abc import (
     MutableMapping
 )
 from itertools import chain
+from math import floor
 from time import monotonic
 from operator import ge, gt, le, lt, eq
 from weakref import WeakValueDictionary
@@ -64,10 +65,131 @@ from .thing import Thing
 from .place import Place
 from .portal import Portal
 from .util import getatt, singleton_get, timer
-from .exc import WorldIntegrityError
+from .exc import WorldIntegrityError, TravelException
 from .query import StatusAlias
 
 
+_PERLIN_PERMUTATION = (
+    151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7,
+    225, 140, 36, 103, 30, 69, 142, 8, 99, 37, 240, 21, 10, 23, 190,
+    6, 148, 247, 120, 234, 75, 0, 26, 197, 62, 94, 252, 219, 203, 117,
+    35, 11, 32, 57, 177, 33, 88, 237, 149, 56, 87, 174, 20, 125, 136,
+    171, 168, 68, 175, 74, 165, 71, 134, 139, 48, 27, 166, 77, 146,
+    158, 231, 83, 111, 229, 122, 60, 211, 133, 230, 220, 105, 92, 41,
+    55, 46, 245, 40, 244, 102, 143, 54, 65, 25, 63, 161, 1, 216, 80,
+    73, 209, 76, 132, 187, 208, 89, 18, 169, 200, 196, 135, 130, 116,
+    188, 159, 86, 164, 100, 109, 198, 173, 186, 3, 64, 52, 217, 226,
+    250, 124, 123, 5, 202, 38, 147, 118, 126, 255, 82, 85, 212, 207,
+    206, 59, 227, 47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213,
+    119, 248, 152, 2, 44, 154, 163, 70, 221, 153, 101, 155, 167, 43,
+    172, 9, 129, 22, 39, 253, 19, 98, 108, 110, 79, 113, 224, 232, 178,
+    185, 112, 104, 218, 246, 97, 228, 251, 34, 242, 193, 238, 210, 144,
+    12, 191, 179, 162, 241, 81, 51, 145, 235, 249, 14, 239, 107, 49,
+    192, 214, 31, 181, 199, 106, 157, 184, 84, 204, 176, 115, 121, 50,
+    45, 127, 4, 150, 254, 138, 236, 205, 93, 222, 114, 67, 29, 24, 72,
+    243, 141, 128, 195, 78, 66, 215, 61, 156, 180
+)
+
+
+def _fade(t):
+    return t * t * t * (t * (t * 6 - 15) + 10)
+
+
+def _lerp(t, a, b):
+    return a + t * (b - a)
+
+
+def _grad(hsh, x, y, z):
+    """CONVERT LO 4 BITS OF HASH CODE INTO 12 GRADIENT DIRECTIONS."""
+    h = hsh & 15
+    u = x if h < 8 else y
+    v = y if h < 4 else x if h == 12 or h == 14 else z
+    return (u if h & 1 == 0 else -u) + (v if h & 2 == 0 else -v)
+
+
+def _perlin_noise(p, x, y, z):
+    """Return Perlin noise at a point, using the permutation table ``p``"""
+    # FIND UNIT CUBE THAT CONTAINS POINT.
+    X = floor(x) & 255
+    Y = floor(y) & 255
+    Z = floor(z) & 255
+    # FIND RELATIVE X, Y, Z OF POINT IN CUBE.
+    x -= floor(x)
+    y -= floor(y)
+    z -= floor(z)
+    # COMPUTE FADE CURVES FOR EACH OF X, Y, Z.
+    u = _fade(x)
+    v = _fade(y)
+    w = _fade(z)
+    # HASH COORDINATES OF THE 8 CUBE CORNERS,
+    A = p[X] + Y
+    AA = p[A] + Z
+    AB = p[A+1] + Z
+    B = p[X+1] + Y
+    BA = p[B] + Z
+    BB = p[B+1] + Z
+    # AND ADD BLENDED RESULTS FROM 8 CORNERS OF CUBE
+    return _lerp(
+        w,
+        _lerp(
+            v,
+            _lerp(u, _grad(p[AA], x, y, z), _grad(p[BA], x-1, y, z)),
+            _lerp(u, _grad(p[AB], x, y-1, z), _grad(p[BB], x-1, y-1, z))
+        ),
+        _lerp(
+            v,
+            _lerp(u, _grad(p[AA+1], x, y, z-1),
+                  _grad(p[BA+1], x-1, y, z-1)),
+            _lerp(u, _grad(p[AB+1], x, y-1, z-1),
+                  _grad(p[BB+1], x-1, y-1, z-1))
+        )
+    )
+
+
+def _perlin_noise_array(p, x, y, z):
+    """Return Perlin noise at many points at once
+
+    Like :func:`_perlin_noise`, but everything is a NumPy array,
+    including the result. The noise is exactly the same.
+
+    """
+    import numpy as np
+
+    def grad(hsh, x, y, z):
+        h = hsh & 15
+        u = np.where(h < 8, x, y)
+        v = np.where(h < 4, y, np.where((h == 12) | (h == 14), x, z))
+        return np.where(h & 1, -u, u) + np.where(h & 2, -v, v)
+
+    xf, yf, zf = np.floor(x), np.floor(y), np.floor(z)
+    X = xf.astype(np.int64) & 255
+    Y = yf.astype(np.int64) & 255
+    Z = zf.astype(np.int64) & 255
+    x, y, z = x - xf, y - yf, z - zf
+    u, v, w = _fade(x), _fade(y), _fade(z)
+    A = p[X] + Y
+    AA = p[A] + Z
+    AB = p[A+1] + Z
+    B = p[X+1] + Y
+    BA = p[B] + Z
+    BB = p[B+1] + Z
+    return _lerp(
+        w,
+        _lerp(
+            v,
+            _lerp(u, grad(p[AA], x, y, z), grad(p[BA], x-1, y, z)),
+            _lerp(u, grad(p[AB], x, y-1, z), grad(p[BB], x-1, y-1, z))
+        ),
+        _lerp(
+            v,
+            _lerp(u, grad(p[AA+1], x, y, z-1),
+                  grad(p[BA+1], x-1, y, z-1)),
+            _lerp(u, grad(p[AB+1], x, y-1, z-1),
+                  grad(p[BB+1], x-1, y-1, z-1))
+        )
+    )
+
+
 class SpecialMappingDescriptor:
     def __init__(self, mapclsname):
         self.insts = WeakValueDictionary()
@@ -301,112 +423,46 @@ class AbstractCharacter(Mapping):
         Result will be stored in a node stat named 'perlin' by default.
         Supply the name of another stat to use it instead.
 
-        """
-        from math import floor
-        p = self.engine.shuffle([
-            151, 160, 137, 91, 90, 15, 131, 13, 201, 95, 96, 53, 194, 233, 7,
-            225, 140, 36, 103, 30, 69, 142, 8, 99, 37, 240, 21, 10, 23, 190,
-            6, 148, 247, 120, 234, 75, 0, 26, 197, 62, 94, 252, 219, 203, 117,
-            35, 11, 32, 57, 177, 33, 88, 237, 149, 56, 87, 174, 20, 125, 136,
-            171, 168, 68, 175, 74, 165, 71, 134, 139, 48, 27, 166, 77, 146,
-            158, 231, 83, 111, 229, 122, 60, 211, 133, 230, 220, 105, 92, 41,
-            55, 46, 245, 40, 244, 102, 143, 54, 65, 25, 63, 161, 1, 216, 80,
-            73, 209, 76, 132, 187, 208, 89, 18, 169, 200, 196, 135, 130, 116,
-            188, 159, 86, 164, 100, 109, 198, 173, 186, 3, 64, 52, 217, 226,
-            250, 124, 123, 5, 202, 38, 147, 118, 126, 255, 82, 85, 212, 207,
-            206, 59, 227, 47, 16, 58, 17, 182, 189, 28, 42, 223, 183, 170, 213,
-            119, 248, 152, 2, 44, 154, 163, 70, 221, 153, 101, 155, 167, 43,
-            172, 9, 129, 22, 39, 253, 19, 98, 108, 110, 79, 113, 224, 232, 178,
-            185, 112, 104, 218, 246, 97, 228, 251, 34, 242, 193, 238, 210, 144,
-            12, 191, 179, 162, 241, 81, 51, 145, 235, 249, 14, 239, 107, 49,
-            192, 214, 31, 181, 199, 106, 157, 184, 84, 204, 176, 115, 121, 50,
-            45, 127, 4, 150, 254, 138, 236, 205, 93, 222, 114, 67, 29, 24, 72,
-            243, 141, 128, 195, 78, 66, 215, 61, 156, 180
-        ]) * 2
-
-        def fade(t):
-            return t * t * t * (t * (t * 6 - 15) + 10)
-
-        def lerp(t, a, b):
-            return a + t * (b - a)
-
-        def grad(hsh, x, y, z):
-            """CONVERT LO 4 BITS OF HASH CODE INTO 12 GRADIENT DIRECTIONS."""
-            h = hsh & 15
-            u = x if h < 8 else y
-            v = y if h < 4 else x if h == 12 or h == 14 else z
-            return (u if h & 1 == 0 else -u) + (v if h & 2 == 0 else -v)
-
-        def noise(x, y, z):
-            # FIND UNIT CUBE THAT CONTAINS POINT.
-            X = int(x) & 255
-            Y = int(y) & 255
-            Z = int(z) & 255
-            # FIND RELATIVE X, Y, Z OF POINT IN CUBE.
-            x -= floor(x)
-            y -= floor(y)
-            z -= floor(z)
-            # COMPUTE FADE CURVES FOR EACH OF X, Y, Z.
-            u = fade(x)
-            v = fade(y)
-            w = fade(z)
-            # HASH COORDINATES OF THE 8 CUBE CORNERS,
-            A = p[X] + Y
-            AA = p[A] + Z
-            AB = p[A+1] + Z
-            B = p[X+1] + y
-            BA = p[B] + Z
-            BB = p[B+1] + Z
-            # AND ADD BLENDED RESULTS FROM 8 CORNERS OF CUBE
-            return lerp(
-                w,
-                lerp(
-                    v,
-                    lerp(
-                        u,
-                        grad(p[AA], x, y, z),
-                        grad(p[BA], x-1, y, z)
-                    ),
-                    lerp(
-                        u,
-                        grad(p[AB], x, y-1, z),
-                        grad(p[BB], x-1, y-1, z)
-                    )
-                ),
-                lerp(
-                    v,
-                    lerp(
-                        u,
-                        grad(p[AA+1], x, y, z-1),
-                        grad(p[BA+1], x-1, y, z-1)
-                    ),
-                    lerp(
-                        u,
-                        grad(p[AB+1], x, y-1, z-1),
-                        grad(p[BB+1], x-1, y-1, z-1)
-                    )
-                )
-            )
+        The permutation table is shuffled with the engine's randomizer,
+        so the noise is the same every time for the same random seed.
+        If NumPy is available, all the nodes' noise is computed at once.
 
-        for node in self.node.values():
-            try:
-                (x, y, z) = node.name
-            except ValueError:
+        """
+        p = list(_PERLIN_PERMUTATION)
+        self.engine.shuffle(p)
+        p *= 2
+        nodes = self.node
+        names = []
+        coords = []
+        for name in nodes:
+            if isinstance(name, tuple) and len(name) in (2, 3):
+                xyz = name if len(name) == 3 else name + (0.0,)
+            else:
+                node = nodes[name]
                 try:
-                    (x, y) = node.name
-                    z = 0.0
-                except ValueError:
-                    try:
-                        x = node['x']
-                        y = node['y']
-                        z = node.get('z', 0.0)
-                    except KeyError:
-                        continue
-            x, y, z = map(float, (x, y, z))
-            node[stat] = noise(x, y, z)
-
+                    xyz = (node['x'], node['y'], node.get('z', 0.0))
+                except KeyError:
+                    continue
+            names.append(name)
+            coords.append(tuple(map(float, xyz)))
+        if not names:
+            return self
+        try:
+            import numpy as np
+        except ImportError:
+            values = [_perlin_noise(p, x, y, z) for (x, y, z) in coords]
+        else:
+            x, y, z = np.array(coords, dtype=np.float64).T
+            values = _perlin_noise_array(np.array(p), x, y, z).tolist()
+        self._set_node_stats(stat, zip(names, values))
         return self
 
+    def _set_node_stats(self, stat, values):
+        """Set ``stat`` on my nodes, given pairs of node names and values"""
+        nodes = self.node
+        for name, value in values:
+            nodes[name][stat] = value
+
     def copy_from(self, g):
         """Copy all nodes and edges from the given graph into this.
 
@@ -2053,6 +2109,102 @@ class Character(DiGraph, AbstractCharacter, RuleFollower):
         ):
             yield make_edge(char, o, d)
 
+    def _set_node_stats(self, stat, values):
+        if stat in ('name', 'location'):
+            # these mean something special to nodes
+            return super()._set_node_stats(stat, values)
+        self.engine._set_node_vals(self.name, stat, values)
+
+    def csr(self, weight=None, branch=None, turn=None, tick=None):
+        """Return a :class:`LiSE.csr.CSRSnapshot` of my nodes and portals
+
+        It has NumPy arrays of the portals and their ``weight`` stat,
+        as they are at the given time, by default the present. Use its
+        ``refresh`` method to bring it up to date later, its ``graph``
+        property to run networkx algorithms on it, and ``to_scipy`` to
+        get a sparse matrix.
+
+        Needs NumPy.
+
+        """
+        from .csr import CSRSnapshot
+        return CSRSnapshot(self.engine, self.name, weight, branch, turn, tick)
+
+    def add_landmarks(self, weight=None, count=8):
+        """Index the distances to and from ``count`` of my nodes, spread
+        out, to find paths by ``weight`` faster
+
+        After this, ``shortest_path`` and ``travel_to`` with that
+        ``weight`` use A*, with a heuristic from the landmarks. It's
+        worth it for big maps that don't change much. The index is
+        repaired when my portals change, but not stored in the database.
+
+        """
+        self.engine._path_cache.add_landmarks(self.name, weight, count)
+
+    def del_landmarks(self, weight=None):
+        """Stop using landmarks to find paths by ``weight``"""
+        self.engine._path_cache.del_landmarks(self.name, weight)
+
+    def follow_paths(self, paths):
+        """Make many things follow paths, as with ``Thing.follow_path``
+
+        ``paths`` is an iterable of ``(thing, path, weight)``, where
+        ``thing`` is a :class:`Thing` of mine or its name, and
+        ``weight`` is the portal stat that says how many turns to spend
+        in each place, or ``None`` to spend one turn in each.
+
+        Every path is checked before anything is planned. If any of
+        them doesn't start where its thing is, raise ``ValueError``;
+        if any goes through a portal that doesn't exist, raise
+        :class:`TravelException`. Either way, nobody goes anywhere.
+
+        Return a dictionary mapping the names of the things to the
+        number of turns their travel will take.
+
+        """
+        engine = self.engine
+        branch, turn_now, tick_now = engine._btt()
+        retrieve_loc = engine._things_cache.retrieve
+        snapshot = engine._path_cache.snapshot
+        schedules = {}
+        ret = {}
+        for thing, path, weight in paths:
+            thingn = thing.name if hasattr(thing, 'name') else thing
+            if len(path) < 2:
+                raise ValueError("Paths need at least 2 nodes")
+            if thingn in schedules:
+                raise ValueError("More than one path for {}".format(thingn))
+            try:
+                loc = retrieve_loc(
+                    self.name, thingn, branch, turn_now, tick_now)
+            except KeyError:
+                loc = None
+            if loc is None:
+                raise ValueError("No such thing: {}".format(thingn))
+            if path[0] != loc:
+                raise ValueError(
+                    "Path for {} does not start at its present "
+                    "location".format(thingn))
+            snap = snapshot(self.name, weight)
+            schedule = []
+            turn = turn_now
+            for i in range(1, len(path)):
+                orig, dest = path[i-1], path[i]
+                if not snap.has_edge(orig, dest):
+                    raise TravelException(
+                        "Couldn't follow portal from {} to {}".format(
+                            orig, dest),
+                        path=list(path[:i]),
+                        traveller=self.thing[thingn]
+                    )
+                turn += snap[orig][dest].get(weight, 1)
+                schedule.append((turn, dest))
+            schedules[thingn] = schedule
+            ret[thingn] = turn - turn_now
+        engine._plan_thing_locs(self.name, schedules)
+        return ret
+
     def avatars(self):
         """Iterate over all my avatars
 
@@ -0,0 +1,394 @@
+# This file is part of LiSE, a framework for life simulation games.
+# Copyright (c) Zachary Spector, public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Characters' nodes and portals as compressed sparse rows
+
+:meth:`LiSE.character.Character.csr` makes a :class:`CSRSnapshot`,
+which keeps a character's portals at some moment in NumPy arrays, the
+way :class:`scipy.sparse.csr_matrix` does, along with a table of node
+names. The portals from the ``i``th node go to the nodes whose indices
+are in ``indices[indptr[i]:indptr[i+1]]``, and the weights of those
+portals are in the same slice of ``weights``.
+
+The arrays are never changed once made, so you can hand them to other
+code without copying them. :meth:`CSRSnapshot.refresh` makes new ones
+when there's been a change.
+
+This module needs NumPy, as in ``pip install LiSE[numpy]``, and
+:meth:`CSRSnapshot.to_scipy` needs SciPy.
+
+"""
+from collections.abc import Mapping
+from itertools import chain
+
+import networkx as nx
+import numpy as np
+
+from .cache import _iter_journal
+
+
+def _index_dtype(n):
+    """Return the smallest integer dtype that SciPy will take as an
+    index, without copying, for ``n`` nodes or portals"""
+    return np.int32 if n < 2 ** 31 else np.int64
+
+
+class CSRSnapshot(object):
+    """A character's nodes and portals at some moment
+
+    ``names`` is the list of node names, by index, and ``index``
+    maps names to indices. A new node goes at the end, so indices
+    stay the same when I'm refreshed, unless some node was deleted.
+
+    ``weights`` holds the ``weight`` stat of each portal, as a float,
+    or 1 where it's unset, the same default networkx uses. Without a
+    ``weight``, it's all 1.
+
+    """
+    def __init__(self, engine, character, weight=None,
+                 branch=None, turn=None, tick=None):
+        self.engine = engine
+        self.character = character
+        self.weight = weight
+        self._build(*self._time(branch, turn, tick))
+
+    def __repr__(self):
+        return "<CSRSnapshot of {} at {} with {} nodes and {} portals>".format(
+            self.character, self.btt, len(self.names), len(self.indices))
+
+    def __len__(self):
+        return len(self.names)
+
+    def _time(self, branch, turn, tick):
+        engine = self.engine
+        if branch is None:
+            branch = engine.branch
+        if turn is None:
+            turn = engine.turn
+        if tick is None:
+            if (branch, turn) == (engine.branch, engine.turn):
+                tick = engine.tick
+            else:
+                tick = engine._turn_end_plan.get((branch, turn), 0)
+        return branch, turn, tick
+
+    def _forward(self, btt):
+        # the keycaches' forward optimization only works for the present
+        return None if btt == self.engine._btt() else False
+
+    def _row(self, orig, branch, turn, tick, forward):
+        """Return lists of the indices and weights of ``orig``'s portals"""
+        engine = self.engine
+        character = self.character
+        weight = self.weight
+        index = self.index
+        dests = list(engine._edges_cache.iter_successors(
+            character, orig, branch, turn, tick, forward=forward))
+        if weight is None:
+            return [index[dest] for dest in dests], [1.] * len(dests)
+        return [index[dest] for dest in dests], [
+            self._weight(orig, dest, branch, turn, tick) for dest in dests]
+
+    def _weight(self, orig, dest, branch, turn, tick):
+        try:
+            ret = self.engine._edge_val_cache.retrieve(
+                self.character, orig, dest, 0, self.weight,
+                branch, turn, tick)
+        except KeyError:
+            return 1.
+        return 1. if ret is None else ret
+
+    def _build(self, branch, turn, tick):
+        forward = self._forward((branch, turn, tick))
+        self.names = names = list(self.engine._nodes_cache.iter_entities(
+            self.character, branch, turn, tick, forward=forward))
+        self.index = {name: i for (i, name) in enumerate(names)}
+        self._pack([self._row(name, branch, turn, tick, forward)
+                    for name in names])
+        self.btt = branch, turn, tick
+
+    def _pack(self, rows):
+        counts = [len(row[0]) for row in rows]
+        total = sum(counts)
+        dtype = _index_dtype(max(total, len(rows)))
+        indptr = np.zeros(len(rows) + 1, dtype=dtype)
+        np.cumsum(counts, out=indptr[1:])
+        self.indptr = indptr
+        self.indices = np.fromiter(
+            chain.from_iterable(row[0] for row in rows), dtype=dtype,
+            count=total)
+        self.weights = np.fromiter(
+            chain.from_iterable(row[1] for row in rows), dtype=np.float64,
+            count=total)
+        self._graph = None
+
+    def refresh(self, branch=None, turn=None, tick=None):
+        """Bring me up to date with another moment, by default the present
+
+        Moving forward in the same branch, I only redo the rows of the
+        nodes whose portals changed since my last moment, according to
+        the journals of the nodes, edges, and edge-value caches. New
+        nodes get added to the end. Going backward, to another branch,
+        or past the deletion of a node, I rebuild from scratch.
+
+        Return whether anything changed.
+
+        """
+        then = self.btt
+        now = branch, turn, tick = self._time(branch, turn, tick)
+        if now == then:
+            return False
+        if branch != then[0] or (turn, tick) < then[1:]:
+            self._build(*now)
+            return True
+        engine = self.engine
+        character = self.character
+        weight = self.weight
+        index = self.index
+        new_nodes = []
+        origs = set()
+        reweighed = set()
+        for entry in _iter_journal(
+                engine._nodes_cache.settings, branch, *then[1:], turn, tick):
+            if entry[0] != character:
+                continue
+            node, extant = entry[1:]
+            if extant and node not in index:
+                if node not in new_nodes:
+                    new_nodes.append(node)
+            elif not extant and (node in index or node in new_nodes):
+                self._build(*now)
+                return True
+        for entry in _iter_journal(
+                engine._edges_cache.settings, branch, *then[1:], turn, tick):
+            if entry[0] == character:
+                origs.add(entry[1])
+        if weight is not None:
+            for entry in _iter_journal(
+                    engine._edge_val_cache.settings, branch, *then[1:],
+                    turn, tick):
+                if entry[0] == character and entry[4] == weight \
+                        and entry[1] not in origs:
+                    reweighed.add(entry[1:3])
+        self.btt = now
+        if not (new_nodes or origs or reweighed):
+            return False
+        # a node might've been made and deleted in between
+        forward = self._forward(now)
+        extant = set(engine._nodes_cache.iter_entities(
+            character, branch, turn, tick, forward=forward))
+        if any(node not in extant for node in new_nodes) or \
+                len(extant) != len(index) + len(new_nodes):
+            self._build(*now)
+            return True
+        if new_nodes:
+            self.names = self.names + new_nodes
+            self.index = index = dict(index)
+            for node in new_nodes:
+                index[node] = len(index)
+        if origs:
+            self._splice({
+                index[orig]: self._row(orig, branch, turn, tick, forward)
+                for orig in origs if orig in index})
+        elif new_nodes:
+            self._pad(len(new_nodes))
+        if reweighed:
+            self._reweigh(reweighed, branch, turn, tick)
+        self._graph = None
+        return True
+
+    def _pad(self, n):
+        """Add ``n`` empty rows"""
+        indptr = self.indptr
+        self.indptr = np.concatenate(
+            (indptr, np.full(n, indptr[-1], dtype=indptr.dtype)))
+
+    def _splice(self, new_rows):
+        """Make new arrays with the rows in ``new_rows`` replaced
+
+        Rows past the end are for new nodes; they're empty if not in
+        ``new_rows``.
+
+        """
+        old_indptr = self.indptr
+        old_indices = self.indices
+        old_weights = self.weights
+        n_old = len(old_indptr) - 1
+        n = len(self.names)
+        counts = np.zeros(n, dtype=np.int64)
+        counts[:n_old] = np.diff(old_indptr)
+        for i, (idxs, _) in new_rows.items():
+            counts[i] = len(idxs)
+        total = int(counts.sum())
+        dtype = _index_dtype(max(total, n))
+        indptr = np.zeros(n + 1, dtype=dtype)
+        np.cumsum(counts, out=indptr[1:])
+        indices = np.empty(total, dtype=dtype)
+        weights = np.empty(total, dtype=np.float64)
+        start = 0
+        for i in sorted(new_rows) + [n]:
+            # copy the unchanged rows before this one in one go
+            stop = min(i, n_old)
+            if start < stop:
+                src = slice(old_indptr[start], old_indptr[stop])
+                dst = slice(indptr[start], indptr[stop])
+                indices[dst] = old_indices[src]
+                weights[dst] = old_weights[src]
+            if i < n:
+                idxs, ws = new_rows[i]
+                indices[indptr[i]:indptr[i+1]] = idxs
+                weights[indptr[i]:indptr[i+1]] = ws
+            start = i + 1
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    def _reweigh(self, portals, branch, turn, tick):
+        index = self.index
+        indptr = self.indptr
+        indices = self.indices
+        weights = self.weights.copy()
+        for orig, dest in portals:
+            if orig not in index or dest not in index:
+                continue
+            i = index[orig]
+            start = indptr[i]
+            found = np.flatnonzero(indices[start:indptr[i+1]] == index[dest])
+            if found.size:
+                weights[start + found[0]] = self._weight(
+                    orig, dest, branch, turn, tick)
+        self.weights = weights
+
+    def transpose(self):
+        """Return ``(indptr, indices, weights)`` for the portals into each
+        node, rather than out of it"""
+        n = len(self.names)
+        order = np.argsort(self.indices, kind='stable')
+        origs = np.repeat(
+            np.arange(n, dtype=self.indices.dtype), np.diff(self.indptr))
+        indptr = np.zeros(n + 1, dtype=self.indptr.dtype)
+        np.cumsum(np.bincount(self.indices, minlength=n), out=indptr[1:])
+        return indptr, origs[order], self.weights[order]
+
+    def to_scipy(self):
+        """Return a :class:`scipy.sparse.csr_matrix` sharing my arrays"""
+        from scipy.sparse import csr_matrix
+        n = len(self.names)
+        return csr_matrix(
+            (self.weights, self.indices, self.indptr), shape=(n, n),
+            copy=False)
+
+    @property
+    def graph(self):
+        """A read-only networkx ``DiGraph`` of me, as of my last refresh"""
+        if self._graph is None:
+            self._graph = CSRGraph(self)
+        return self._graph
+
+
+class _CSRNodes(Mapping):
+    __slots__ = ('_names', '_index')
+
+    def __init__(self, names, index):
+        self._names = names
+        self._index = index
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, node):
+        return node in self._index
+
+    def __getitem__(self, node):
+        if node not in self._index:
+            raise KeyError(node)
+        return {}
+
+
+class _CSRAdjacency(Mapping):
+    """Nodes' neighbors, and the data of the portals to them, from one set
+    of CSR arrays
+
+    Each node's neighbors are made into a dictionary the first time
+    they're asked for.
+
+    """
+    __slots__ = ('_names', '_index', '_indptr', '_indices', '_weights',
+                 '_key', '_rows')
+
+    def __init__(self, names, index, indptr, indices, weights, key):
+        self._names = names
+        self._index = index
+        self._indptr = indptr.tolist()
+        self._indices = indices
+        self._weights = weights
+        self._key = key
+        self._rows = {}
+
+    def __iter__(self):
+        return iter(self._names)
+
+    def __len__(self):
+        return len(self._names)
+
+    def __contains__(self, node):
+        return node in self._index
+
+    def __getitem__(self, node):
+        rows = self._rows
+        if node in rows:
+            return rows[node]
+        i = self._index[node]
+        start, stop = self._indptr[i], self._indptr[i+1]
+        names = self._names
+        neighbors = [names[j] for j in self._indices[start:stop].tolist()]
+        key = self._key
+        if key is None:
+            row = {neighbor: {} for neighbor in neighbors}
+        else:
+            row = {neighbor: {key: w} for (neighbor, w) in zip(
+                neighbors, self._weights[start:stop].tolist())}
+        rows[node] = row
+        return row
+
+
+class CSRGraph(nx.DiGraph):
+    """A networkx ``DiGraph`` that reads from a :class:`CSRSnapshot`
+
+    Portals' data has only the snapshot's weight stat, if any. It's
+    frozen, so trying to change it raises ``NetworkXError``.
+
+    Without a snapshot, I'm an ordinary, empty ``DiGraph``, which is
+    what networkx makes when it copies me.
+
+    """
+    def __init__(self, snapshot=None, **attr):
+        super().__init__(**attr)
+        if snapshot is None:
+            return
+        self.graph['name'] = snapshot.character
+        names = snapshot.names
+        index = snapshot.index
+        key = snapshot.weight
+        self._node = _CSRNodes(names, index)
+        self._adj = self._succ = _CSRAdjacency(
+            names, index, snapshot.indptr, snapshot.indices,
+            snapshot.weights, key)
+        self._pred = _CSRAdjacency(
+            names, index, *snapshot.transpose(), key)
+        nx.freeze(self)
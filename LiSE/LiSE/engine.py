@@ -10,6 +10,9 @@ from collections import defaultdict
 from operator import attrgetter
 from types import FunctionType, MethodType
 from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context
+from time import monotonic
 
 import msgpack
 from blinker import Signal
@@ -18,6 +21,7 @@ from .allegedb import HistoryError
 from .allegedb.window import SettingsTurnDict, WindowDict
 from .reify import reify
 from .util import sort_set
+from .wire import CompactDelta
 
 from . import exc
 
@@ -32,6 +36,9 @@ class getnoplan:
     def __get__(self, instance, owner):
         if instance._planning:
             raise exc.PlanError("Don't use randomization in a plan")
+        if _in_trigger_worker:
+            raise exc.TriggerWorkerError(
+                "Can't use randomization in a trigger worker")
         return self._getter(instance)
 
 
@@ -39,6 +46,45 @@ class InnerStopIteration(StopIteration):
     pass
 
 
+def _triggered(rule, entity):
+    """Return whether any of the rule's triggers pass for the entity"""
+    for trigger in rule.triggers:
+        if trigger(entity):
+            return True
+    return False
+
+
+_trigger_candidates = None
+"""Rules whose triggers are being checked in worker processes"""
+_in_trigger_worker = False
+"""Whether this is a worker process checking triggers"""
+
+
+def _check_trigger_chunk(indices):
+    """Check the triggers of some ``_trigger_candidates`` in a worker process
+
+    Return a list of pairs of a boolean and how many seconds the check
+    took, or ``None`` for the rules whose triggers raised an exception.
+    The database connection was inherited from the parent process, so
+    it mustn't be used here; nor may the random number generator, whose
+    state wouldn't carry back to the parent. Triggers that use either
+    fail, and the parent checks them again itself.
+
+    """
+    global _in_trigger_worker
+    _in_trigger_worker = True
+    ret = []
+    for i in indices:
+        _, rule, _, entity = _trigger_candidates[i]
+        entity.engine.query = None
+        start = monotonic()
+        try:
+            ret.append((_triggered(rule, entity), monotonic() - start))
+        except Exception:
+            ret.append(None)
+    return ret
+
+
 class NextTurn(Signal):
     """Make time move forward in the simulation.
 
@@ -150,6 +196,7 @@ MSGPACK_METHOD = 0x79
 MSGPACK_TRIGGER = 0x78
 MSGPACK_PREREQ = 0x77
 MSGPACK_ACTION = 0x76
+MSGPACK_DELTA = 0x75
 
 
 class AbstractEngine(object):
@@ -167,24 +214,15 @@ class AbstractEngine(object):
         meth = super().__getattribute__('method').__getattr__(item)
         return MethodType(meth, self)
 
-    @reify
-    def pack(self):
-        handlers = {
-            self.char_cls: lambda char: msgpack.ExtType(
-                MSGPACK_CHARACTER, packer(char.name)
-                ),
-            self.place_cls: lambda place: msgpack.ExtType(
-                MSGPACK_PLACE, packer(
-                    (place.character.name, place.name)
-                )),
-            self.thing_cls: lambda thing: msgpack.ExtType(
-                MSGPACK_THING, packer(
-                    (thing.character.name, thing.name)
-                )),
-            self.portal_cls: lambda port: msgpack.ExtType(
-                MSGPACK_PORTAL, packer(
-                    (port.character.name, port.origin.name, port.destination.name)
-                )),
+    def _pack_handlers(self, packer):
+        """Return functions to turn objects into msgpack ``ExtType``, by
+        the objects' types
+
+        These don't depend on the world. ``packer`` is the function to
+        pack the contents of the ``ExtType`` with.
+
+        """
+        return {
             tuple: lambda tup: msgpack.ExtType(
                 MSGPACK_TUPLE, packer(list(tup))),
             frozenset: lambda frozs: msgpack.ExtType(
@@ -206,9 +244,34 @@ class AbstractEngine(object):
             Exception: lambda exc: msgpack.ExtType(
                 MSGPACK_EXCEPTION, packer(
                     [exc.__class__.__name__] + list(exc.args)
+                )),
+            CompactDelta: lambda delt: msgpack.ExtType(
+                MSGPACK_DELTA, packer(delt.encode()))
+        }
+
+    def _world_pack_handlers(self, packer):
+        """Return functions to turn the entities of my world into msgpack
+        ``ExtType``, by the entities' types"""
+        return {
+            self.char_cls: lambda char: msgpack.ExtType(
+                MSGPACK_CHARACTER, packer(char.name)
+                ),
+            self.place_cls: lambda place: msgpack.ExtType(
+                MSGPACK_PLACE, packer(
+                    (place.character.name, place.name)
+                )),
+            self.thing_cls: lambda thing: msgpack.ExtType(
+                MSGPACK_THING, packer(
+                    (thing.character.name, thing.name)
+                )),
+            self.portal_cls: lambda port: msgpack.ExtType(
+                MSGPACK_PORTAL, packer(
+                    (port.character.name, port.origin.name, port.destination.name)
                 ))
         }
 
+    @reify
+    def pack(self):
         def pack_handler(obj):
             if isinstance(obj, Exception):
                 typ = Exception
@@ -222,20 +285,18 @@ class AbstractEngine(object):
             default=pack_handler, strict_types=True,
             use_bin_type=True
         )
+        handlers = self._pack_handlers(packer)
+        handlers.update(self._world_pack_handlers(packer))
         return packer
 
-    @reify
-    def unpack(self):
-        charmap = self.character
-        char_cls = self.char_cls
-        place_cls = self.place_cls
-        thing_cls = self.thing_cls
-        portal_cls = self.portal_cls
-        trigger = self.trigger
-        prereq = self.prereq
-        action = self.action
-        function = self.function
-        method = self.method
+    def _unpack_handlers(self, unpacker):
+        """Return functions to turn msgpack ``ExtType`` data into objects,
+        by the ``ExtType`` codes
+
+        These don't depend on the world. ``unpacker`` is the function to
+        unpack the data with.
+
+        """
         excs = {
             # builtin exceptions
             'AssertionError': AssertionError,
@@ -287,6 +348,30 @@ class AbstractEngine(object):
                 return Exception(*data)
             return excs[data[0]](*data[1:])
 
+        return {
+            MSGPACK_FINAL_RULE: lambda obj: final_rule,
+            MSGPACK_TUPLE: lambda ext: tuple(unpacker(ext)),
+            MSGPACK_FROZENSET: lambda ext: frozenset(unpacker(ext)),
+            MSGPACK_SET: lambda ext: set(unpacker(ext)),
+            MSGPACK_EXCEPTION: unpack_exception,
+            MSGPACK_DELTA: lambda ext: self._delta_codec.decode(
+                unpacker(ext))
+        }
+
+    def _world_unpack_handlers(self, unpacker):
+        """Return functions to turn msgpack ``ExtType`` data into the
+        entities and stored functions of my world, by the ``ExtType``
+        codes"""
+        charmap = self.character
+        char_cls = self.char_cls
+        place_cls = self.place_cls
+        thing_cls = self.thing_cls
+        portal_cls = self.portal_cls
+        trigger = self.trigger
+        prereq = self.prereq
+        action = self.action
+        function = self.function
+        method = self.method
 
         def unpack_char(ext):
             charn = unpacker(ext)
@@ -328,23 +413,20 @@ class AbstractEngine(object):
             except KeyError:
                 return portal_cls(char, orign, destn)
 
-        handlers = {
+        return {
             MSGPACK_CHARACTER: unpack_char,
             MSGPACK_PLACE: unpack_place,
             MSGPACK_THING: unpack_thing,
             MSGPACK_PORTAL: unpack_portal,
-            MSGPACK_FINAL_RULE: lambda obj: final_rule,
-            MSGPACK_TUPLE: lambda ext: tuple(unpacker(ext)),
-            MSGPACK_FROZENSET: lambda ext: frozenset(unpacker(ext)),
-            MSGPACK_SET: lambda ext: set(unpacker(ext)),
             MSGPACK_TRIGGER: lambda ext: getattr(trigger, unpacker(ext)),
             MSGPACK_PREREQ: lambda ext: getattr(prereq, unpacker(ext)),
             MSGPACK_ACTION: lambda ext: getattr(action, unpacker(ext)),
             MSGPACK_FUNCTION: lambda ext: getattr(function, unpacker(ext)),
-            MSGPACK_METHOD: lambda ext: getattr(method, unpacker(ext)),
-            MSGPACK_EXCEPTION: unpack_exception
+            MSGPACK_METHOD: lambda ext: getattr(method, unpacker(ext))
         }
 
+    @reify
+    def unpack(self):
         def unpack_handler(code, data):
             if code in handlers:
                 return handlers[code](data)
@@ -354,6 +436,8 @@ class AbstractEngine(object):
             ext_hook=unpack_handler,
             raw=False, strict_map_key=False
         )
+        handlers = self._unpack_handlers(unpacker)
+        handlers.update(self._world_unpack_handlers(unpacker))
         return unpacker
 
     def coinflip(self):
@@ -564,13 +648,17 @@ class Engine(AbstractEngine, gORM):
         containing any of the lists 'triggers', 'prereqs', and 'actions'
 
         """
-        from LiSE.allegedb.window import update_window, update_backward_window
         if turn_from == turn_to:
             return self.get_turn_delta(
                 branch, turn_to, tick_to,start_tick=tick_from)
-        delta = super().get_delta(
+        return super().get_delta(
             branch, turn_from, tick_from, turn_to, tick_to)
-        if turn_from < turn_to:
+
+    def _window_delta(self, delta, branch, turn_from, tick_from, turn_to, tick_to):
+        from LiSE.allegedb.window import update_window, update_backward_window
+        super()._window_delta(
+            delta, branch, turn_from, tick_from, turn_to, tick_to)
+        if (turn_from, tick_from) < (turn_to, tick_to):
             updater = partial(
                 update_window, turn_from, tick_from, turn_to, tick_to)
             univbranches = self._universal_cache.settings
@@ -703,8 +791,6 @@ class Engine(AbstractEngine, gORM):
         if branch in edgerbbranches:
             updater(updedgerb, edgerbbranches[branch])
 
-        return delta
-
     def get_turn_delta(self, branch=None, turn=None, tick=None, start_tick=0):
         """Get a dictionary of changes to the world within a given turn
 
@@ -907,13 +993,15 @@ class Engine(AbstractEngine, gORM):
             NodeRulesHandledCache,
             PortalRulesHandledCache,
             CharacterRulesHandledCache,
-            ThingsCache
+            ThingsCache,
+            PathCache
         )
         from .rule import AllRuleBooks, AllRules
 
         super()._init_caches()
         self._things_cache = ThingsCache(self)
         self._node_contents_cache = NodeContentsCache(self)
+        self._path_cache = PathCache(self)
         self.character = self.graph = CharacterMapping(self)
         self._universal_cache = EntitylessCache(self)
         self._universal_cache.name = 'universal_cache'
@@ -1007,7 +1095,15 @@ class Engine(AbstractEngine, gORM):
             random_seed=None,
             logfun=None,
             validate=False,
-            clear=False
+            clear=False,
+            history_window=None,
+            keyframe_interval=None,
+            keyframe_changes=None,
+            keyframe_on_branch=False,
+            write_behind=None,
+            trigger_workers=None,
+            trigger_workers_threshold=0.1,
+            shallowest_maxsize=None
     ):
         """Store the connections for the world database and the code database;
         set up listeners; and start a transaction
@@ -1031,7 +1127,9 @@ class Engine(AbstractEngine, gORM):
         unless it's ``":memory:"``, which is an in-memory database that
         won't be saved
         :arg connect_args: dictionary of keyword arguments for the
-        database connection
+        database connection. With SQLite, ``{'profile': 'fast'}`` turns on
+        write-ahead logging and other settings that make writes quicker;
+        see ``LiSE.allegedb.query.SQLITE_PROFILES``
         :arg schema: a Schema class that determines which changes to allow to
         the world; used when a player should not be able to change just anything.
         Defaults to `NullSchema`
@@ -1046,10 +1144,42 @@ class Engine(AbstractEngine, gORM):
         loading the game
         :arg clear: whether to delete *any and all* existing data
         and code in ``prefix``. Use with caution!
+        :arg history_window: if supplied, only load this many turns
+        of history before the current one at startup, plus the nearest
+        keyframe. The rest gets loaded when something needs it.
+        :arg keyframe_interval: snap a keyframe of the world at the
+        start of a new turn, if it's been at least this many turns
+        since the last one
+        :arg keyframe_changes: snap a keyframe after this many changes
+        to the world since the last one
+        :arg keyframe_on_branch: whether to snap a keyframe at the start
+        of each new branch
+        :arg write_behind: whether to write changes to the database in
+        a background thread, making commits cheap. May be a dictionary
+        of keyword arguments to
+        :meth:`LiSE.allegedb.query.QueryEngine.start_write_behind`.
+        Doesn't work with ``alchemy=True``
+        :arg trigger_workers: how many processes to check triggers in,
+        for rules whose triggers were all declared read-only. Needs the
+        ``fork`` start method, so it's ignored on Windows. Doesn't work
+        with ``write_behind``. The workers are forked for each turn's
+        checks; if other threads are running then, a trigger that needs
+        a lock one of them holds, such as a logging handler's, may hang
+        :arg trigger_workers_threshold: how many seconds the read-only
+        triggers are expected to take, if checked serially, before it's
+        worth forking ``trigger_workers`` for them. Expectations come
+        from how long each rule's triggers took last time
+        :arg shallowest_maxsize: how many recently looked up values each
+        cache should remember, to save searching its history for them
+        again. Default ``LiSE.allegedb.cache.SHALLOWEST_MAXSIZE``
 
         """
         import os
         from .xcollections import StringStore
+        if trigger_workers and write_behind:
+            raise ValueError(
+                "Can't fork trigger workers while the write-behind "
+                "thread is using the database")
         self.exist_node_time = 0
         self.exist_edge_time = 0
         if string:
@@ -1095,7 +1225,13 @@ class Engine(AbstractEngine, gORM):
             connect_string or os.path.join(prefix, 'world.db'),
             connect_args=connect_args,
             alchemy=alchemy,
-            validate=validate
+            validate=validate,
+            history_window=history_window,
+            keyframe_interval=keyframe_interval,
+            keyframe_changes=keyframe_changes,
+            keyframe_on_branch=keyframe_on_branch,
+            write_behind=write_behind,
+            shallowest_maxsize=shallowest_maxsize
         )
         self._things_cache.setdb = self.query.set_thing_loc
         self._universal_cache.setdb = self.query.universal_set
@@ -1116,6 +1252,21 @@ class Engine(AbstractEngine, gORM):
                 getattr(logger, level)(msg)
         self.log = logfun
         self.commit_modulus = commit_modulus
+        self.trigger_workers = trigger_workers
+        self.trigger_workers_threshold = trigger_workers_threshold
+        self._trigger_costs = {}
+        self._serial_triggers = set()
+        self._read_only_triggers = set(
+            self.eternal.get('read_only_triggers', ()))
+        self._trigger_watches = {
+            name: tuple(stats) for (name, stats)
+            in self.eternal.get('trigger_watches', {}).items()
+        }
+        self._watched_changes = defaultdict(set)
+        self._quiet_triggers = {}
+        self._quiet_by_stat = defaultdict(set)
+        self._quiet_time = None
+        self._install_watchers()
         self.random_seed = random_seed
         self._rules_iter = self._follow_rules()
         # set up the randomizer
@@ -1133,7 +1284,44 @@ class Engine(AbstractEngine, gORM):
         from .rule import Rule
         q = self.query
         self._things_cache.load(q.things_dump())
+        self._avatarness_cache.load(q.avatars_dump())
+        self._universal_cache.load(q.universals_dump())
+        self._rulebooks_cache.load(q.rulebooks_dump())
+        self._characters_rulebooks_cache.load(
+            q.character_rulebook_dump())
+        self._avatars_rulebooks_cache.load(q.avatar_rulebook_dump())
+        self._characters_things_rulebooks_cache.load(
+            q.character_thing_rulebook_dump())
+        self._characters_places_rulebooks_cache.load(
+            q.character_place_rulebook_dump())
+        self._characters_portals_rulebooks_cache.load(
+            q.character_portal_rulebook_dump())
+        self._nodes_rulebooks_cache.load(q.node_rulebook_dump())
+        self._portals_rulebooks_cache.load(q.portal_rulebook_dump())
+        self._triggers_cache.load(q.rule_triggers_dump())
+        self._prereqs_cache.load(q.rule_prereqs_dump())
+        self._actions_cache.load(q.rule_actions_dump())
+        # rulebooks need to be loaded before the rules handled,
+        # which come in with the rest of history
         super()._init_load(validate=validate)
+        self._turns_completed.update(q.turns_completed_dump())
+        self._rules_cache = {
+            name: Rule(self, name, create=False) for name in q.rules_dump()}
+
+    def _load_history(self, window=None):
+        # history from the database isn't news to the triggers
+        watching = self._node_val_cache.watcher is not None
+        if watching:
+            self._install_watchers(False)
+        try:
+            self._load_history_rows(window)
+        finally:
+            if watching:
+                self._install_watchers()
+
+    def _load_history_rows(self, window):
+        super()._load_history(window)
+        q = self.query
         things_kf = self._things_cache.keyframe
         nv_kf = self._node_val_cache.keyframe
         for node, branches in nv_kf.items():
@@ -1152,47 +1340,27 @@ class Engine(AbstractEngine, gORM):
                                 })
                             else:
                                 things_kf[node][branch][turn][tick] = vals
-        self._avatarness_cache.load(q.avatars_dump())
-        self._universal_cache.load(q.universals_dump())
-        self._rulebooks_cache.load(q.rulebooks_dump())
-        self._characters_rulebooks_cache.load(
-            q.character_rulebook_dump())
-        self._avatars_rulebooks_cache.load(q.avatar_rulebook_dump())
-        self._characters_things_rulebooks_cache.load(
-            q.character_thing_rulebook_dump())
-        self._characters_places_rulebooks_cache.load(
-            q.character_place_rulebook_dump())
-        self._characters_portals_rulebooks_cache.load(
-            q.character_portal_rulebook_dump())
-        self._nodes_rulebooks_cache.load(q.node_rulebook_dump())
-        self._portals_rulebooks_cache.load(q.portal_rulebook_dump())
-        self._triggers_cache.load(q.rule_triggers_dump())
-        self._prereqs_cache.load(q.rule_prereqs_dump())
-        self._actions_cache.load(q.rule_actions_dump())
         store_crh = self._character_rules_handled_cache.store
-        for row in q.character_rules_handled_dump():
+        for row in q.character_rules_handled_dump(window):
             store_crh(*row, loading=True)
         store_arh = self._avatar_rules_handled_cache.store
-        for row in q.avatar_rules_handled_dump():
+        for row in q.avatar_rules_handled_dump(window):
             store_arh(*row, loading=True)
         store_ctrh = self._character_thing_rules_handled_cache.store
-        for row in q.character_thing_rules_handled_dump():
+        for row in q.character_thing_rules_handled_dump(window):
             store_ctrh(*row, loading=True)
         store_cprh = self._character_place_rules_handled_cache.store
-        for row in q.character_place_rules_handled_dump():
+        for row in q.character_place_rules_handled_dump(window):
             store_cprh(*row, loading=True)
         store_cporh = self._character_portal_rules_handled_cache.store
-        for row in q.character_portal_rules_handled_dump():
+        for row in q.character_portal_rules_handled_dump(window):
             store_cporh(*row, loading=True)
         store_cnrh = self._node_rules_handled_cache.store
-        for row in q.node_rules_handled_dump():
+        for row in q.node_rules_handled_dump(window):
             store_cnrh(*row, loading=True)
         store_porh = self._portal_rules_handled_cache.store
-        for row in q.portal_rules_handled_dump():
+        for row in q.portal_rules_handled_dump(window):
             store_porh(*row, loading=True)
-        self._turns_completed.update(q.turns_completed_dump())
-        self._rules_cache = {
-            name: Rule(self, name, create=False) for name in q.rules_dump()}
 
     @property
     def stores(self):
@@ -1238,14 +1406,9 @@ class Engine(AbstractEngine, gORM):
 
     def close(self):
         """Commit changes and close the database."""
-        import sys, os
         for store in self.stores:
             if hasattr(store, 'save'):
                 store.save(reimport=False)
-            path, filename = os.path.split(store._filename)
-            modname = filename[:-3]
-            if modname in sys.modules:
-                del sys.modules[modname]
         super().close()
 
     def __enter__(self):
@@ -1399,15 +1562,6 @@ class Engine(AbstractEngine, gORM):
         rulemap = self.rule
         todo = defaultdict(list)
 
-        def check_triggers(rule, handled_fun, entity):
-            for trigger in rule.triggers:
-                res = trigger(entity)
-                if res:
-                    return True
-            else:
-                handled_fun()
-                return False
-
         def check_prereqs(rule, handled_fun, entity):
             for prereq in rule.prereqs:
                 res = prereq(entity)
@@ -1425,13 +1579,10 @@ class Engine(AbstractEngine, gORM):
             handled_fun()
             return actres
 
-        # TODO: triggers that don't mutate anything should be
-        #  evaluated in parallel
-        #  Ideally this would be implemented with a pool of
-        #  "engines" that serve Facades
-        #  mirroring the state of the world on turn start,
-        #  kept in sync with deltas.
-        #  I think I could do it with regular concurrent.futures pools though.
+        # Collect every unhandled rule first, so that triggers
+        # declared read-only can be checked in parallel.
+        # Prereqs and actions still run serially, in rulebook order.
+        candidates = []
         for (
             charactername, rulebook, rulename
         ) in self._character_rules_handled_cache.iter_unhandled_rules(
@@ -1444,8 +1595,7 @@ class Engine(AbstractEngine, gORM):
                 self._handled_char, charactername, rulebook, rulename,
                 branch, turn, tick)
             entity = charmap[charactername]
-            if check_triggers(rule, handled, entity):
-                todo[rulebook].append((rule, handled, entity))
+            candidates.append((rulebook, rule, handled, entity))
         avcache_retr = self._avatarness_cache._base_retrieve
         node_exists = self._node_exists
         get_node = self._get_node
@@ -1463,8 +1613,7 @@ class Engine(AbstractEngine, gORM):
                 self._handled_av, charn, graphn, avn, rulebook, rulen,
                 branch, turn, tick)
             entity = get_node(graphn, avn)
-            if check_triggers(rule, handled, entity):
-                todo[rulebook].append((rule, handled, entity))
+            candidates.append((rulebook, rule, handled, entity))
         is_thing = self._is_thing
         handled_char_thing = self._handled_char_thing
         for (
@@ -1478,8 +1627,7 @@ class Engine(AbstractEngine, gORM):
                 handled_char_thing, charn, thingn, rulebook, rulen,
                 branch, turn, tick)
             entity = get_node(charn, thingn)
-            if check_triggers(rule, handled, entity):
-                todo[rulebook].append((rule, handled, entity))
+            candidates.append((rulebook, rule, handled, entity))
         handled_char_place = self._handled_char_place
         for (
             charn, placen, rulebook, rulen
@@ -1493,8 +1641,7 @@ class Engine(AbstractEngine, gORM):
                 handled_char_place, charn, placen, rulebook, rulen,
                 branch, turn, tick)
             entity = get_node(charn, placen)
-            if check_triggers(rule, handled, entity):
-                todo[rulebook].append((rule, handled, entity))
+            candidates.append((rulebook, rule, handled, entity))
         edge_exists = self._edge_exists
         get_edge = self._get_edge
         handled_char_port = self._handled_char_port
@@ -1510,8 +1657,7 @@ class Engine(AbstractEngine, gORM):
                 handled_char_port, charn, orign, destn, rulebook, rulen,
                 branch, turn, tick)
             entity = get_edge(charn, orign, destn)
-            if check_triggers(rule, handled, entity):
-                todo[rulebook].append((rule, handled, entity))
+            candidates.append((rulebook, rule, handled, entity))
         handled_node = self._handled_node
         for (
                 charn, noden, rulebook, rulen
@@ -1525,8 +1671,7 @@ class Engine(AbstractEngine, gORM):
                 handled_node, charn, noden, rulebook, rulen,
                 branch, turn, tick)
             entity = get_node(charn, noden)
-            if check_triggers(rule, handled, entity):
-                todo[rulebook].append((rule, handled, entity))
+            candidates.append((rulebook, rule, handled, entity))
         handled_portal = self._handled_portal
         for (
                 charn, orign, destn, rulebook, rulen
@@ -1540,8 +1685,14 @@ class Engine(AbstractEngine, gORM):
                 handled_portal, charn, orign, destn, rulebook, rulen,
                 branch, turn, tick)
             entity = get_edge(charn, orign, destn)
-            if check_triggers(rule, handled, entity):
+            candidates.append((rulebook, rule, handled, entity))
+        for (rulebook, rule, handled, entity), triggered in zip(
+            candidates, self._check_triggers(candidates)
+        ):
+            if triggered:
                 todo[rulebook].append((rule, handled, entity))
+            else:
+                handled()
 
         # TODO: rulebook priorities (not individual rule priorities, just follow the order of the rulebook)
         for rulebook in sort_set(todo.keys()):
@@ -1552,6 +1703,207 @@ class Engine(AbstractEngine, gORM):
                     except StopIteration:
                         raise InnerStopIteration
 
+    def declare_read_only_trigger(self, name):
+        """Promise that the trigger by this name never changes the world
+
+        Rules whose triggers are all read-only may have them checked in
+        parallel; see the ``trigger_workers`` argument.
+
+        """
+        if name in self._read_only_triggers:
+            return
+        self._read_only_triggers.add(name)
+        self.eternal['read_only_triggers'] = sorted(self._read_only_triggers)
+
+    def declare_trigger_watch(self, name, stats):
+        """Promise that the trigger by this name only depends on ``stats``
+
+        ``stats`` are keys of the entity the trigger is called on.
+        For nodes, ``'contents'`` stands for the things located there,
+        and ``'portals'`` for the portals in and out.
+
+        When all of a rule's triggers watch something, and they
+        returned ``False`` for some entity, I won't call them for that
+        entity again until one of the watched stats changes.
+
+        """
+        stats = tuple(stats)
+        if self._trigger_watches.get(name) == stats:
+            return
+        self._trigger_watches[name] = stats
+        self.eternal['trigger_watches'] = {
+            name: list(stats) for (name, stats)
+            in self._trigger_watches.items()
+        }
+        self._forget_quiet_triggers()
+        self._install_watchers()
+
+    def _install_watchers(self, install=True):
+        """Have my caches tell me when stats change, if any trigger
+        watches them"""
+        watcher = self._watched_change \
+            if install and self._trigger_watches else None
+        for cache in (
+            self._graph_val_cache, self._node_val_cache,
+            self._edge_val_cache, self._edges_cache, self._things_cache
+        ):
+            cache.watcher = watcher
+
+    def _watched_change(self, entity, stat, branch, turn):
+        self._watched_changes[branch, turn].add((entity, stat))
+
+    def _forget_quiet_triggers(self):
+        self._quiet_triggers = {}
+        self._quiet_by_stat = defaultdict(set)
+
+    def _update_quiet_triggers(self):
+        """Forget the triggers that may give a different result now
+
+        That's those watching a stat that's changed since they were
+        checked, or all of them, if time skipped since then.
+
+        """
+        branch, turn, tick = self._btt()
+        if self._quiet_time not in {(branch, turn - 1), (branch, turn)}:
+            self._forget_quiet_triggers()
+        self._quiet_time = branch, turn
+        changes = self._watched_changes
+        quiet = self._quiet_triggers
+        quiet_by_stat = self._quiet_by_stat
+        for (b, t) in list(changes):
+            if b != branch:
+                del changes[b, t]
+            elif t <= turn:
+                for stat in changes.pop((b, t)):
+                    for quiet_key in quiet_by_stat.pop(stat, ()):
+                        quiet.pop(quiet_key, None)
+
+    def _watch_key(self, rule, entity):
+        """Return a key to remember this rule's triggers by, or ``None``
+
+        ``None`` means at least one trigger doesn't declare what it
+        watches, so it has to be checked every turn.
+
+        """
+        if not rule.triggers:
+            return
+        watches = self._trigger_watches
+        stats = set()
+        for trigger in rule.triggers:
+            if trigger.__name__ not in watches:
+                return
+            stats.update(watches[trigger.__name__])
+        if hasattr(entity, 'orig'):
+            entity_key = (entity.character.name, entity.orig, entity.dest, 0)
+        elif entity.character is entity:
+            entity_key = (entity.name,)
+        else:
+            entity_key = (entity.character.name, entity.name)
+        return rule.name, entity_key, frozenset(stats)
+
+    def _check_triggers(self, candidates):
+        """Return a list of whether each rule in ``candidates`` triggered
+
+        ``candidates`` are tuples of ``(rulebook, rule, handled, entity)``.
+        If I have ``trigger_workers``, rules with only read-only
+        triggers may get checked in forked processes, each of which sees
+        the world as it was when the checking started. The workers are
+        forked anew each time, since that's how they see the present
+        state of the world, so I only do it when the triggers took
+        longer than ``trigger_workers_threshold`` last time.
+
+        Read-only triggers that fail in a worker, such as by using the
+        random number generator, get checked here instead, in the same
+        order as if there were no workers, and from then on.
+
+        """
+        results = [None] * len(candidates)
+        watch_keys = [None] * len(candidates)
+        if self._trigger_watches:
+            self._update_quiet_triggers()
+            quiet = self._quiet_triggers
+            for i, (_, rule, _, entity) in enumerate(candidates):
+                key = self._watch_key(rule, entity)
+                if key is not None and key[:2] in quiet:
+                    results[i] = False
+                else:
+                    watch_keys[i] = key
+        workers = self.trigger_workers
+        costs = self._trigger_costs
+        timed = set()
+        if workers and len(candidates) > 1:
+            read_only = self._read_only_triggers
+            serial = self._serial_triggers
+            timed = {
+                i for i, (_, rule, _, _) in enumerate(candidates)
+                if results[i] is None and rule.triggers
+                and rule.name not in serial and all(
+                    trigger.__name__ in read_only
+                    for trigger in rule.triggers
+                )
+            }
+            expected = sum(
+                costs.get(candidates[i][1].name, 0.) for i in timed)
+            if len(timed) > 1 and expected >= self.trigger_workers_threshold:
+                try:
+                    ctx = get_context('fork')
+                except ValueError:
+                    ctx = None
+                if ctx is not None:
+                    self._check_triggers_in_workers(
+                        candidates, sorted(timed), results, ctx)
+        spent = defaultdict(list)
+        for i, triggered in enumerate(results):
+            _, rule, _, entity = candidates[i]
+            if triggered is None:
+                if i in timed:
+                    start = monotonic()
+                    results[i] = triggered = _triggered(rule, entity)
+                    spent[rule.name].append(monotonic() - start)
+                else:
+                    results[i] = triggered = _triggered(rule, entity)
+            elif isinstance(triggered, tuple):
+                results[i], elapsed = triggered
+                triggered = results[i]
+                spent[rule.name].append(elapsed)
+            key = watch_keys[i]
+            if key is not None and not triggered:
+                rulename, entity_key, stats = key
+                self._quiet_triggers[rulename, entity_key] = stats
+                for stat in stats:
+                    self._quiet_by_stat[entity_key, stat].add(
+                        (rulename, entity_key))
+        for rulename, times in spent.items():
+            costs[rulename] = sum(times) / len(times)
+        return results
+
+    def _check_triggers_in_workers(self, candidates, parallel, results, ctx):
+        """Check the triggers of the ``parallel`` candidates in forked
+        workers, putting ``(triggered, seconds)`` pairs in ``results``
+
+        Rules whose triggers failed in a worker get their result left
+        as ``None``, and won't be sent to workers again.
+
+        """
+        global _trigger_candidates
+        workers = self.trigger_workers
+        _trigger_candidates = candidates
+        chunks = [
+            parallel[i::workers]
+            for i in range(min((workers, len(parallel))))
+        ]
+        try:
+            with ProcessPoolExecutor(len(chunks), mp_context=ctx) as pool:
+                for chunk, res in zip(
+                        chunks, pool.map(_check_trigger_chunk, chunks)
+                ):
+                    for i, checked in zip(chunk, res):
+                        results[i] = checked
+                        if checked is None:
+                            self._serial_triggers.add(candidates[i][1].name)
+        finally:
+            _trigger_candidates = None
+
     def advance(self):
         """Follow the next rule if available.
 
@@ -1621,6 +1973,36 @@ class Engine(AbstractEngine, gORM):
             loc
         )
 
+    def _plan_thing_locs(self, character, schedules):
+        """Plan where some things in ``character`` will be
+
+        ``schedules`` maps the names of things to lists of ``(turn,
+        location)`` pairs, in order. Each thing gets its own plan, as
+        if it had gone to each location with ``turn`` set accordingly,
+        but the present time never actually changes.
+
+        """
+        branch, turn_now, tick_now = self._btt()
+        turn_end_plan = self._turn_end_plan
+        store = self._things_cache.store
+        rows = []
+        try:
+            for thing, schedule in schedules.items():
+                with self.plan():
+                    for turn, loc in schedule:
+                        self._oturn = turn
+                        self._otick = turn_end_plan.setdefault(
+                            (branch, turn), 0)
+                        branch, turn, tick = self._nbtt()
+                        store(character, thing, branch, turn, tick, loc)
+                        rows.append(
+                            (character, thing, branch, turn, tick, loc))
+        finally:
+            self._oturn = turn_now
+            self._otick = tick_now
+            if rows:
+                self.query.set_thing_locs(rows)
+
     def alias(self, v, stat='dummy'):
         """Return a pointer to a value for use in historical queries.
 
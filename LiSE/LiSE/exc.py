@@ -108,6 +108,14 @@ class RulesEngineError(Exception):
     """
 
 
+class TriggerWorkerError(RulesEngineError):
+    """Tried to use something that a trigger can't in a worker process
+
+    The engine checks the trigger again in its own process.
+
+    """
+
+
 class RuleError(RulesEngineError):
     """For problems to do with rules
 
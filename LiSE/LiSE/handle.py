@@ -23,6 +23,7 @@ from collections import defaultdict
 from functools import partial
 from importlib import import_module
 from .engine import Engine
+from .wire import DeltaCodec, CompactDelta
 
 
 def dict_delta(old, new):
@@ -54,6 +55,17 @@ def set_delta(old, new):
     return r
 
 
+_char_rulebook_keys = {
+    'character_rulebook': 'character',
+    'avatar_rulebook': 'avatar',
+    'character_thing_rulebook': 'thing',
+    'character_place_rulebook': 'place',
+    'character_portal_rulebook': 'portal'
+}
+"""Map the engine's names for a character's rulebooks to mine"""
+_char_entity_keys = {'nodes', 'edges', 'node_val', 'edge_val', 'avatars'}
+
+
 def timely(fun):
     def run_timely(self, *args, **kwargs):
         ret = fun(self, *args, **kwargs)
@@ -78,6 +90,13 @@ class EngineHandle(object):
     to get a dictionary describing the changes since last you observed
     the :class:`LiSE.character.Character`.
 
+    Each consumer of deltas, named by the ``consumer`` argument to
+    the delta methods, has a cursor of the time it last observed.
+    Deltas come from the engine's journals of changes since then, and
+    so cost only as much as what changed. A consumer's first delta of
+    a character is the difference from the cached state, for the
+    default consumer, or the whole character, for others.
+
     """
     def __init__(self, args=(), kwargs=None, logq=None, loglevel=None):
         """Instantiate an engine with the positional arguments ``args`` and
@@ -120,6 +139,11 @@ class EngineHandle(object):
         self._rule_cache = {}
         self._rulebook_cache = defaultdict(list)
         self._stores_cache = defaultdict(dict)
+        self._char_cursors = defaultdict(dict)
+        self._world_cursors = {}
+        self._consumer_eternal_caches = {}
+        self._subscription = None
+        self._delta_codec = None
 
     def log(self, level, message):
         if isinstance(level, str):
@@ -163,19 +187,310 @@ class EngineHandle(object):
         """Run one rule"""
         self._real.advance()
 
-    def get_char_deltas(self, chars, *, store=True):
+    def get_char_deltas(self, chars, *, store=True, consumer=None):
         """Return a dict describing changes to characters since last call"""
+        return self._get_char_deltas(chars, store, consumer, {})
+
+    def _journal_since(self, cursor, memo):
+        """Get the engine's delta from ``cursor`` to now
+
+        ``memo`` is a dictionary keyed by cursor, so that consumers with
+        the same cursor only look through the journals once.
+
+        """
+        if cursor not in memo:
+            now = self._real._btt()
+            if cursor == now:
+                memo[cursor] = {}
+            else:
+                memo[cursor] = self._real.get_branch_delta(*cursor, *now)
+        return memo[cursor]
+
+    def _get_char_deltas(self, chars, store, consumer, memo):
         ret = {}
+        sub = self._subscription if consumer is None else None
         if chars == 'all':
             it = iter(self._real.character.keys())
+            if sub is not None:
+                it = (char for char in it if char in sub)
         else:
             it = iter(chars)
+        now = self._real._btt()
+        cursors = self._char_cursors[consumer]
         for char in it:
-            delt = self.character_delta(char, store=store)
+            cursor = cursors.get(char)
+            if cursor is not None:
+                journal = self._journal_since(cursor, memo).get(char)
+                if journal:
+                    if store and consumer is None:
+                        self._apply_char_delta(char, journal)
+                    delt = self._char_journal_delta(journal)
+                else:
+                    delt = {}
+            elif consumer is None:
+                delt = self._character_snapshot_delta(char, store=store)
+            else:
+                delt = self._character_fresh_delta(char)
+            if store:
+                cursors[char] = now
+            if sub is not None and char in sub:
+                delt = self._filter_char_delta(delt, *sub[char])
             if delt:
                 ret[char] = delt
         return ret
 
+    def set_subscription(self, subscription=None):
+        """Only send deltas of some characters, or some of their nodes
+        and stats
+
+        ``subscription`` is ``None`` to get everything, or a
+        dictionary keyed by the names of the characters to get. Each
+        value may be ``None`` for the whole character, or a dictionary
+        with ``'nodes'``, the names of the nodes to get, and
+        ``'stats'``, the names of the stats to get, for the character
+        and its nodes and portals. Leave either out to get all of them.
+        Portals only come through when both their ends do.
+
+        This filters the deltas from ``next_turn`` and ``time_travel``,
+        and the default consumer's deltas of ``'all'`` characters.
+
+        Return deltas describing the whole of each character whose
+        subscription changed, as far as it's subscribed now. Characters
+        no longer subscribed are left out, so forget them yourself.
+
+        """
+        if subscription is not None:
+            subscription = {
+                char: (None, None) if sub is None else (
+                    None if sub.get('nodes') is None
+                    else frozenset(sub['nodes']),
+                    None if sub.get('stats') is None
+                    else frozenset(sub['stats'])
+                ) for (char, sub) in subscription.items()
+            }
+        old = self._subscription
+        self._subscription = subscription
+
+        def subbed(sub, char):
+            if sub is None:
+                return None, None
+            return sub.get(char)
+        changed = [
+            char for char in self._real.character.keys()
+            if subbed(subscription, char) is not None
+            and subbed(subscription, char) != subbed(old, char)
+        ]
+        # catch up the cache of what the default consumer has seen,
+        # which may have fallen behind while these were unsubscribed
+        self._get_char_deltas(changed, True, None, {})
+        return {
+            char: self._filter_char_delta(
+                self._character_fresh_delta(char),
+                *subbed(subscription, char)
+            ) for char in changed
+        }
+
+    @staticmethod
+    def _filter_char_delta(delta, nodes, stats):
+        """Return the part of a character's delta about only the given
+        nodes and stats
+
+        Either may be ``None`` to mean all of them. The delta of a
+        deleted character is ``None``, which I return as it is.
+
+        """
+        if delta is None or (nodes is None and stats is None):
+            return delta
+
+        def keep_node(node):
+            return nodes is None or node in nodes
+
+        def keep_stats(vals, *always):
+            if stats is None:
+                return vals
+            return {k: v for (k, v) in vals.items()
+                    if k in stats or k in always}
+        ret = {}
+        for k, v in delta.items():
+            if k in _char_entity_keys:
+                continue
+            if stats is None or k in stats or k in _char_rulebook_keys \
+                    or k == 'rulebooks':
+                ret[k] = v
+        if 'avatars' in delta:
+            ret['avatars'] = delta['avatars']
+        if 'nodes' in delta:
+            nodes_delta = {node: ex for (node, ex) in delta['nodes'].items()
+                           if keep_node(node)}
+            if nodes_delta:
+                ret['nodes'] = nodes_delta
+        node_val = {}
+        for node, vals in delta.get('node_val', {}).items():
+            if keep_node(node):
+                vals = keep_stats(vals, 'location', 'rulebook')
+                if vals:
+                    node_val[node] = vals
+        if node_val:
+            ret['node_val'] = node_val
+        for key in ('edges', 'edge_val'):
+            edges = {}
+            for orig, dests in delta.get(key, {}).items():
+                if not keep_node(orig):
+                    continue
+                for dest, val in dests.items():
+                    if not keep_node(dest):
+                        continue
+                    if key == 'edge_val':
+                        val = keep_stats(val, 'rulebook')
+                        if not val:
+                            continue
+                    edges.setdefault(orig, {})[dest] = val
+            if edges:
+                ret[key] = edges
+        return ret
+
+    def _filter_delta(self, delta):
+        """Return the part of a delta from the engine that I'm
+        subscribed to
+
+        """
+        sub = self._subscription
+        if sub is None:
+            return delta
+        ret = {}
+        for k, v in delta.items():
+            if k in sub:
+                ret[k] = self._filter_char_delta(v, *sub[k])
+            elif k in ('eternal', 'universal', 'rules', 'rulebooks') \
+                    and k not in self._real.character:
+                ret[k] = v
+        return ret
+
+    @staticmethod
+    def _char_journal_delta(journal):
+        """Put a character's delta from the engine in the format of
+        ``character_delta``
+
+        """
+        ret = {}
+        for k, v in journal.items():
+            if k in _char_rulebook_keys:
+                ret.setdefault('rulebooks', {})[_char_rulebook_keys[k]] = v
+            elif k in _char_entity_keys:
+                if v:
+                    ret[k] = v
+            else:
+                ret[k] = v
+        return ret
+
+    def _apply_char_delta(self, char, delta):
+        """Update my cached copy of a character with a delta from the
+        engine
+
+        """
+        stats = self._char_stat_cache.setdefault(char, {})
+        rulebooks = self._char_rulebooks_cache.setdefault(char, {})
+        for k, v in delta.items():
+            if k in _char_rulebook_keys:
+                rulebooks[_char_rulebook_keys[k]] = v
+            elif k in _char_entity_keys:
+                continue
+            elif v is None:
+                stats.pop(k, None)
+            else:
+                stats[k] = v
+        node_stats = self._node_stat_cache[char]
+        node_rulebooks = self._char_nodes_rulebooks_cache[char]
+        portal_stats = self._portal_stat_cache[char]
+        portal_rulebooks = self._char_portals_rulebooks_cache[char]
+        if delta.get('nodes'):
+            nodes = set(self._char_nodes_cache.get(char, ()))
+            for node, ex in delta['nodes'].items():
+                if ex:
+                    nodes.add(node)
+                else:
+                    nodes.discard(node)
+                    node_stats.pop(node, None)
+                    node_rulebooks.pop(node, None)
+            self._char_nodes_cache[char] = frozenset(nodes)
+        for node, vals in delta.get('node_val', {}).items():
+            nodevals = node_stats.setdefault(node, {})
+            for k, v in vals.items():
+                if k == 'rulebook':
+                    node_rulebooks[node] = v
+                elif v is None:
+                    nodevals.pop(k, None)
+                else:
+                    nodevals[k] = v
+        if delta.get('edges'):
+            portals = set(self._char_portals_cache.get(char, ()))
+            for orig, dests in delta['edges'].items():
+                for dest, ex in dests.items():
+                    if ex:
+                        portals.add((orig, dest))
+                    else:
+                        portals.discard((orig, dest))
+                        portal_stats.get(orig, {}).pop(dest, None)
+                        portal_rulebooks.get(orig, {}).pop(dest, None)
+            self._char_portals_cache[char] = portals
+        for orig, dests in delta.get('edge_val', {}).items():
+            for dest, vals in dests.items():
+                portvals = portal_stats.setdefault(orig, {}).setdefault(
+                    dest, {})
+                for k, v in vals.items():
+                    if k == 'rulebook':
+                        portal_rulebooks.setdefault(orig, {})[dest] = v
+                    elif v is None:
+                        portvals.pop(k, None)
+                    else:
+                        portvals[k] = v
+        if delta.get('avatars'):
+            avatars = self._char_av_cache[char]
+            for graph, nodes in delta['avatars'].items():
+                graph_avatars = set(avatars.get(graph, ()))
+                for node, is_av in nodes.items():
+                    if is_av:
+                        graph_avatars.add(node)
+                    else:
+                        graph_avatars.discard(node)
+                if graph_avatars:
+                    avatars[graph] = frozenset(graph_avatars)
+                elif graph in avatars:
+                    del avatars[graph]
+
+    def _character_fresh_delta(self, char):
+        """Return a delta that describes the whole of ``char``"""
+        ret = self.character_stat_copy(char)
+        nodes = self.character_nodes(char)
+        if nodes:
+            ret['nodes'] = dict.fromkeys(nodes, True)
+        edges = {}
+        for orig, dest in self.character_portals(char):
+            edges.setdefault(orig, {})[dest] = True
+        if edges:
+            ret['edges'] = edges
+        avatars = {
+            graph: dict.fromkeys(nodes, True) for (graph, nodes)
+            in self.character_avatars_copy(char).items() if nodes
+        }
+        if avatars:
+            ret['avatars'] = avatars
+        ret['rulebooks'] = self.character_rulebooks_copy(char)
+        nv = self.character_nodes_stat_copy(char)
+        for node, rb in self.character_nodes_rulebooks_copy(char).items():
+            nv.setdefault(node, {})['rulebook'] = rb
+        nv = {node: vals for (node, vals) in nv.items() if vals}
+        if nv:
+            ret['node_val'] = nv
+        ev = self.character_portals_stat_copy(char)
+        for orig, dests in self.character_portals_rulebooks_copy(
+                char).items():
+            for dest, rb in dests.items():
+                ev.setdefault(orig, {}).setdefault(dest, {})['rulebook'] = rb
+        if ev:
+            ret['edge_val'] = ev
+        return ret
+
     def _upd_local_caches(self, delta=None):
         if delta is None:
             self._eternal_cache = dict(self._real.eternal)
@@ -247,22 +562,88 @@ class EngineHandle(object):
         self.debug('calling next_turn at {}, {}, {}'.format(*self._real._btt()))
         ret, delta = self._real.next_turn()
         self._after_ret = partial(self._upd_local_caches, delta)
-        return ret, delta
+        return ret, self._wire_delta(self._filter_delta(delta))
+
+    def set_delta_format(self, fmt):
+        """Choose how to send the deltas from ``next_turn`` and
+        ``time_travel``
 
-    def get_slow_delta(self, chars='all', store=True):
+        ``'plain'`` sends them as they are. ``'compact'`` encodes them
+        with a :class:`LiSE.wire.DeltaCodec`, whose symbol table starts
+        anew whenever you call this. The receiver must then decode every
+        one of them, in order, with its own fresh codec.
+
+        """
+        if fmt == 'plain':
+            self._delta_codec = None
+        elif fmt == 'compact':
+            self._delta_codec = DeltaCodec()
+        else:
+            raise ValueError("Unknown delta format: {}".format(fmt))
+
+    def _wire_delta(self, delta):
+        if self._delta_codec is None:
+            return delta
+        return CompactDelta(self._delta_codec, delta)
+
+    def get_slow_delta(self, chars='all', store=True, consumer=None):
+        memo = {}
         delta = {}
         if chars:
-            delta = self.get_char_deltas(chars, store=store)
-        etd = self.eternal_delta(store=store)
+            delta = self._get_char_deltas(chars, store, consumer, memo)
+        if consumer is None:
+            etd = self.eternal_delta(store=store)
+        else:
+            new = self.eternal_copy()
+            etd = dict_delta(
+                self._consumer_eternal_caches.get(consumer, {}), new)
+            if store:
+                self._consumer_eternal_caches[consumer] = new
         if etd:
             delta['eternal'] = etd
-        unid = self.universal_delta(store=store)
+        cursor = self._world_cursors.get(consumer)
+        if cursor is not None:
+            journal = self._journal_since(cursor, memo)
+            unid = journal.get('universal')
+            rud = journal.get('rules')
+            rbd = journal.get('rulebooks')
+            if store and consumer is None:
+                if unid:
+                    for k, v in unid.items():
+                        if v is None:
+                            self._universal_cache.pop(k, None)
+                        else:
+                            self._universal_cache[k] = v
+                if rud:
+                    for rule, funs in rud.items():
+                        self._rule_cache.setdefault(rule, {
+                            'triggers': [], 'prereqs': [], 'actions': []
+                        }).update(funs)
+                if rbd:
+                    self._rulebook_cache.update(rbd)
+        elif consumer is None:
+            unid = self.universal_delta(store=store)
+            rud = self.all_rules_delta(store=store)
+            rbd = self.all_rulebooks_delta(store=store)
+        else:
+            unid = self.universal_copy()
+            rud = {}
+            for rule in self._real.rule.keys():
+                funs = {
+                    k: v for (k, v) in self.rule_copy(rule).items() if v}
+                if funs:
+                    rud[rule] = funs
+            rbd = {}
+            for rulebook in self._real.rulebook.keys():
+                rules = self.rulebook_copy(rulebook)
+                if rules:
+                    rbd[rulebook] = rules
+        if store:
+            self._world_cursors[consumer] = self._real._btt()
         if unid:
             delta['universal'] = unid
-        rud = self.all_rules_delta(store=store)
         if rud:
             delta['rules'] = rud
-        rbd = self.all_rulebooks_delta(store=store)
         if rbd:
             delta['rulebooks'] = rbd
         return delta
@@ -270,7 +651,7 @@ class EngineHandle(object):
     @timely
     def time_travel(self, branch, turn, tick=None, chars='all'):
         branch_from, turn_from, tick_from = self._real._btt()
-        slow_delta = branch != branch_from
+        branch_changed = branch != branch_from
         self._real.time = (branch, turn)
         if tick is None:
             self.tick = tick = self._real.tick
@@ -278,12 +659,13 @@ class EngineHandle(object):
             self._real.tick = tick
         self.branch = branch
         self.turn = turn
-        if slow_delta:
-            delta = self.get_slow_delta(chars)
+        if branch_changed:
+            delta = self._real.get_branch_delta(
+                branch_from, turn_from, tick_from, branch, turn, tick)
         else:
             delta = self._real.get_delta(branch, turn_from, tick_from, turn, tick)
-            self._after_ret = partial(self._upd_local_caches, delta)
-        return None, delta
+        self._after_ret = partial(self._upd_local_caches, delta)
+        return None, self._wire_delta(self._filter_delta(delta))
 
     @timely
     def increment_branch(self, chars=[]):
@@ -471,6 +853,9 @@ class EngineHandle(object):
         ):
             if char in cache:
                 del cache[char]
+        for cursors in self._char_cursors.values():
+            if char in cursors:
+                del cursors[char]
 
     def character_stat_copy(self, char):
         return {
@@ -624,8 +1009,13 @@ class EngineHandle(object):
                     ov[dest]['rulebook'] = rb
         return ret
 
-    def character_delta(self, char, *, store=True):
+    def character_delta(self, char, *, store=True, consumer=None):
         """Return a dictionary of changes to ``char`` since previous call."""
+        return self.get_char_deltas(
+            [char], store=store, consumer=consumer).get(char, {})
+
+    def _character_snapshot_delta(self, char, *, store=True):
+        """Return the difference between ``char`` and my cached copy of it"""
         ret = self.character_stat_delta(char, store=store)
         nodes = self.character_nodes_delta(char, store=store)
         chara = self._real.character[char]
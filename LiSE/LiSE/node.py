@@ -21,8 +21,6 @@ thing. This module is for what they have in common.
 """
 from collections.abc import Mapping, ValuesView
 
-from networkx import shortest_path, shortest_path_length
-
 from .allegedb import graph, HistoryError
 
 from .util import getatt
@@ -404,8 +402,9 @@ class Node(graph.Node, rule.RuleFollower):
 
         """
 
-        return shortest_path_length(
-            self.character, self.name, self._plain_dest_name(dest), weight
+        return self.engine._path_cache.shortest_path_length(
+            self.character.name, self.name, self._plain_dest_name(dest),
+            weight
         )
 
     def shortest_path(self, dest, weight=None):
@@ -415,8 +414,9 @@ class Node(graph.Node, rule.RuleFollower):
         or the name of one.
 
         """
-        return shortest_path(
-            self.character, self.name, self._plain_dest_name(dest), weight
+        return self.engine._path_cache.shortest_path(
+            self.character.name, self.name, self._plain_dest_name(dest),
+            weight
         )
 
     def path_exists(self, dest, weight=None):
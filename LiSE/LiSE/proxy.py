@@ -20,6 +20,8 @@ and any change you make to a proxy will be made in the corresponding
 entity in the LiSE core.
 
 """
+import asyncio
+import os
 import sys
 import logging
 from abc import abstractmethod
@@ -29,22 +31,33 @@ from collections.abc import (
     MutableMapping,
     MutableSequence
 )
+from collections import namedtuple
 from functools import partial
+from itertools import count
+from struct import pack, pack_into, unpack_from
 from threading import Thread, Lock
 from multiprocessing import Process, Pipe, Queue, ProcessError
-from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.reduction import ForkingPickler
+from concurrent.futures import ThreadPoolExecutor, Future
+from contextlib import contextmanager
 from queue import Empty
 
+import msgpack
 from blinker import Signal
 
 from .allegedb import HistoryError
 from .allegedb.cache import PickyDefaultDict, StructuredDefaultDict
 from .allegedb.wrap import DictWrapper, ListWrapper, SetWrapper, UnwrappingDict
-from .engine import AbstractEngine
+from .engine import (
+    AbstractEngine, MSGPACK_CHARACTER, MSGPACK_PLACE, MSGPACK_THING,
+    MSGPACK_PORTAL, MSGPACK_FUNCTION, MSGPACK_METHOD, MSGPACK_TRIGGER,
+    MSGPACK_PREREQ, MSGPACK_ACTION
+)
 from .character import Facade, AbstractCharacter
 from .reify import reify
 from .util import getatt
 from .handle import EngineHandle
+from .wire import DeltaCodec
 from .xcollections import AbstractLanguageDescriptor
 from .node import NodeContent, UserMapping, UserDescriptor
 from .place import Place
@@ -1769,7 +1782,7 @@ class StringStoreProxy(Signal):
 
     def __setattr__(self, k, v):
         if k in ('_cache', 'engine', 'language', '_language', 'receivers',
-                 '_by_receiver', '_by_sender', '_weak_senders'):
+                 '_by_receiver', '_by_sender', '_weak_senders', 'is_muted'):
             super().__setattr__(k, v)
             return
         self._cache[k] = v
@@ -1970,7 +1983,8 @@ class FuncStoreProxy(Signal):
 
     def __setattr__(self, func_name, source):
         if func_name in ('engine', '_store', '_cache', 'receivers',
-                         '_by_sender', '_by_receiver', '_weak_senders'):
+                         '_by_sender', '_by_receiver', '_weak_senders',
+                         'is_muted'):
             super().__setattr__(func_name, source)
             return
         self.engine.handle(
@@ -2154,7 +2168,8 @@ class EngineProxy(AbstractEngine):
     def __init__(
             self, handle_out, handle_in, logger,
             do_game_start=False,  install_modules=[],
-            submit_func=None, threads=None
+            submit_func=None, threads=None, subscription=None,
+            delta_format='plain'
     ):
         if submit_func:
             self._submit = submit_func
@@ -2167,6 +2182,7 @@ class EngineProxy(AbstractEngine):
         self._handle_in_lock = Lock()
         self._handle_lock = Lock()
         self._commit_lock = Lock()
+        self._batch = None
         self.logger = logger
 
         for module in install_modules:
@@ -2230,6 +2246,14 @@ class EngineProxy(AbstractEngine):
         self._rulebooks_cache = self.handle('all_rulebooks_delta')
         self._eternal_cache = self.handle('eternal_delta')
         self._universal_cache = self.handle('universal_delta')
+        if delta_format != 'plain':
+            self.handle('set_delta_format', fmt=delta_format)
+            self._delta_codec = DeltaCodec()
+        if subscription is not None:
+            self._subscription = self._normalize_subscription(subscription)
+            self.handle('set_subscription', subscription=self._subscription)
+        else:
+            self._subscription = None
         deltas = self.handle('get_char_deltas', chars='all')
         for char, delta in deltas.items():
             if char not in self.character:
@@ -2292,6 +2316,9 @@ class EngineProxy(AbstractEngine):
         I will return a ``Future``. The ``Future``'s return value
         is a tuple of ``(command, branch, turn, tick, result)``.
 
+        Inside a ``with`` block of :meth:`batch`, commands that don't
+        block get queued and sent all together.
+
         """
         if 'command' in kwargs:
             cmd = kwargs['command']
@@ -2302,6 +2329,15 @@ class EngineProxy(AbstractEngine):
         branching = kwargs.get('branching', False)
         cb = kwargs.pop('cb', None)
         future = kwargs.pop('future', False)
+        if self._batch is not None:
+            if not kwargs.pop('block', True):
+                kwargs['silent'] = not (branching or cb or future)
+                fut = None if kwargs['silent'] else Future()
+                self._batch.append((kwargs, cb, fut))
+                return fut
+            # need the result now, so everything before it has to go first
+            queued, self._batch = self._batch, []
+            self._batch_results.extend(self._send_batch(queued))
         self._handle_lock.acquire()
         if kwargs.pop('block', True):
             assert not kwargs.get('silent')
@@ -2342,15 +2378,88 @@ class EngineProxy(AbstractEngine):
                 return self._submit(self._unpack_recv)
         self._handle_lock.release()
 
+    @contextmanager
+    def batch(self):
+        """Send all the commands in the ``with`` block in one message
+
+        Commands sent with ``block=False`` are queued, and instead of a
+        ``Future`` from a thread, you get a
+        :class:`concurrent.futures.Future` that will have the same
+        ``(command, branch, turn, tick, result)`` tuple once the batch
+        has been run, or ``None`` for silent commands. The LiSE core
+        runs the whole batch in order and sends back all the results
+        at once. If a command raises an exception, it goes in that
+        command's slot of the results, and the rest of the batch still
+        runs.
+
+        A blocking command in the ``with`` block sends the queue ahead
+        of itself, since it has to wait for its result anyway.
+
+        This yields a list, which will have one result for every
+        command in the batch, in order, when the block is done.
+
+        """
+        if self._batch is not None:
+            yield self._batch_results
+            return
+        self._batch = []
+        self._batch_results = results = []
+        try:
+            yield results
+        finally:
+            queued, self._batch = self._batch, None
+            results.extend(self._send_batch(queued))
+            del self._batch_results
+
+    def _send_batch(self, queued):
+        if not queued:
+            return []
+        with self._handle_lock:
+            self.debug('EngineProxy: sending batch of {} commands'.format(
+                len(queued)))
+            self.send(self.pack([instruction for (instruction, _, _)
+                                 in queued]))
+            command, branch, turn, tick, result = self.recv()
+            results = self.unpack(result)
+        assert command == 'batch', \
+            "Sent a batch but received results for {}".format(command)
+        self.debug('EngineProxy: received batch results {}'.format(
+            (branch, turn, tick, results)))
+        if (branch, turn, tick) != self._btt():
+            self._branch = branch
+            self._turn = turn
+            self._tick = tick
+            self.time.send(self, branch=branch, turn=turn, tick=tick)
+            if hasattr(self, 'branching_cb') and any(
+                    instruction.get('branching')
+                    for (instruction, _, _) in queued
+            ):
+                self.branching_cb(command=command, branch=branch,
+                                  turn=turn, tick=tick, result=results)
+        for (instruction, cb, fut), r in zip(queued, results):
+            cmd = instruction['command']
+            if isinstance(r, Exception) and not (cb or fut):
+                self.warning("{} raised by silent command {}".format(
+                    repr(r), cmd))
+            if cb:
+                cb(command=cmd, branch=branch, turn=turn, tick=tick,
+                   result=r)
+            if fut is not None:
+                fut.set_result((cmd, branch, turn, tick, r))
+        return results
+
     def _unpack_recv(self):
         command, branch, turn, tick, result = self.recv()
+        # unpack before letting anyone else receive, so compact deltas
+        # get decoded in the order they were sent
+        res = self.unpack(result)
         self._handle_lock.release()
-        return command, branch, turn, tick, self.unpack(result)
+        return command, branch, turn, tick, res
 
     def _callback(self, cb):
         command, branch, turn, tick, result = self.recv()
-        self._handle_lock.release()
         res = self.unpack(result)
+        self._handle_lock.release()
         self.debug('EngineProxy: received, with callback {}: {}'.format(
             cb, (command, branch, turn, tick, res))
         )
@@ -2371,8 +2480,8 @@ class EngineProxy(AbstractEngine):
 
     def _branching(self, cb=None):
         command, branch, turn, tick, result = self.recv()
-        self._handle_lock.release()
         r = self.unpack(result)
+        self._handle_lock.release()
         self.debug('EngineProxy: received, with branching, {}'.format(
             (command, branch, turn, tick, r)))
         if (branch, turn, tick) != (self._branch, self._turn, self._tick):
@@ -2472,6 +2581,56 @@ class EngineProxy(AbstractEngine):
         else:
             return self._submit(self._pull_async, chars, cb)
 
+    @staticmethod
+    def _normalize_subscription(subscription):
+        if subscription is None or isinstance(subscription, Mapping):
+            return subscription
+        return dict.fromkeys(subscription)
+
+    def subscribe(self, subscription=None):
+        """Only keep track of some characters, or some of their nodes
+        and stats
+
+        ``subscription`` may be a collection of character names, or
+        a dictionary keyed by them, with values of ``None`` for the
+        whole character, or dictionaries with ``'nodes'`` and
+        ``'stats'``, collections of the names of nodes and stats to
+        keep track of. Leave either out for all of them. Portals are
+        only tracked when both their ends are.
+
+        ``None``, the default, subscribes to everything.
+
+        The LiSE core leaves everything else out of the deltas it sends
+        me. Characters whose subscriptions changed are fetched anew, and
+        the rest are left alone.
+
+        """
+        subscription = self._normalize_subscription(subscription)
+        deltas = self.handle('set_subscription', subscription=subscription)
+        self._subscription = subscription
+        for char in list(self._char_cache):
+            if char in deltas or (
+                    subscription is not None and char not in subscription):
+                self._forget_character(char)
+        for char, delta in deltas.items():
+            self._char_cache[char] = CharacterProxy(self, char)
+            self._char_cache[char]._apply_delta(delta)
+
+    def _forget_character(self, char):
+        """Drop everything I know about a character, without deleting it"""
+        del self._char_cache[char]
+        for cache in (
+                self._char_stat_cache, self._node_stat_cache,
+                self._portal_stat_cache, self._things_cache,
+                self._character_places_cache, self._character_avatars_cache,
+                self._character_rulebooks_cache,
+                self._char_node_rulebooks_cache,
+                self._char_port_rulebooks_cache
+        ):
+            cache.pop(char, None)
+        self._character_portals_cache.successors.pop(char, None)
+        self._character_portals_cache.predecessors.pop(char, None)
+
     def _upd_and_cb(self, cb, *args, **kwargs):
         self._upd_caches(*args, no_del=True, **kwargs)
         self._set_time(*args, no_del=True, **kwargs)
@@ -2635,6 +2794,362 @@ class EngineProxy(AbstractEngine):
                 yield thing.name
 
 
+class AsyncEngineProxy(AbstractEngine):
+    """Send commands to a LiSE core from asyncio, without threads
+
+    I speak the same protocol as :class:`EngineProxy`, but
+    :meth:`handle` is a coroutine, and any number of commands may be
+    in flight at once. Each command is tagged with a correlation ID,
+    which the core echoes in its reply, so replies find their way to
+    the right waiters.
+
+    I don't keep any caches of the world, nor any proxies of
+    entities. Characters, nodes, and portals in results come back as
+    their keys: the character's name, ``(character, node)``, or
+    ``(character, origin, destination)``. With
+    ``delta_format='compact'``, deltas travel in the compact form of
+    :class:`LiSE.wire.DeltaCodec`, but come back to you decoded.
+    ``subscription`` is as for :meth:`EngineProxy.subscribe`. If the
+    core can't use either, your first :meth:`handle` raises the error.
+
+    Make me with ``EngineProcessManager.start(asynchronous=True)``,
+    inside a running event loop. I read and write the pipes with
+    non-blocking I/O from the loop itself, so I only work with plain
+    pipes, on platforms whose event loop can watch them.
+
+    """
+    _setup = ()
+
+    def __init__(
+            self, handle_out, handle_in, logger, loop=None,
+            delta_format='plain', subscription=None
+    ):
+        if delta_format not in ('plain', 'compact'):
+            raise ValueError("Unknown delta format: {}".format(delta_format))
+        self._handle_out = handle_out
+        self._handle_in = handle_in
+        self.logger = logger
+        self._loop = loop or asyncio.get_event_loop()
+        self._out_fd = handle_out.fileno()
+        self._in_fd = handle_in.fileno()
+        os.set_blocking(self._out_fd, False)
+        os.set_blocking(self._in_fd, False)
+        self._outbox = bytearray()
+        self._inbox = bytearray()
+        self._pending = {}
+        self._correlations = count()
+        self._branch = self._turn = self._tick = None
+        self._loop.add_reader(self._in_fd, self._read)
+        self._setup = []
+        if delta_format == 'compact':
+            # replies get unpacked in the order they were sent, so the
+            # codec keeps up with the core's
+            self._delta_codec = DeltaCodec()
+            self._setup.append(
+                self.submit('set_delta_format', fmt=delta_format))
+        if subscription is not None:
+            self._setup.append(self.submit(
+                'set_subscription',
+                subscription=EngineProxy._normalize_subscription(
+                    subscription)))
+
+    @property
+    def branch(self):
+        return self._branch
+
+    @property
+    def turn(self):
+        return self._turn
+
+    @property
+    def tick(self):
+        return self._tick
+
+    def _btt(self):
+        return self._branch, self._turn, self._tick
+
+    def _world_pack_handlers(self, packer):
+        # entities are sent as their keys, which pack themselves
+        return {}
+
+    def _world_unpack_handlers(self, unpacker):
+        def unpack_key(ext):
+            key = unpacker(ext)
+            return tuple(key) if isinstance(key, list) else key
+
+        return {
+            MSGPACK_CHARACTER: unpack_key,
+            MSGPACK_PLACE: unpack_key,
+            MSGPACK_THING: unpack_key,
+            MSGPACK_PORTAL: unpack_key,
+            MSGPACK_TRIGGER: unpacker,
+            MSGPACK_PREREQ: unpacker,
+            MSGPACK_ACTION: unpacker,
+            MSGPACK_FUNCTION: unpacker,
+            MSGPACK_METHOD: unpacker
+        }
+
+    async def handle(self, cmd=None, **kwargs):
+        """Send a command to the LiSE core, and return its result
+
+        The only positional argument should be the name of a
+        method in :class:`EngineHandle`. All keyword arguments
+        will be passed to it, except ``branching`` and ``silent``.
+
+        With ``branching=True``, handle paradoxes by creating new
+        branches of history.
+
+        With ``silent=True``, don't wait for a result, and return
+        ``None`` right away. If the command fails, the exception
+        will be logged.
+
+        If the command raises an exception, so will I.
+
+        """
+        if self._setup:
+            setup, self._setup = self._setup, []
+            await asyncio.gather(*setup)
+        fut = self.submit(cmd, **kwargs)
+        if fut is not None:
+            return await fut
+
+    def submit(self, cmd=None, **kwargs):
+        """Send a command to the LiSE core without waiting for it
+
+        Takes the same arguments as :meth:`handle`, and returns an
+        :class:`asyncio.Future` of the result, or ``None`` for silent
+        commands.
+
+        """
+        if 'command' in kwargs:
+            cmd = kwargs['command']
+        elif cmd:
+            kwargs['command'] = cmd
+        else:
+            raise TypeError("No command")
+        if self._in_fd is None:
+            raise BrokenPipeError("Proxy closed")
+        kwargs['correlation'] = correlation = next(self._correlations)
+        fut = None
+        if not kwargs.get('silent'):
+            fut = self._pending[correlation] = self._loop.create_future()
+        self._write(ForkingPickler.dumps(self.pack(kwargs)))
+        return fut
+
+    def _write(self, payload):
+        # same framing as multiprocessing.connection.Connection
+        n = len(payload)
+        if n > 0x7fffffff:
+            header = pack('!iQ', -1, n)
+        else:
+            header = pack('!i', n)
+        if self._outbox:
+            self._outbox += header + payload
+            return
+        data = header + payload
+        try:
+            written = os.write(self._out_fd, data)
+        except BlockingIOError:
+            written = 0
+        if written < len(data):
+            self._outbox += data[written:]
+            self._loop.add_writer(self._out_fd, self._flush)
+
+    def _flush(self):
+        try:
+            written = os.write(self._out_fd, self._outbox)
+        except BlockingIOError:
+            return
+        del self._outbox[:written]
+        if not self._outbox:
+            self._loop.remove_writer(self._out_fd)
+
+    def _read(self):
+        while True:
+            try:
+                chunk = os.read(self._in_fd, 1 << 16)
+            except BlockingIOError:
+                break
+            if not chunk:
+                self._disconnect(EOFError("LiSE core hung up"))
+                return
+            self._inbox += chunk
+        inbox = self._inbox
+        while len(inbox) >= 4:
+            n, = unpack_from('!i', inbox)
+            start = 4
+            if n == -1:
+                if len(inbox) < 12:
+                    break
+                n, = unpack_from('!Q', inbox, 4)
+                start = 12
+            if len(inbox) < start + n:
+                break
+            msg = ForkingPickler.loads(inbox[start:start + n])
+            del inbox[:start + n]
+            self._receive(*msg)
+
+    def _receive(self, correlation, command, branch, turn, tick, result):
+        self._branch = branch
+        self._turn = turn
+        self._tick = tick
+        try:
+            r = self.unpack(result)
+        except Exception as ex:
+            r = ex
+        fut = self._pending.pop(correlation, None)
+        if fut is None:
+            if isinstance(r, Exception):
+                self.logger.warning(
+                    "{} raised by silent command {}".format(repr(r), command))
+            return
+        if fut.cancelled():
+            return
+        if isinstance(r, Exception):
+            fut.set_exception(r)
+        else:
+            fut.set_result(r)
+
+    def _disconnect(self, ex):
+        if self._in_fd is None:
+            return
+        self._loop.remove_reader(self._in_fd)
+        if self._outbox:
+            self._loop.remove_writer(self._out_fd)
+        self._in_fd = None
+        for fut in self._pending.values():
+            if not fut.done():
+                fut.set_exception(ex)
+        self._pending = {}
+
+    def close(self):
+        """Tell the LiSE core to shut down
+
+        Commands still waiting for results will raise
+        :class:`BrokenPipeError`.
+
+        """
+        self._disconnect(BrokenPipeError("Proxy closed"))
+        # the core should get everything that was sent before this
+        os.set_blocking(self._out_fd, True)
+        while self._outbox:
+            del self._outbox[:os.write(self._out_fd, self._outbox)]
+        self._handle_out.send('shutdown')
+
+
+RING_SIZE = 2 ** 24
+"""Default size of each shared memory ring buffer, in bytes"""
+RING_THRESHOLD = 4096
+"""Payloads shorter than this go through the pipe even when there's a ring"""
+
+_InRing = namedtuple('_InRing', ['length', 'head'])
+"""Stand-in for a message whose payload went into the ring buffer"""
+
+
+class RingConnection(object):
+    """One end of a one-way pipe that sends big payloads through shared
+    memory
+
+    Only small control messages go through ``conn``, a
+    :class:`multiprocessing.connection.Connection`. The payload of a
+    message--the message itself if it's ``bytes``, or the last item of
+    a tuple--goes into a ring buffer in ``shm``, a
+    :class:`multiprocessing.shared_memory.SharedMemory`, when it's at
+    least ``threshold`` bytes long and there's room for it. Otherwise,
+    the whole message goes through the pipe.
+
+    The first eight bytes of ``shm`` hold how many bytes the receiving
+    end has read out of the ring. Only the receiver writes there.
+
+    """
+    header = 8
+
+    def __init__(self, conn, shm, threshold=RING_THRESHOLD):
+        self.conn = conn
+        self.shm = shm
+        self.threshold = threshold
+        self._size = shm.size - self.header
+        self._written = 0
+        self._read = 0
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        # Unpickling attached to the shared memory, which registered it
+        # with the resource tracker, as if this process were to unlink it.
+        # That's for the process that made it to do.
+        if os.name == 'posix':
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(self.shm._name, 'shared_memory')
+
+    def _free(self):
+        buf = self.shm.buf
+        read = unpack_from('<Q', buf)[0]
+        # the receiver might be halfway through writing it
+        while read != unpack_from('<Q', buf)[0]:
+            read = unpack_from('<Q', buf)[0]
+        return self._size - (self._written - read)
+
+    def send(self, obj):
+        if isinstance(obj, bytes):
+            payload = obj
+            head = None
+        elif isinstance(obj, tuple) and obj and isinstance(obj[-1], bytes):
+            payload = obj[-1]
+            head = obj[:-1]
+        else:
+            self.conn.send(obj)
+            return
+        n = len(payload)
+        if n < self.threshold or n > self._free():
+            self.conn.send(obj)
+            return
+        buf = self.shm.buf
+        size = self._size
+        start = self._written % size
+        first = min((n, size - start))
+        payload = memoryview(payload)
+        buf[self.header+start:self.header+start+first] = payload[:first]
+        if first < n:
+            buf[self.header:self.header+n-first] = payload[first:]
+        self._written += n
+        self.conn.send(_InRing(n, head))
+
+    def recv(self):
+        got = self.conn.recv()
+        if not isinstance(got, _InRing):
+            return got
+        n, head = got
+        buf = self.shm.buf
+        size = self._size
+        start = self._read % size
+        first = min((n, size - start))
+        payload = bytes(buf[self.header+start:self.header+start+first])
+        if first < n:
+            payload += bytes(buf[self.header:self.header+n-first])
+        self._read += n
+        pack_into('<Q', buf, 0, self._read)
+        if head is None:
+            return payload
+        return head + (payload,)
+
+    def poll(self, timeout=0.):
+        return self.conn.poll(timeout)
+
+    def close(self):
+        self.conn.close()
+        self.shm.close()
+
+
+def _run_instruction(engine_handle, instruction):
+    cmd = instruction.pop('command')
+    if instruction.pop('branching', False):
+        try:
+            return getattr(engine_handle, cmd)(**instruction)
+        except HistoryError:
+            engine_handle.increment_branch()
+    return getattr(engine_handle, cmd)(**instruction)
+
+
 def subprocess(
     args, kwargs, handle_out_pipe, handle_in_pipe, logq, loglevel
 ):
@@ -2663,22 +3178,39 @@ def subprocess(
             logq.close()
             return 0
         instruction = engine_handle.unpack(inst)
+        if isinstance(instruction, list):
+            # a batch; run it all and send back one result per command
+            results = []
+            for instruct in instruction:
+                silent = instruct.pop('silent', False)
+                try:
+                    r = _run_instruction(engine_handle, instruct)
+                except Exception as e:
+                    log('exception', repr(e))
+                    results.append(e)
+                    continue
+                finally:
+                    if hasattr(engine_handle, '_after_ret'):
+                        engine_handle._after_ret()
+                        del engine_handle._after_ret
+                results.append(None if silent else r)
+            handle_in_pipe.send((
+                'batch', engine_handle.branch,
+                engine_handle.turn, engine_handle.tick,
+                engine_handle.pack(results)
+            ))
+            continue
         silent = instruction.pop('silent',  False)
-        cmd = instruction.pop('command')
-
-        branching = instruction.pop('branching', False)
+        # asynchronous proxies tag their commands, so they can tell
+        # which reply is which
+        correlation = instruction.pop('correlation', None)
+        tag = () if correlation is None else (correlation,)
+        cmd = instruction['command']
         try:
-            if branching:
-                try:
-                    r = getattr(engine_handle, cmd)(**instruction)
-                except HistoryError:
-                    engine_handle.increment_branch()
-                    r = getattr(engine_handle, cmd)(**instruction)
-            else:
-                r = getattr(engine_handle, cmd)(**instruction)
+            r = _run_instruction(engine_handle, instruction)
         except Exception as e:
             log('exception', repr(e))
-            handle_in_pipe.send((
+            handle_in_pipe.send(tag + (
                 cmd, engine_handle.branch,
                 engine_handle.turn, engine_handle.tick,
                 engine_handle.pack(e)
@@ -2686,7 +3218,7 @@ def subprocess(
             continue
         if silent:
             continue
-        handle_in_pipe.send((
+        handle_in_pipe.send(tag + (
             cmd, engine_handle.branch, engine_handle.turn, engine_handle.tick,
             engine_handle.pack(r)
         ))
@@ -2701,6 +3233,29 @@ class RedundantProcessError(ProcessError):
 
 class EngineProcessManager(object):
     def start(self, *args, **kwargs):
+        """Start a LiSE core in a subprocess, and return a proxy to it
+
+        Arguments are passed to :class:`LiSE.Engine`, except for a few
+        keyword arguments of my own:
+
+        * ``loglevel``, ``logger``, and ``logfile`` for logging
+        * ``do_game_start`` and ``install_modules``, passed to
+          :class:`EngineProxy`
+        * ``transport``, which is ``'pipe'`` by default. With
+          ``'shared_memory'``, big payloads, such as deltas, go through
+          ring buffers in shared memory, and only small messages go
+          through the pipes. Each ring buffer is ``ring_size`` bytes.
+        * ``subscription``, to have the :class:`EngineProxy` only
+          keep track of some characters; see
+          :meth:`EngineProxy.subscribe`
+        * ``delta_format``, which, if ``'compact'``, has the deltas from
+          ``next_turn`` and ``time_travel`` sent in the compact form of
+          :class:`LiSE.wire.DeltaCodec`
+        * ``asynchronous``, which, if ``True``, gets you an
+          :class:`AsyncEngineProxy` instead. Call me from inside
+          a running event loop, then.
+
+        """
         if hasattr(self, 'engine_proxy'):
             raise RedundantProcessError("Already started")
         (handle_out_pipe_recv, self._handle_out_pipe_send) = Pipe(duplex=False)
@@ -2738,6 +3293,15 @@ class EngineProcessManager(object):
             except OSError:
                 pass
             del kwargs['logfile']
+        transport = kwargs.pop('transport', 'pipe')
+        if transport not in ('pipe', 'shared_memory'):
+            raise ValueError("Unknown transport: {}".format(transport))
+        ring_size = kwargs.pop('ring_size', RING_SIZE)
+        subscription = kwargs.pop('subscription', None)
+        delta_format = kwargs.pop('delta_format', 'plain')
+        asynchronous = kwargs.pop('asynchronous', False)
+        if asynchronous and transport != 'pipe':
+            raise ValueError("Asynchronous proxies need the pipe transport")
         do_game_start = kwargs.pop('do_game_start') \
                         if 'do_game_start' in kwargs else False
         install_modules = kwargs.pop('install_modules') \
@@ -2749,6 +3313,22 @@ class EngineProcessManager(object):
         for handler in handlers:
             handler.setFormatter(formatter)
             self.logger.addHandler(handler)
+        self._rings = []
+        if transport == 'shared_memory':
+            from multiprocessing.shared_memory import SharedMemory
+            for _ in range(2):
+                ring = SharedMemory(
+                    create=True, size=ring_size + RingConnection.header)
+                ring.buf[:RingConnection.header] \
+                    = bytes(RingConnection.header)
+                self._rings.append(ring)
+            out_ring, in_ring = self._rings
+            handle_out_pipe_recv = RingConnection(
+                handle_out_pipe_recv, out_ring)
+            self._handle_out_pipe_send = RingConnection(
+                self._handle_out_pipe_send, out_ring)
+            handle_in_pipe_recv = RingConnection(handle_in_pipe_recv, in_ring)
+            handle_in_pipe_send = RingConnection(handle_in_pipe_send, in_ring)
         self._p = Process(
             name='LiSE Life Simulator Engine (core)',
             target=subprocess,
@@ -2769,12 +3349,28 @@ class EngineProcessManager(object):
             daemon=True
         )
         self._logthread.start()
+        if asynchronous:
+            self.engine_proxy = AsyncEngineProxy(
+                self._handle_out_pipe_send,
+                handle_in_pipe_recv,
+                self.logger,
+                delta_format=delta_format,
+                subscription=subscription
+            )
+            for module in install_modules:
+                self.engine_proxy.submit(
+                    'install_module', module=module, silent=True)
+            if do_game_start:
+                self.engine_proxy.submit('do_game_start', silent=True)
+            return self.engine_proxy
         self.engine_proxy = EngineProxy(
             self._handle_out_pipe_send,
             handle_in_pipe_recv,
             self.logger,
             do_game_start,
-            install_modules
+            install_modules,
+            subscription=subscription,
+            delta_format=delta_format
         )
         return self.engine_proxy
 
@@ -2804,3 +3400,12 @@ class EngineProcessManager(object):
         self.engine_proxy.close()
         self._p.join()
         del self.engine_proxy
+        for ring in self._rings:
+            ring.close()
+            if os.name == 'posix':
+                # the subprocess may have unregistered it from a
+                # resource tracker we share
+                from multiprocessing import resource_tracker
+                resource_tracker.register(ring._name, 'shared_memory')
+            ring.unlink()
+        self._rings = []
@@ -22,8 +22,9 @@ result you'll get a callable object that will return an iterator over
 turn numbers in which the comparison evaluated to ``True``.
 
 """
-from operator import gt, lt, eq, ne, le, ge
-from functools import partialmethod
+from operator import gt, lt, eq, ne, le, ge, itemgetter
+from functools import partial, partialmethod
+from heapq import merge
 from time import monotonic
 
 from .allegedb import query
@@ -96,9 +97,9 @@ def windows_intersection(windows):
     def intersect2(left, right):
         if left == right:
             return left
-        elif left is (None, None):
+        elif left == (None, None):
             return right
-        elif right is (None, None):
+        elif right == (None, None):
             return left
         elif left[0] is None:
             if right[0] is None:
@@ -148,7 +149,7 @@ def windows_intersection(windows):
             otherwise.append(window)
 
     done = []
-    todo = left_none + sorted(otherwise)
+    todo = left_none + sorted(otherwise) + right_none
     for window in todo:
         if not done:
             done.append(window)
@@ -204,7 +205,8 @@ class Query(object):
             )
         else:
             new_windows = [(0, end)]
-        return type(self)(self.leftside, self.rightside, windows=new_windows)
+        return type(self)(
+            self.engine, self.leftside, self.rightside, windows=new_windows)
     before = and_before
 
     def or_before(self, end):
@@ -212,14 +214,16 @@ class Query(object):
             new_windows = windows_union(self.windows + [(None, end)])
         else:
             new_windows = [(None, end)]
-        return type(self)(self.leftside, self.rightside, windows=new_windows)
+        return type(self)(
+            self.engine, self.leftside, self.rightside, windows=new_windows)
 
     def and_after(self, start):
         if self.windows:
             new_windows = windows_intersection(self.windows + [(start, None)])
         else:
             new_windows = [(start, None)]
-        return type(self)(self.leftside, self.rightside, windows=new_windows)
+        return type(self)(
+            self.engine, self.leftside, self.rightside, windows=new_windows)
     after = and_after
 
     def or_between(self, start, end):
@@ -227,14 +231,16 @@ class Query(object):
             new_windows = windows_union(self.windows + [(start, end)])
         else:
             new_windows = [(start, end)]
-        return type(self)(self.leftside, self.rightside, windows=new_windows)
+        return type(self)(
+            self.engine, self.leftside, self.rightside, windows=new_windows)
 
     def and_between(self, start, end):
         if self.windows:
             new_windows = windows_intersection(self.windows + [(start, end)])
         else:
             new_windows = [(start, end)]
-        return type(self)(self.leftside, self.rightside, windows=new_windows)
+        return type(self)(
+            self.engine, self.leftside, self.rightside, windows=new_windows)
     between = and_between
 
     def or_during(self, tick):
@@ -253,7 +259,47 @@ class ComparisonQuery(Query):
     oper = lambda x, y: NotImplemented
 
     def iter_turns(self):
-        return slow_iter_turns_eval_cmp(self, self.oper, engine=self.engine)
+        windows = self.windows_when()
+        if windows is None:
+            return slow_iter_turns_eval_cmp(
+                self, self.oper, engine=self.engine)
+        branch = self.engine.branch
+        return (
+            (branch, turn) for (start, end) in windows
+            for turn in range(start, end + 1)
+        )
+
+    def windows_when(self):
+        """Return a list of ``(start, end)`` turns, inclusive, when I held
+
+        Only works if both my sides are stats from ``historical`` or
+        constants. Otherwise, return ``None``.
+
+        This looks at the stats' change points and keyframes, as seen
+        from the current branch up to the current turn, without time
+        travel. They come from the caches, or from the database if the
+        caches haven't loaded all the history involved. Reading the
+        caches only copies them, so when they have all the history,
+        another thread may call this while the simulation runs. The
+        database connection is the simulation thread's own.
+
+        """
+        engine = self.engine
+        branch, turn_end = engine.branch, engine.turn
+        left = _turn_changes(self.leftside, branch, turn_end)
+        if left is None:
+            return None
+        right = _turn_changes(self.rightside, branch, turn_end)
+        if right is None:
+            return None
+        windows = _windows_where(self.oper, left, right, turn_end)
+        if self.windows:
+            windows = [
+                clipped for window in windows
+                for restriction in self.windows
+                for clipped in windows_intersection([window, restriction])
+            ]
+        return windows_union(windows) if windows else windows
 
 
 class EqQuery(ComparisonQuery):
@@ -309,6 +355,260 @@ class StatusAlias(EntityStatAccessor):
     def __le__(self, other):
         return LeQuery(self.engine, self, other)
 
+    def iter_history(self, beginning, end):
+        """Iterate over all the values this stat has had in the given window, inclusive.
+
+        Reads the stat's change points and keyframes where possible,
+        rather than traveling through time.
+
+        """
+        changes = _turn_changes(self, self.engine.branch, end)
+        if changes is None:
+            yield from super().iter_history(beginning, end)
+            return
+        value = None
+        i = 0
+        for turn in range(beginning, end + 1):
+            while i < len(changes) and changes[i][0] <= turn:
+                value = changes[i][1]
+                i += 1
+            yield None if value is _absent else value
+
+
+_absent = object()
+"""Stand-in for the value of a stat that isn't set"""
+
+
+def _stat_key(side):
+    """Return the name of the table holding the stat ``side`` points to,
+    and the stat's key in that table
+
+    If ``side`` isn't a plain stat of a thing, place, portal, or
+    character, return ``None``.
+
+    """
+    from .allegedb.graph import GraphMapping
+    entity = side.entity
+    stat = side.stat
+    engine = side.engine
+    if isinstance(entity, engine.thing_cls) and stat == 'location':
+        return 'things', (entity.character.name, entity.name)
+    if isinstance(entity, (engine.thing_cls, engine.place_cls)):
+        if stat in entity.extrakeys:
+            return None
+        return 'node_val', (entity.character.name, entity.name, stat)
+    if isinstance(entity, engine.portal_cls):
+        if stat in ('origin', 'destination', 'character', 'is_mirror') \
+                or entity.get('is_mirror'):
+            return None
+        return 'edge_val', (
+            entity.character.name, entity.orig, entity.dest, 0, stat)
+    if isinstance(entity, GraphMapping) and stat != 'name':
+        return 'graph_val', (entity.graph.name, stat)
+    return None
+
+
+_history_queries = {
+    'things': 'thing_loc_history',
+    'node_val': 'node_val_history',
+    'edge_val': 'edge_val_history',
+    'graph_val': 'graph_val_history'
+}
+
+
+def _cache_history(cache, key, branch, turn_from, turn_to):
+    """Yield ``(turn, tick, value)`` for each change to ``key`` in ``cache``
+
+    Like the ``*_history`` methods of the query engine, but reading the
+    cache's change points, without seeking in them.
+
+    """
+    branches = cache.branches.get(key)
+    if not branches or branch not in branches:
+        return
+    for turn, ticks in branches[branch].snapshot():
+        if turn < turn_from:
+            continue
+        if turn >= turn_to:
+            return
+        for tick, value in ticks.snapshot():
+            yield turn, tick, value
+
+
+def _keyframe_history(
+        engine, table, key, from_db, branch, turn_from, turn_to
+):
+    """Return ``(turn, tick, value)`` for each keyframe of ``key``
+
+    Keyframes hold stats that have no change recorded for them, such as
+    those of a character made from a graph. They come from the cache,
+    and, if ``from_db``, the database too.
+
+    """
+    if table == 'things':
+        entity, stat = key, 'location'
+        cache = engine._node_val_cache
+    else:
+        entity, stat = key[:-1], key[-1]
+        cache = getattr(engine, '_{}_cache'.format(table))
+    kfs = {}
+    branches = cache.keyframe.get(entity)
+    if branches and branch in branches:
+        for turn, ticks in branches[branch].snapshot():
+            if turn < turn_from:
+                continue
+            if turn >= turn_to:
+                break
+            for tick, vals in ticks.snapshot():
+                kfs[turn, tick] = vals.get(stat)
+    if from_db:
+        graph = key[0]
+        for kfgraph, _, turn, tick, nodes, edges, graph_val in \
+                engine.query.keyframes_dump((branch, turn_from, turn_to)):
+            if kfgraph != graph or (turn, tick) in kfs:
+                continue
+            if table == 'graph_val':
+                kfs[turn, tick] = graph_val.get(stat)
+            elif table == 'edge_val':
+                _, orig, dest, _, _ = key
+                if orig in edges and dest in edges[orig]:
+                    kfs[turn, tick] = edges[orig][dest].get(stat)
+            elif entity[1] in nodes:
+                kfs[turn, tick] = nodes[entity[1]].get(stat)
+    return [(turn, tick, value) for ((turn, tick), value) in sorted(kfs.items())]
+
+
+def _with_keyframes(changes, keyframes, branch, turn_from, turn_to):
+    """Merge the ``changes`` to a stat with its values in ``keyframes``
+
+    A keyframe goes after any change in the same tick, since it was
+    snapped after.
+
+    """
+    return merge(
+        changes(branch, turn_from, turn_to),
+        keyframes(branch, turn_from, turn_to),
+        key=itemgetter(0, 1)
+    )
+
+
+def _history_source(side, segments):
+    """Return a function to get the history of the stat ``side`` points to
+
+    It takes a branch, and the turns to start at and stop before, and
+    returns ``(turn, tick, value)`` triples, including the stat's value
+    in each keyframe. They come from the cache, if it has all the history
+    of the branches in ``segments``; otherwise, from the database.
+
+    If ``side`` isn't a plain stat of a thing, place, portal, or
+    character, return ``None``.
+
+    """
+    table_key = _stat_key(side)
+    if table_key is None:
+        return None
+    table, key = table_key
+    engine = side.engine
+    loaded = engine._loaded
+    cached = loaded is None or all(
+        loaded.get(branch, turn_start + 1) <= turn_start
+        for (branch, turn_start, _) in segments
+    )
+    if cached:
+        changes = partial(
+            _cache_history, getattr(engine, '_{}_cache'.format(table)), key)
+    else:
+        changes = partial(
+            getattr(engine.query, _history_queries[table]), *key)
+    return partial(
+        _with_keyframes, changes,
+        partial(_keyframe_history, engine, table, key, not cached)
+    )
+
+
+def _turn_changes(side, branch, turn_end):
+    """Return a list of ``(turn, value)`` for a side of a comparison
+
+    Each turn up to ``turn_end`` when the value of the side, at the end
+    of the turn, differs from the turn before gets a pair, as seen from
+    ``branch``. Turns when the stat wasn't set have the value ``_absent``.
+
+    Return ``None`` if the side can't be evaluated this way.
+
+    """
+    from .engine import DummyEntity
+    if isinstance(side, Query):
+        return None
+    if not isinstance(side, EntityStatAccessor):
+        return [(0, side)]
+    if isinstance(side.entity, DummyEntity):
+        value = side.entity[side.stat]
+        for munger in side.mungers:
+            value = munger(value)
+        return [(0, value)]
+    if not isinstance(side, StatusAlias):
+        return None
+    engine = side.engine
+    segments = []
+    stop = None
+    while branch in engine._branches:
+        parent, turn_start, tick_start, _, _ = engine._branches[branch]
+        segments.append((branch, turn_start, stop))
+        stop = (turn_start, tick_start)
+        branch = parent
+    history = _history_source(side, segments)
+    if history is None:
+        return None
+    ends = {}
+    for branch, turn_start, stop in reversed(segments):
+        turn_stop = turn_end if stop is None else min((stop[0], turn_end))
+        for turn, tick, value in history(branch, turn_start, turn_stop + 1):
+            if stop is not None and (turn, tick) > stop:
+                break
+            ends[turn] = value
+    changes = []
+    for turn, value in ends.items():
+        if value is None:
+            value = _absent
+        else:
+            for munger in side.mungers:
+                value = munger(value)
+        if not changes or changes[-1][1] != value:
+            changes.append((turn, value))
+    return changes
+
+
+def _windows_where(oper, left, right, turn_end):
+    """Return inclusive ``(start, end)`` turns when ``oper`` held
+
+    ``left`` and ``right`` are lists of ``(turn, value)`` change points,
+    as returned by ``_turn_changes``.
+
+    """
+    windows = []
+    start = None
+    lval = rval = _absent
+    li = ri = 0
+    for turn in sorted({turn for turn, _ in left} | {turn for turn, _ in right}):
+        if turn > turn_end:
+            break
+        while li < len(left) and left[li][0] <= turn:
+            lval = left[li][1]
+            li += 1
+        while ri < len(right) and right[ri][0] <= turn:
+            rval = right[ri][1]
+            ri += 1
+        held = lval is not _absent and rval is not _absent \
+            and oper(lval, rval)
+        if held and start is None:
+            start = turn
+        elif not held and start is not None:
+            windows.append((start, turn - 1))
+            start = None
+    if start is not None:
+        windows.append((start, turn_end))
+    return windows
+
 
 def slow_iter_turns_eval_cmp(qry, oper, start_branch=None, engine=None):
     """Iterate over all turns on which a comparison holds.
@@ -327,7 +627,7 @@ def slow_iter_turns_eval_cmp(qry, oper, start_branch=None, engine=None):
         elif isinstance(side, EntityStatAccessor):
             return side
         else:
-            return lambda: side
+            return lambda *args: side
     leftside = mungeside(qry.leftside)
     rightside = mungeside(qry.rightside)
     engine = engine or leftside.engine or rightside.engine
@@ -402,9 +702,9 @@ class QueryEngine(query.QueryEngine):
     character_place_rulebook_dump = partialmethod(_charactery_rulebook_dump, 'character_place')
     character_portal_rulebook_dump = partialmethod(_charactery_rulebook_dump, 'character_portal')
 
-    def character_rules_handled_dump(self):
+    def character_rules_handled_dump(self, window=None):
         unpack = self.unpack
-        for character, rulebook, rule, branch, turn, tick in self.sql('character_rules_handled_dump'):
+        for character, rulebook, rule, branch, turn, tick in self._dump('character_rules_handled', window):
             yield unpack(character), unpack(rulebook), rule, branch, turn, tick
 
     def character_rules_changes_dump(self):
@@ -417,9 +717,9 @@ class QueryEngine(query.QueryEngine):
                 rule, branch, turn, tick, handled_branch, handled_turn
             )
 
-    def avatar_rules_handled_dump(self):
+    def avatar_rules_handled_dump(self, window=None):
         unpack = self.unpack
-        for character, rulebook, rule, graph, avatar, branch, turn, tick in self.sql('avatar_rules_handled_dump'):
+        for character, rulebook, rule, graph, avatar, branch, turn, tick in self._dump('avatar_rules_handled', window):
             yield (
                 unpack(character), unpack(rulebook), rule,
                 unpack(graph), unpack(avatar), branch, turn, tick
@@ -435,9 +735,9 @@ class QueryEngine(query.QueryEngine):
                 branch, turn, tick, handled_branch, handled_turn
             )
 
-    def character_thing_rules_handled_dump(self):
+    def character_thing_rules_handled_dump(self, window=None):
         unpack = self.unpack
-        for character, rulebook, rule, thing, branch, turn, tick in self.sql('character_thing_rules_handled_dump'):
+        for character, rulebook, rule, thing, branch, turn, tick in self._dump('character_thing_rules_handled', window):
             yield unpack(character), unpack(rulebook), rule, unpack(thing), branch, turn, tick
 
     def character_thing_rules_changes_dump(self):
@@ -450,9 +750,9 @@ class QueryEngine(query.QueryEngine):
                 branch, turn, tick, handled_branch, handled_turn
             )
 
-    def character_place_rules_handled_dump(self):
+    def character_place_rules_handled_dump(self, window=None):
         unpack = self.unpack
-        for character, rulebook, rule, place, branch, turn, tick in self.sql('character_place_rules_handled_dump'):
+        for character, rulebook, rule, place, branch, turn, tick in self._dump('character_place_rules_handled', window):
             yield unpack(character), unpack(rulebook), rule, unpack(place), branch, turn, tick
 
     def character_place_rules_changes_dump(self):
@@ -465,9 +765,9 @@ class QueryEngine(query.QueryEngine):
                 branch, turn, tick, handled_branch, handled_turn
             )
 
-    def character_portal_rules_handled_dump(self):
+    def character_portal_rules_handled_dump(self, window=None):
         unpack = self.unpack
-        for character, rulebook, rule, orig, dest, branch, turn, tick in self.sql('character_portal_rules_handled_dump'):
+        for character, rulebook, rule, orig, dest, branch, turn, tick in self._dump('character_portal_rules_handled', window):
             yield (
                 unpack(character), unpack(rulebook), rule, unpack(orig), unpack(dest),
                 branch, turn, tick
@@ -483,8 +783,8 @@ class QueryEngine(query.QueryEngine):
                 branch, turn, tick, handled_branch, handled_turn
             )
 
-    def node_rules_handled_dump(self):
-        for character, node, rulebook, rule, branch, turn, tick in self.sql('node_rules_handled_dump'):
+    def node_rules_handled_dump(self, window=None):
+        for character, node, rulebook, rule, branch, turn, tick in self._dump('node_rules_handled', window):
             yield self.unpack(character), self.unpack(node), self.unpack(rulebook), rule, branch, turn, tick
 
     def node_rules_changes_dump(self):
@@ -497,9 +797,9 @@ class QueryEngine(query.QueryEngine):
                 branch, turn, tick, handled_branch, handled_turn
             )
 
-    def portal_rules_handled_dump(self):
+    def portal_rules_handled_dump(self, window=None):
         unpack = self.unpack
-        for character, orig, dest, rulebook, rule, branch, turn, tick in self.sql('portal_rules_handled_dump'):
+        for character, orig, dest, rulebook, rule, branch, turn, tick in self._dump('portal_rules_handled', window):
             yield (
                 unpack(character), unpack(orig), unpack(dest),
                 unpack(rulebook), rule, branch, turn, tick
@@ -528,6 +828,14 @@ class QueryEngine(query.QueryEngine):
                 unpack(location)
             )
 
+    def thing_loc_history(self, character, thing, branch, turn_from, turn_to):
+        """Yield ``(turn, tick, location)`` for each time a thing moved"""
+        pack = self.pack
+        return self._history(
+            'things', (pack(character), pack(thing)),
+            branch, turn_from, turn_to
+        )
+
     def avatars_dump(self):
         unpack = self.unpack
         for character_graph, avatar_graph, avatar_node, branch, turn, tick, is_av in self.sql('avatars_dump'):
@@ -772,6 +1080,31 @@ class QueryEngine(query.QueryEngine):
             loc
         )
 
+    def set_thing_locs(self, rows):
+        """Set the locations of many things at once
+
+        ``rows`` are tuples of ``(character, thing, branch, turn, tick,
+        loc)``. Whatever each thing was doing after its earliest row is
+        deleted first.
+
+        """
+        pack = self.pack
+        packed = [
+            (pack(character), pack(thing), branch, turn, tick, pack(loc))
+            for (character, thing, branch, turn, tick, loc) in rows
+        ]
+        earliest = {}
+        for row in packed:
+            key = row[:3]
+            if key not in earliest or row[3:5] < earliest[key][3:5]:
+                earliest[key] = row
+        self.sqlmany('del_things_after', *(
+            (character, thing, branch, turn, turn, tick)
+            for (character, thing, branch, turn, tick, _)
+            in earliest.values()
+        ))
+        self.sqlmany('things_insert', *packed)
+
     def avatar_set(self, character, graph, node, branch, turn, tick, isav):
         (character, graph, node) = map(
             self.pack, (character, graph, node)
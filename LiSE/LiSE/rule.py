@@ -332,9 +332,29 @@ class Rule(object):
     def __repr__(self):
         return 'Rule({})'.format(self.name)
 
-    def trigger(self, fun):
-        """Decorator to append the function to my triggers list."""
+    def trigger(self, fun=None, *, read_only=False, watch=None):
+        """Decorator to append the function to my triggers list.
+
+        Use it as ``@rule.trigger(read_only=True)`` to promise that the
+        trigger only looks at the world, never changing it. Then the
+        engine may check it in parallel with other rules' triggers.
+        Read-only triggers that use the engine's random number generator
+        get checked serially anyway, so that they draw the same numbers.
+
+        ``@rule.trigger(watch=['hunger'])`` promises that the trigger's
+        result only depends on the given stats of the entity it's
+        called on, so the engine can skip checking it again until
+        they change. Nodes may also watch ``'contents'`` and
+        ``'portals'``; see ``Engine.declare_trigger_watch``.
+
+        """
+        if fun is None:
+            return partial(self.trigger, read_only=read_only, watch=watch)
         self.triggers.append(fun)
+        if read_only:
+            self.engine.declare_read_only_trigger(fun.__name__)
+        if watch is not None:
+            self.engine.declare_trigger_watch(fun.__name__, watch)
         return fun
 
     def prereq(self, fun):
@@ -13,22 +13,44 @@
 #
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
-import cherrypy
+import asyncio
+import os
 from argparse import ArgumentParser
-from . import LiSEHandleWebService
 
 parser = ArgumentParser()
-parser.add_argument('world', action='store', required=True)
+parser.add_argument('world', action='store', nargs='+')
 parser.add_argument('-c', '--code', action='store')
+parser.add_argument(
+    '-s', '--stream', action='store_true',
+    help="serve every world over WebSockets, streaming deltas")
+parser.add_argument('--host', action='store', default='127.0.0.1')
+parser.add_argument('--port', action='store', type=int, default=8765)
+parser.add_argument(
+    '--turn-interval', action='store', type=float,
+    help="seconds between turns, when streaming")
 args = parser.parse_args()
-conf = {
-    '/': {
-        'request.dispatch': cherrypy.dispatch.MethodDispatcher(),
-        'tools.sessions.on': True,
-        'tools.response_headers.on': True,
-        'tools.response_headers.headers': [('Content-Type', 'application/json')],
-        'tools.encode.on': True,
-        'tools.encode.encoding': 'utf-8'
+if args.stream:
+    from .stream import LiSEStreamServer
+    server = LiSEStreamServer(
+        args.host, args.port, turn_interval=args.turn_interval)
+    for world in args.world:
+        server.add_engine(os.path.basename(os.path.abspath(world)), world)
+    asyncio.run(server.serve_forever())
+else:
+    import cherrypy
+    from .web import LiSEHandleWebService
+    if len(args.world) > 1:
+        parser.error("Only one world at a time, unless streaming")
+    conf = {
+        '/': {
+            'request.dispatch': cherrypy.dispatch.MethodDispatcher(),
+            'tools.sessions.on': True,
+            'tools.response_headers.on': True,
+            'tools.response_headers.headers': [
+                ('Content-Type', 'application/json')],
+            'tools.encode.on': True,
+            'tools.encode.encoding': 'utf-8'
+        }
     }
-}
-cherrypy.quickstart(LiSEHandleWebService(args.world, args.code), '/', conf)
+    cherrypy.quickstart(
+        LiSEHandleWebService(args.world[0], args.code), '/', conf)
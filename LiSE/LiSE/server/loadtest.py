@@ -0,0 +1,151 @@
+# This file is part of LiSE, a framework for life simulation games.
+# Copyright (c) Zachary Spector, public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Simulate many clients of a :class:`LiSEStreamServer`
+
+By default, this starts a server of its own, in this process, with
+some copies of the kobold example, advancing on their own every
+second. Each client sends batches of commands that read the kobold's
+stats, as fast as the server answers, and counts the deltas it's
+sent. Afterward, it prints how many commands got run, and how long
+the batches took.
+
+To keep the clients from competing with the server for the same
+process, start the server separately, with
+``python -m LiSE.server --stream --turn-interval 1 <world>``, and
+give its address here with ``--uri``.
+
+"""
+import asyncio
+import shutil
+import tempfile
+from argparse import ArgumentParser
+from functools import partial
+from time import monotonic
+
+from .stream import LiSEStreamServer, connect
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(
+        len(sorted_values) - 1, int(len(sorted_values) * p / 100))]
+
+
+async def simulate_client(uri, seconds, batch, stats):
+    """Send batches of commands to ``uri`` for ``seconds``
+
+    Append the duration of each batch to ``stats['latencies']``, and
+    add how many commands were run and deltas received.
+
+    """
+    client = await connect(uri)
+    deltas = []
+    client.delta.connect(
+        lambda sender, **kwargs: deltas.append(kwargs['turn']), weak=False)
+    commands = [
+        {'command': 'node_stat_copy',
+         'node_or_char': 'physical', 'node': 'kobold'},
+        {'command': 'character_stat_copy', 'char': 'physical'}
+    ] * (batch // 2) + [{'command': 'get_watched_btt'}] * (batch % 2)
+    latencies = stats['latencies']
+    end = monotonic() + seconds
+    try:
+        while monotonic() < end:
+            start = monotonic()
+            results = await client.batch(commands)
+            latencies.append(monotonic() - start)
+            for result in results:
+                if isinstance(result, Exception):
+                    stats['errors'] += 1
+            stats['commands'] += len(commands)
+    finally:
+        await client.close()
+    stats['deltas'].append(len(deltas))
+
+
+async def run_load_test(
+        clients=100, engines=2, seconds=10., batch=10,
+        turn_interval=1., uri=None
+):
+    """Run the load test and return its statistics
+
+    Without a ``uri``, start a server with ``engines`` copies of the
+    kobold example, and spread the clients evenly among them.
+
+    """
+    stats = {'commands': 0, 'errors': 0, 'latencies': [], 'deltas': []}
+    if uri:
+        uris = [uri]
+        server = None
+    else:
+        from ..examples import kobold
+        prefixes = [tempfile.mkdtemp() for _ in range(engines)]
+        server = LiSEStreamServer(port=0, turn_interval=turn_interval)
+        for i, prefix in enumerate(prefixes):
+            server.add_engine(
+                'kobold{}'.format(i), prefix,
+                connect_string='sqlite:///:memory:', random_seed=69105,
+                setup=partial(
+                    kobold.inittest, shrubberies=20,
+                    kobold_sprint_chance=.9))
+        await server.start()
+        uris = ['ws://127.0.0.1:{}/kobold{}'.format(server.port, i)
+                for i in range(engines)]
+    try:
+        start = monotonic()
+        await asyncio.gather(*(
+            simulate_client(uris[i % len(uris)], seconds, batch, stats)
+            for i in range(clients)))
+        stats['seconds'] = monotonic() - start
+    finally:
+        if server is not None:
+            await server.close()
+            for prefix in prefixes:
+                shutil.rmtree(prefix, ignore_errors=True)
+    return stats
+
+
+def report(stats):
+    latencies = sorted(stats['latencies'])
+    deltas = stats['deltas']
+    print("{:,} commands in {:,.1f}s: {:,.0f} per second, {} errors".format(
+        stats['commands'], stats['seconds'],
+        stats['commands'] / stats['seconds'], stats['errors']))
+    print("batch latency ms: p50 {:.1f}, p95 {:.1f}, p99 {:.1f}, "
+          "max {:.1f}".format(*(1000 * percentile(latencies, p)
+                                for p in (50, 95, 99, 100))))
+    print("deltas per client: min {}, max {}".format(
+        min(deltas, default=0), max(deltas, default=0)))
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('-n', '--clients', type=int, default=100)
+    parser.add_argument('-e', '--engines', type=int, default=2)
+    parser.add_argument('-t', '--seconds', type=float, default=10.)
+    parser.add_argument(
+        '-b', '--batch', type=int, default=10,
+        help="commands in each message")
+    parser.add_argument(
+        '--turn-interval', type=float, default=1.,
+        help="seconds between turns in the server I start")
+    parser.add_argument(
+        '--uri', help="connect to this server, instead of starting one")
+    args = parser.parse_args()
+    report(asyncio.run(run_load_test(
+        args.clients, args.engines, args.seconds, args.batch,
+        args.turn_interval, args.uri)))
@@ -0,0 +1,428 @@
+# This file is part of LiSE, a framework for life simulation games.
+# Copyright (c) Zachary Spector, public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Serve LiSE cores over WebSockets, streaming deltas as they happen
+
+Each client keeps one connection open, to the path named for the
+engine it wants, like ``ws://127.0.0.1:8765/kobold``. It sends
+commands for :class:`LiSE.handle.EngineHandle`, packed the same way
+:class:`LiSE.proxy.EngineProxy` packs them, and may send many at once
+as a batch. Whenever one of the engine's clients moves it through
+time, with ``next_turn`` or ``time_travel``, the server sends the
+resulting delta to all the rest, and you can have the server call
+``next_turn`` itself every so often.
+
+Every message from the server is a msgpack array of ``[correlation,
+command, branch, turn, tick, payload]``, where ``payload`` is the
+result, still packed by the engine, so that a delta going to every
+client only needs packing once. Streamed deltas have no correlation.
+
+"""
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http import HTTPStatus
+from itertools import count
+
+import msgpack
+from blinker import Signal
+from websockets.asyncio.client import connect as ws_connect
+from websockets.asyncio.server import broadcast, serve
+from websockets.exceptions import ConnectionClosed
+
+from ..handle import EngineHandle
+from ..proxy import AsyncEngineProxy, _run_instruction
+
+_TIME_TRAVEL = frozenset({'next_turn', 'time_travel'})
+"""Commands whose deltas go to every client"""
+_UNSHARED = frozenset({'close', 'set_delta_format', 'set_subscription'})
+"""Commands that would change the engine out from under other clients"""
+
+
+class _LogQueue(object):
+    """Stands in for the log queue of an :class:`EngineHandle`"""
+    __slots__ = ('logger',)
+
+    def __init__(self, logger):
+        self.logger = logger
+
+    def put(self, item):
+        self.logger.log(*item)
+
+
+class _EngineService(object):
+    """One engine, run in a thread of its own, and the clients using it"""
+    def __init__(self, name, args, kwargs, setup, logger):
+        self.name = name
+        self.logger = logger
+        self.clients = set()
+        self._executor = ThreadPoolExecutor(
+            1, thread_name_prefix='LiSE-{}'.format(name))
+        self._args = args
+        self._kwargs = kwargs
+        self._setup = setup
+        self._handle = None
+
+    def _start(self):
+        self._handle = EngineHandle(
+            self._args, self._kwargs, _LogQueue(self.logger),
+            loglevel=self.logger.getEffectiveLevel())
+        if self._setup:
+            with self._handle._real.advancing():
+                self._setup(self._handle._real)
+
+    async def start(self):
+        await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._start)
+
+    async def close(self):
+        if self._handle is not None:
+            await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._handle.close)
+            self._handle = None
+        self._executor.shutdown()
+
+    def _call(self, instruction):
+        handle = self._handle
+        cmd = instruction.get('command')
+        try:
+            if cmd in _UNSHARED:
+                raise ValueError(
+                    "Can't {} an engine that clients share".format(cmd))
+            return _run_instruction(handle, instruction)
+        finally:
+            if hasattr(handle, '_after_ret'):
+                handle._after_ret()
+                del handle._after_ret
+
+    def _run(self, message):
+        """Run the packed command ``message``, which may be a batch
+
+        Return the reply frame, or ``None`` if the command was silent,
+        and a list of frames of deltas to send to the other clients, for
+        each time the engine moved through time.
+
+        A batch's result is a list with a slot for each command,
+        holding ``None`` for silent ones, and exceptions for those that
+        raised.
+
+        """
+        handle = self._handle
+        instruction = handle.unpack(message)
+        if not isinstance(instruction, dict):
+            raise TypeError("Commands must be dicts, not {}".format(
+                type(instruction)))
+        correlation = instruction.pop('correlation', None)
+        deltas = []
+        if 'batch' in instruction:
+            results = []
+            for instruct in instruction['batch']:
+                silent = instruct.pop('silent', False)
+                cmd = instruct.get('command')
+                try:
+                    r = self._call(instruct)
+                except Exception as ex:
+                    self.logger.debug(
+                        "LiSE engine {}: {} from {} in a batch".format(
+                            self.name, repr(ex), cmd))
+                    r = ex
+                else:
+                    if cmd in _TIME_TRAVEL:
+                        deltas.append(
+                            self._frame(None, cmd, handle.pack(r[1])))
+                results.append(None if silent else r)
+            return self._frame(
+                correlation, 'batch', self._pack_result(results)), deltas
+        silent = instruction.pop('silent', False)
+        cmd = instruction.get('command')
+        try:
+            r = self._call(instruction)
+        except Exception as ex:
+            self.logger.debug("LiSE engine {}: {} from {}".format(
+                self.name, repr(ex), cmd))
+            return self._frame(correlation, cmd, handle.pack(ex)), deltas
+        if cmd in _TIME_TRAVEL:
+            deltas.append(self._frame(None, cmd, handle.pack(r[1])))
+        if silent:
+            return None, deltas
+        return self._frame(correlation, cmd, self._pack_result(r)), deltas
+
+    def _pack_result(self, r):
+        try:
+            return self._handle.pack(r)
+        except TypeError as ex:
+            # the client should hear about it, rather than get hung up on
+            return self._handle.pack(ex)
+
+    def _frame(self, correlation, cmd, payload):
+        handle = self._handle
+        return msgpack.packb(
+            [correlation, cmd,
+             handle.branch, handle.turn, handle.tick, payload],
+            use_bin_type=True)
+
+    async def run(self, message, client=None):
+        """Run the packed command ``message`` and return the reply, if any
+
+        If the command moved the engine through time, send the delta to
+        every client but ``client``.
+
+        """
+        reply, deltas = await asyncio.get_running_loop().run_in_executor(
+            self._executor, self._run, message)
+        if deltas:
+            others = [other for other in self.clients if other is not client]
+            for delta in deltas:
+                broadcast(others, delta)
+        return reply
+
+    async def next_turn(self):
+        """Run ``next_turn`` and send the delta to every client"""
+        await self.run(msgpack.packb({'command': 'next_turn'}))
+
+
+class LiSEStreamServer(object):
+    """Serve any number of LiSE cores over WebSockets, from one process
+
+    Add engines with :meth:`add_engine`, then use me as an
+    asynchronous context manager, or ``await`` :meth:`start` and
+    :meth:`close`. Clients connect to ``/`` followed by the name of
+    the engine.
+
+    Each engine runs in its own thread, and runs commands in the order
+    they arrive. Each client's commands get run one at a time, so to
+    keep the engine busy, send them in batches.
+
+    With ``turn_interval``, every engine runs ``next_turn`` by itself
+    once every ``turn_interval`` seconds.
+
+    I listen on localhost unless you tell me otherwise, and since
+    anyone who can reach me can run code in the engines, you
+    probably shouldn't.
+
+    """
+    def __init__(
+            self, host='127.0.0.1', port=8765, *,
+            turn_interval=None, logger=None
+    ):
+        self.host = host
+        self.port = port
+        self.turn_interval = turn_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._engines = {}
+        self._server = None
+        self._tickers = []
+
+    def add_engine(self, name, *args, setup=None, **kwargs):
+        """Serve an engine called ``name``, made with these arguments
+
+        Arguments are passed to :class:`LiSE.Engine`, except ``setup``,
+        a function to call on the new engine before anyone connects,
+        such as ``LiSE.examples.kobold.inittest``.
+
+        """
+        if self._server is not None:
+            raise RuntimeError("Add engines before starting the server")
+        if name in self._engines:
+            raise KeyError("Already serving an engine named {}".format(name))
+        self._engines[name] = _EngineService(
+            name, args, kwargs, setup, self.logger)
+
+    def _process_request(self, connection, request):
+        if request.path.strip('/') not in self._engines:
+            return connection.respond(
+                HTTPStatus.NOT_FOUND, "No such engine\n")
+
+    async def _serve_client(self, connection):
+        engine = self._engines[connection.request.path.strip('/')]
+        engine.clients.add(connection)
+        try:
+            async for message in connection:
+                reply = await engine.run(message, connection)
+                if reply is not None:
+                    await connection.send(reply)
+        except ConnectionClosed:
+            pass
+        finally:
+            engine.clients.discard(connection)
+
+    async def _tick(self, engine):
+        while True:
+            await asyncio.sleep(self.turn_interval)
+            try:
+                await engine.next_turn()
+            except Exception as ex:
+                self.logger.error("LiSE engine {} failed to advance: {}".format(
+                    engine.name, repr(ex)))
+
+    async def start(self):
+        """Start all the engines, then start listening"""
+        await asyncio.gather(*(
+            engine.start() for engine in self._engines.values()))
+        self._server = await serve(
+            self._serve_client, self.host, self.port,
+            process_request=self._process_request,
+            # deltas can be large, and there's no point compressing
+            # them to send over the loopback interface
+            max_size=None, compression=None)
+        if self.port == 0:
+            self.port = self._server.sockets[0].getsockname()[1]
+        if self.turn_interval:
+            loop = asyncio.get_running_loop()
+            self._tickers = [
+                loop.create_task(self._tick(engine))
+                for engine in self._engines.values()]
+
+    async def close(self):
+        """Disconnect everyone and close all the engines"""
+        for ticker in self._tickers:
+            ticker.cancel()
+        self._tickers = []
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+        await asyncio.gather(*(
+            engine.close() for engine in self._engines.values()))
+
+    async def serve_forever(self):
+        async with self:
+            await asyncio.Future()
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+
+
+class LiSEStreamClient(AsyncEngineProxy):
+    """A connection to an engine served by :class:`LiSEStreamServer`
+
+    Make me with :func:`connect`. Send commands with :meth:`handle`
+    or :meth:`submit`, as with :class:`LiSE.proxy.AsyncEngineProxy`,
+    or several at once with :meth:`batch`.
+
+    When another client, or the server, moves the engine through
+    time, I send the :class:`blinker.Signal` called ``delta``, with
+    keyword arguments ``command``, ``branch``, ``turn``, ``tick``, and
+    ``delta``.
+
+    """
+    def __init__(self, connection, logger=None):
+        self._connection = connection
+        self.logger = logger or logging.getLogger(__name__)
+        self._pending = {}
+        self._correlations = count()
+        self._branch = self._turn = self._tick = None
+        self.delta = Signal()
+        self._reader = asyncio.get_running_loop().create_task(
+            self._read_forever())
+
+    async def _read_forever(self):
+        try:
+            async for message in self._connection:
+                self._receive(*msgpack.unpackb(message, raw=False))
+        except ConnectionClosed as ex:
+            self._disconnect(ex)
+        else:
+            self._disconnect(EOFError("LiSE server hung up"))
+
+    def _receive(self, correlation, command, branch, turn, tick, result):
+        if correlation is not None:
+            return super()._receive(
+                correlation, command, branch, turn, tick, result)
+        self._branch = branch
+        self._turn = turn
+        self._tick = tick
+        self.delta.send(
+            self, command=command, branch=branch, turn=turn, tick=tick,
+            delta=self.unpack(result))
+
+    def _disconnect(self, ex):
+        pending = self._pending
+        self._pending = {}
+        for fut in pending.values():
+            if not fut.done():
+                fut.set_exception(ex)
+
+    def _send(self, instruction):
+        if self._reader.done():
+            raise BrokenPipeError("Not connected")
+        instruction['correlation'] = correlation = next(self._correlations)
+        fut = None
+        if not instruction.get('silent'):
+            fut = self._pending[correlation] = \
+                asyncio.get_running_loop().create_future()
+        sending = asyncio.get_running_loop().create_task(
+            self._connection.send(self.pack(instruction)))
+        sending.add_done_callback(partial(self._sent, correlation))
+        return fut
+
+    def _sent(self, correlation, sending):
+        if sending.cancelled() or sending.exception() is None:
+            return
+        fut = self._pending.pop(correlation, None)
+        if fut is not None and not fut.done():
+            fut.set_exception(sending.exception())
+
+    def submit(self, cmd=None, **kwargs):
+        """Send a command without waiting for it
+
+        Return an :class:`asyncio.Future` of the result, or ``None``
+        for silent commands.
+
+        """
+        if 'command' in kwargs:
+            cmd = kwargs['command']
+        elif cmd:
+            kwargs['command'] = cmd
+        else:
+            raise TypeError("No command")
+        return self._send(kwargs)
+
+    async def batch(self, commands):
+        """Run a list of commands, in one message, and return the results
+
+        Each command is a dictionary of keyword arguments to
+        :meth:`handle`, including ``command``. Results are in the same
+        order. Silent commands' results are ``None``, and commands that
+        raised an exception have it in their place, rather than raising
+        it here.
+
+        """
+        return await self._send({'batch': [dict(cmd) for cmd in commands]})
+
+    async def close(self):
+        """Hang up
+
+        Commands still waiting for results will raise
+        :class:`websockets.exceptions.ConnectionClosed`.
+
+        """
+        await self._connection.close()
+        await self._reader
+
+
+async def connect(uri, logger=None):
+    """Connect to an engine served by :class:`LiSEStreamServer`
+
+    Return a :class:`LiSEStreamClient`.
+
+    """
+    return LiSEStreamClient(await ws_connect(
+        uri, max_size=None, compression=None), logger=logger)
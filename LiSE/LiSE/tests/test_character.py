@@ -257,4 +257,37 @@ def test_facade(character_updates):
     for o in character.edge:
         for d in character.edge[o]:
             end_edge.setdefault(o, {})[d] = dict(character.edge[o][d])
-    assert start_edge == end_edge
\ No newline at end of file
+    assert start_edge == end_edge
+
+
+def test_perlin():
+    noises = []
+    for _ in range(2):
+        with Engine(connect_string='sqlite:///:memory:',
+                    random_seed=69105) as eng:
+            char = eng.new_character('noisy')
+            for x in range(5):
+                for y in range(5):
+                    char.add_place((x * .3, y * .7))
+            char.add_place('here', x=1.5, y=2.25, z=.5)
+            char.add_place('nowhere')
+            assert char.perlin() is char
+            noises.append({name: node['perlin']
+                           for (name, node) in char.place.items()
+                           if 'perlin' in node})
+    assert noises[0] == noises[1]
+    assert len(noises[0]) == 26
+    assert 'nowhere' not in noises[0]
+    assert len(set(noises[0].values())) > 1
+    assert all(-1 <= noise <= 1 for noise in noises[0].values())
+
+
+def test_perlin_array():
+    np = pytest.importorskip('numpy')
+    from LiSE.character import (
+        _PERLIN_PERMUTATION, _perlin_noise, _perlin_noise_array
+    )
+    p = list(reversed(_PERLIN_PERMUTATION)) * 2
+    points = np.random.RandomState(0).uniform(-300, 300, (1000, 3))
+    assert _perlin_noise_array(np.array(p), *points.T).tolist() == [
+        _perlin_noise(p, x, y, z) for (x, y, z) in points.tolist()]
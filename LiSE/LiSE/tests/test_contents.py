@@ -97,3 +97,56 @@ def test_contents_in_plan(chara):
     assert set(place.content) == {1, 2, 3, 4, 5, 6, 7, 8, 10, 11, 15}
     chara.engine.turn = 10
     assert set(place.content) == {1, 2, 3, 4, 5, 6, 7, 8, 10, 11, 15}
+
+
+def test_contents_of_planned_trips(chara):
+    from LiSE.character import grid_2d_8graph
+    eng = chara.engine
+    chara.become(grid_2d_8graph(5, 5))
+    things = [chara.new_thing(i, (i % 5, 0)) for i in range(10)]
+    for i, thing in enumerate(things):
+        thing.travel_to((4 - i % 5, 4))
+    # some trips start while others are underway, and pass through
+    # places that already have planned contents
+    eng.turn = 2
+    chara.new_thing('late', (2, 2))
+    chara.thing['late'].travel_to((0, 0))
+    for turn in range(12):
+        eng.turn = turn
+        for place in chara.place.values():
+            assert set(place.content) == set(
+                eng._node_contents_cache.slow_iter_contents(
+                    'chara', place.name, *eng._btt()))
+
+
+def test_contents_hints_kept(chara):
+    """Moving a thing only forgets the hints about its own places"""
+    eng = chara.engine
+    for name in ('here', 'there', 'elsewhere'):
+        chara.new_place(name)
+    chara.place['here'].new_thing('mover')
+    chara.place['here'].new_thing('resident')
+    chara.place['elsewhere'].new_thing('local')
+    with eng.plan():
+        eng.turn = 2
+        chara.thing['mover'].location = chara.place['there']
+    eng.turn = 0
+    for turn in range(4):
+        eng.turn = turn
+        for place in chara.place.values():
+            set(place.content)
+    eng.turn = 0
+    cache = eng._node_contents_cache
+    elsewhere_hints = [hint for hint in cache.shallowest
+                       if hint[:2] == ('chara', 'elsewhere')]
+    assert elsewhere_hints
+    chara.thing['resident'].location = chara.place['there']
+    # hints about the places the thing left and entered are gone...
+    assert not [hint for hint in cache.shallowest
+                if hint[1] in ('here', 'there') and hint[3] > 0]
+    # ...but not those about anywhere else
+    assert all(hint in cache.shallowest for hint in elsewhere_hints)
+    eng.turn = 3
+    assert not set(chara.place['here'].content)
+    assert set(chara.place['there'].content) == {'mover', 'resident'}
+    assert set(chara.place['elsewhere'].content) == {'local'}
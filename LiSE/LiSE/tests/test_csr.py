@@ -0,0 +1,101 @@
+# This file is part of LiSE, a framework for life simulation games.
+# Copyright (c) Zachary Spector, public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import networkx as nx
+import pytest
+
+np = pytest.importorskip('numpy')
+
+
+def portals_of(snap):
+    """Return a dict of ``{(orig, dest): weight}`` in ``snap``"""
+    names = snap.names
+    ret = {}
+    for i, orig in enumerate(names):
+        for j, w in zip(snap.indices[snap.indptr[i]:snap.indptr[i+1]],
+                        snap.weights[snap.indptr[i]:snap.indptr[i+1]]):
+            ret[orig, names[j]] = w
+    return ret
+
+
+def portals_in(char, weight):
+    return {(orig, dest): char.portal[orig][dest].get(weight, 1)
+            for (orig, dest) in char.edges}
+
+
+@pytest.fixture(scope='function')
+def grid(engy):
+    char = engy.new_character('grid', data=nx.grid_2d_graph(4, 4))
+    for orig, dest in char.edges:
+        char.portal[orig][dest]['cost'] = 2
+    yield char
+
+
+def test_csr(grid):
+    engy = grid.engine
+    snap = grid.csr('cost')
+    assert sorted(snap.names) == sorted(grid.node)
+    assert portals_of(snap) == portals_in(grid, 'cost')
+    assert snap.indices.dtype == np.int32
+    indices = snap.indices
+    engy.next_turn()
+    assert not snap.refresh()
+    assert snap.indices is indices
+    grid.portal[0, 0][0, 1]['cost'] = 5
+    grid.new_place('island')
+    grid.new_portal((3, 3), 'island', cost=1)
+    del grid.portal[1, 1][1, 2]
+    engy.next_turn()
+    index = dict(snap.index)
+    assert snap.refresh()
+    # old nodes keep their indices; new ones go at the end
+    assert snap.index == dict(index, island=len(index))
+    assert portals_of(snap) == portals_in(grid, 'cost')
+    assert snap.indices is not indices
+    engy.turn = 0
+    assert snap.refresh()
+    assert 'island' not in snap.index
+    assert portals_of(snap) == portals_in(grid, 'cost')
+    engy.turn = 2
+    del grid.place[2, 2]
+    assert snap.refresh()
+    assert (2, 2) not in snap.index
+    assert portals_of(snap) == portals_in(grid, 'cost')
+    # the past, without going there
+    past = grid.csr('cost', turn=0)
+    assert past.btt[:2] == ('trunk', 0)
+    assert 'island' not in past.index
+    assert (2, 2) in past.index
+
+
+def test_csr_graph(grid):
+    engy = grid.engine
+    engy.next_turn()
+    del grid.portal[1, 1][1, 2]
+    graph = grid.csr('cost').graph
+    assert set(graph) == set(grid.node)
+    assert set(graph.edges) == set(grid.edges)
+    assert graph.pred[1, 2].keys() == grid.pred[1, 2].keys()
+    assert graph.adj[0, 0][0, 1] == {'cost': 2}
+    for dest in [(3, 3), (1, 2), (2, 0)]:
+        assert nx.shortest_path_length(graph, (0, 0), dest, 'cost') \
+            == nx.shortest_path_length(grid, (0, 0), dest, 'cost')
+    assert nx.betweenness_centrality(graph) == pytest.approx(
+        nx.betweenness_centrality(nx.DiGraph(grid)))
+    with pytest.raises(nx.NetworkXError):
+        graph.add_edge((0, 0), (3, 3))
+    copied = graph.copy()
+    copied.add_edge((0, 0), (3, 3))
+    assert nx.shortest_path_length(copied, (0, 0), (3, 3)) == 1
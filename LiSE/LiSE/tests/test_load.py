@@ -22,3 +22,84 @@ def test_keyframe_load_init(tempdir):
     assert (0, 0) in eng.character['physical'].place
     assert (0, 1) in eng.character['physical'].portal[0, 0]
     eng.close()
+
+
+def test_windowed_load(tempdir):
+    """Loading only some history gets the same world as loading all of it"""
+    def state(eng):
+        phys = eng.character['physical']
+        return (
+            {name: dict(node) for name, node in phys.node.items()},
+            {name: thing['location'] for name, thing in phys.thing.items()}
+        )
+    with Engine(tempdir, random_seed=69105) as eng:
+        inittest(eng)
+        for i in range(12):
+            eng.next_turn()
+            if eng.turn % 4 == 0:
+                eng.snap_keyframe()
+        expected = {}
+        for turn in range(eng.turn + 1):
+            eng.turn = turn
+            expected[turn] = state(eng)
+        last_turn = turn
+    with Engine(tempdir, history_window=2) as eng:
+        assert eng._loaded == {'trunk': 8}
+        for turn in range(last_turn, -1, -1):
+            eng.turn = turn
+            assert state(eng) == expected[turn]
+        assert eng._loaded == {'trunk': 0}
+        eng.turn = last_turn
+        eng.next_turn()
+
+
+def test_keyframe_interval(tempdir):
+    with Engine(tempdir, random_seed=69105, keyframe_interval=3) as eng:
+        inittest(eng)
+        for i in range(10):
+            eng.next_turn()
+        kobold_loc = eng.character['physical'].thing['kobold']['location']
+        assert eng._keyframe_turns['trunk']['physical'] == {0, 3, 6, 9}
+    with Engine(tempdir, history_window=0) as eng:
+        assert eng._loaded == {'trunk': 9}
+        assert eng.character['physical'].thing['kobold']['location'] \
+            == kobold_loc
+        eng.next_turn()
+
+
+def test_fast_profile(tempdir):
+    with Engine(
+        tempdir, random_seed=69105, connect_args={'profile': 'fast'}
+    ) as eng:
+        assert eng.query.connection.execute(
+            'PRAGMA journal_mode;').fetchone()[0] == 'wal'
+        inittest(eng)
+        for i in range(3):
+            eng.next_turn()
+        kobold_loc = eng.character['physical'].thing['kobold']['location']
+    with Engine(tempdir) as eng:
+        assert eng.character['physical'].thing['kobold']['location'] \
+            == kobold_loc
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('profile', ['default', 'fast'])
+def test_college_profile_benchmark(tempdir, profile, record_property):
+    from time import monotonic
+    from LiSE.examples.college import install
+    with Engine(
+        tempdir, random_seed=69105, connect_args={'profile': profile}
+    ) as eng:
+        start = monotonic()
+        install(eng)
+        eng.commit()
+        installed = monotonic()
+        commit_time = 0.
+        for i in range(3):
+            eng.next_turn()
+            committing = monotonic()
+            eng.commit()
+            commit_time += monotonic() - committing
+        record_property('install_seconds', installed - start)
+        record_property('three_turns_seconds', monotonic() - installed)
+        record_property('commit_seconds', commit_time)
@@ -14,6 +14,8 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from LiSE.proxy import EngineProcessManager
+from LiSE.character import grid_2d_8graph
+from struct import unpack_from
 import LiSE.allegedb.tests.test_all
 import pytest
 import LiSE.examples.kobold as kobold
@@ -146,3 +148,477 @@ def test_manip_deleted(engy):
     assert 1 not in phys
     assert 0 not in phys.adj
     assert 1 not in phys.adj
+
+
+def test_journal_delta(handle_initialized):
+    hand = handle_initialized
+    eng = hand._real
+    hand.get_slow_delta()
+    first = hand.get_slow_delta(consumer='other')
+    assert set(first['physical']['nodes']) \
+        == set(eng.character['physical'].node)
+    assert first['rulebooks'] == {
+        rb: hand.rulebook_copy(rb) for rb in eng.rulebook.keys()
+        if hand.rulebook_copy(rb)
+    }
+
+    def no_snapshots(*args, **kwargs):
+        raise AssertionError("Diffed a snapshot")
+    hand._character_snapshot_delta = no_snapshots
+    ret, diff = hand.next_turn()
+    diff = {k: v for (k, v) in diff.items() if v}
+    assert hand.get_slow_delta() == diff
+    assert hand.get_slow_delta(consumer='other') == diff
+    assert hand.get_slow_delta() == {}
+    phys = eng.character['physical']
+    phys.stat['journaled'] = True
+    phys.place[1, 1]['journaled'] = True
+    assert hand.get_char_deltas('all') == {'physical': {
+        'journaled': True, 'node_val': {(1, 1): {'journaled': True}}}}
+    assert hand._char_stat_cache['physical']['journaled'] is True
+    assert hand._node_stat_cache['physical'][1, 1]['journaled'] is True
+    assert hand.character_delta('physical', consumer='other') == {
+        'journaled': True, 'node_val': {(1, 1): {'journaled': True}}}
+    assert hand.character_delta('physical', consumer='other') == {}
+
+
+def test_branch_delta(handle):
+    hand = handle
+    eng = hand._real
+    phys = eng.new_character('physical')
+    for i in range(5):
+        phys.new_place(i, n=i)
+    phys.place[0].new_thing('thing')
+    eng.next_turn()
+    phys.place[1]['n'] = 'trunk'
+    phys.thing['thing'].location = phys.place[1]
+    eng.next_turn()
+    phys.place[2]['n'] = 'trunk'
+    del phys.place[4]
+    eng.turn = 1
+    eng.branch = 'other'
+    phys.place[1]['n'] = 'other'
+    phys.place[3]['n'] = 'other'
+    phys.thing['thing'].location = phys.place[3]
+    phys.new_place(5)
+    phys.place[2]['x'] = 'other'
+
+    def state():
+        return {
+            name: hand.node_stat_copy(node)
+            for (name, node) in phys.node.items()
+        }
+
+    def check(before, delta, after):
+        delta = delta['physical']
+        nodes = delta.get('nodes', {})
+        for node in set(before).union(after):
+            if (node in before) != (node in after):
+                assert nodes[node] == (node in after)
+        nv = delta.get('node_val', {})
+        for node, stats in after.items():
+            for k, v in stats.items():
+                if before.get(node, {}).get(k) != v:
+                    assert nv[node][k] == v
+        for node, stats in nv.items():
+            if node in after:
+                for k, v in stats.items():
+                    assert after[node].get(k) == v
+
+    assert [window[0] for window in eng._branch_windows(
+        *eng._btt(), 'trunk', 2, 0
+    )] == ['other', 'trunk']
+    hand.get_char_deltas('all', consumer='other')
+    other_state = state()
+    ret, delta = hand.time_travel('trunk', 2)
+    trunk_state = state()
+    assert 4 not in trunk_state and 5 not in trunk_state
+    check(other_state, delta, trunk_state)
+    assert hand.get_char_deltas('all', consumer='other') == {
+        'physical': delta['physical']}
+    ret, delta = hand.time_travel('other', 1)
+    assert state() == other_state
+    check(trunk_state, delta, other_state)
+
+
+def test_ring_connection():
+    from multiprocessing import Pipe
+    from multiprocessing.shared_memory import SharedMemory
+    from LiSE.proxy import RingConnection
+    recv_conn, send_conn = Pipe(duplex=False)
+    shm = SharedMemory(create=True, size=RingConnection.header + 1000)
+    try:
+        shm.buf[:RingConnection.header] = bytes(RingConnection.header)
+        sender = RingConnection(send_conn, shm, threshold=100)
+        receiver = RingConnection(recv_conn, shm, threshold=100)
+        sender.send('shutdown')
+        assert receiver.recv() == 'shutdown'
+        for i in range(20):
+            payload = bytes([i]) * (50 + i * 37)
+            sender.send(payload)
+            sender.send(('cmd', 'trunk', i, 0, payload))
+            assert receiver.recv() == payload
+            assert receiver.recv() == ('cmd', 'trunk', i, 0, payload)
+        assert sender._written > 1000  # wrapped around
+        big = bytes(2000)
+        sender.send(big)  # too big for the ring, so it's piped
+        assert receiver.recv() == big
+    finally:
+        recv_conn.close()
+        send_conn.close()
+        shm.close()
+        shm.unlink()
+
+
+def test_shared_memory_transport(tempdir):
+    manager = EngineProcessManager()
+    try:
+        engine = manager.start(
+            tempdir, connect_string='sqlite:///:memory:',
+            transport='shared_memory', ring_size=2 ** 16
+        )
+        engine.add_character(
+            'physical', grid_2d_8graph(20, 20), block=True)
+        phys = engine.character['physical']
+        engine.next_turn()
+        assert len(phys.place) == 400
+        # the engine read something out of the ring
+        assert unpack_from('<Q', manager._rings[0].buf)[0] > 0
+    finally:
+        manager.shutdown()
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('transport', ['pipe', 'shared_memory'])
+def test_transport_benchmark(transport, record_property):
+    from multiprocessing import Pipe
+    from multiprocessing.shared_memory import SharedMemory
+    from threading import Thread
+    from time import monotonic
+    from LiSE.proxy import RingConnection, RING_SIZE
+    recv_conn, send_conn = Pipe(duplex=False)
+    shm = None
+    if transport == 'shared_memory':
+        shm = SharedMemory(create=True, size=RingConnection.header + RING_SIZE)
+        shm.buf[:RingConnection.header] = bytes(RingConnection.header)
+        recv_conn = RingConnection(recv_conn, shm)
+        send_conn = RingConnection(send_conn, shm)
+    payload = os.urandom(2 ** 20)
+    n = 200
+
+    received = []
+
+    def drain():
+        for i in range(n):
+            received.append(recv_conn.recv()[2])
+    try:
+        reader = Thread(target=drain)
+        start = monotonic()
+        reader.start()
+        for i in range(n):
+            send_conn.send(('character_copy', 'trunk', i, 0, payload))
+        reader.join()
+        elapsed = monotonic() - start
+        assert received == list(range(n))
+        record_property(
+            'megabytes_per_second', n * len(payload) / elapsed / 1e6)
+    finally:
+        recv_conn.close()
+        send_conn.close()
+        if shm is not None:
+            shm.unlink()
+
+
+def test_batch(tempdir):
+    manager = EngineProcessManager()
+    engine = manager.start(tempdir, connect_string='sqlite:///:memory:')
+    try:
+        phys = engine.new_character('physical')
+        phys.add_place('here')
+        sent = []
+        send = engine.send
+
+        def counting_send(msg):
+            sent.append(msg)
+            send(msg)
+        engine.send = counting_send
+        with engine.batch() as results:
+            for i in range(10):
+                phys.place['here']['n'] = i
+            fut = engine.handle('del_node_stat', char='physical',
+                                node='nowhere', k='n', block=False,
+                                future=True)
+            engine.universal['nice'] = True
+        del engine.send
+        assert len(sent) == 1
+        assert len(results) == 12
+        assert isinstance(results[10], Exception)
+        assert fut.result()[-1] is results[10]
+        assert engine.handle(
+            'node_stat_copy', node_or_char='physical', node='here')['n'] == 9
+        assert engine.handle('get_universal', k='nice')
+        with engine.batch() as results:
+            phys.place['here']['m'] = 1
+            # blocking commands go out right away, after the queue
+            assert engine.handle(
+                'node_stat_copy', node_or_char='physical', node='here')['m'] == 1
+            phys.place['here']['m'] = 2
+        assert len(results) == 2
+        assert engine.handle(
+            'node_stat_copy', node_or_char='physical', node='here')['m'] == 2
+    finally:
+        manager.shutdown()
+
+
+def test_async_proxy(tempdir):
+    import asyncio
+
+    async def main():
+        manager = EngineProcessManager()
+        engine = manager.start(
+            tempdir, connect_string='sqlite:///:memory:',
+            asynchronous=True
+        )
+        try:
+            await engine.handle('add_character', char='physical',
+                                data={'place': {'here': {'n': 0}}}, attr={})
+            # lots of commands in flight at once
+            futs = [engine.submit('set_universal', k=i, v=i * 2)
+                    for i in range(50)]
+            got = await asyncio.gather(*(
+                engine.handle('get_universal', k=i) for i in range(50)))
+            assert got == [i * 2 for i in range(50)]
+            assert all(fut.done() for fut in futs)
+            engine.submit('set_node_stat', char='physical', node='here',
+                          k='n', v=1, silent=True)
+            with pytest.raises(KeyError):
+                await engine.handle('get_universal', k='nothing')
+            assert (await engine.handle(
+                'node_stat_copy', node_or_char='physical', node='here'
+            ))['n'] == 1
+            turn = engine.turn
+            await engine.handle('next_turn')
+            assert engine.turn == turn + 1
+        finally:
+            manager.shutdown()
+    asyncio.run(main())
+
+
+def test_async_proxy_subscription(tempdir):
+    import asyncio
+
+    async def main():
+        manager = EngineProcessManager()
+        engine = manager.start(
+            tempdir, connect_string='sqlite:///:memory:',
+            asynchronous=True, subscription={'a': None}
+        )
+        try:
+            for name in ('a', 'b'):
+                await engine.handle(
+                    'add_character', char=name, data={}, attr={'s': 0})
+            await engine.handle('next_turn')
+            for name in ('a', 'b'):
+                await engine.handle(
+                    'set_character_stat', char=name, k='s', v=1)
+            _, delta = await engine.handle(
+                'time_travel', branch='trunk', turn=0)
+            assert delta == {'a': {'s': 0}}
+        finally:
+            manager.shutdown()
+    asyncio.run(main())
+
+
+def test_async_proxy_subscription_names(tempdir):
+    import asyncio
+
+    async def main():
+        manager = EngineProcessManager()
+        engine = manager.start(
+            tempdir, connect_string='sqlite:///:memory:',
+            asynchronous=True, subscription=['a']
+        )
+        try:
+            for name in ('a', 'b'):
+                await engine.handle(
+                    'add_character', char=name, data={}, attr={'s': 0})
+            await engine.handle('next_turn')
+            for name in ('a', 'b'):
+                await engine.handle(
+                    'set_character_stat', char=name, k='s', v=1)
+            _, delta = await engine.handle(
+                'time_travel', branch='trunk', turn=0)
+            assert delta == {'a': {'s': 0}}
+        finally:
+            manager.shutdown()
+    asyncio.run(main())
+
+
+def test_async_proxy_bad_subscription(tempdir):
+    import asyncio
+
+    async def main():
+        manager = EngineProcessManager()
+        engine = manager.start(
+            tempdir, connect_string='sqlite:///:memory:',
+            asynchronous=True, subscription={'a': 'nodes'}
+        )
+        try:
+            with pytest.raises(AttributeError):
+                await engine.handle('next_turn')
+        finally:
+            manager.shutdown()
+    asyncio.run(main())
+
+
+def test_async_proxy_compact(tempdir):
+    import asyncio
+
+    async def main():
+        manager = EngineProcessManager()
+        engine = manager.start(
+            tempdir, connect_string='sqlite:///:memory:',
+            asynchronous=True, delta_format='compact'
+        )
+        try:
+            await engine.handle(
+                'add_character', char='a', data={}, attr={'s': 0})
+            for turn in range(1, 4):
+                await engine.handle('next_turn')
+                await engine.handle(
+                    'set_character_stat', char='a', k='s', v=turn)
+            # symbols the codec learned earlier get used again
+            for turn in (1, 3):
+                _, delta = await engine.handle(
+                    'time_travel', branch='trunk', turn=turn)
+                assert delta == {'a': {'s': turn}}
+            assert engine._delta_codec._symbols
+        finally:
+            manager.shutdown()
+    asyncio.run(main())
+
+
+def test_async_proxy_unpack(handle):
+    """The asynchronous proxy unpacks what the core packs, with entities
+    as their keys"""
+    from LiSE.proxy import AsyncEngineProxy
+    eng = handle._real
+    char = eng.new_character('physical')
+    place = char.new_place('here')
+    char.new_place('there')
+    port = char.new_portal('here', 'there')
+    proxy = AsyncEngineProxy.__new__(AsyncEngineProxy)
+    got = proxy.unpack(eng.pack([
+        char, place, port, (1, 2), frozenset([3]), KeyError('nope')]))
+    assert got[:5] == [
+        'physical', ('physical', 'here'), ('physical', 'here', 'there'),
+        (1, 2), frozenset([3])
+    ]
+    assert isinstance(got[5], KeyError)
+
+
+def test_subscription(handle):
+    eng = handle._real
+    for name in ('a', 'b'):
+        char = eng.new_character(name)
+        char.stat['s'] = 0
+        for i in range(3):
+            char.add_place(i, x=i, y=-i)
+        char.add_portal(0, 1, w=1, z=1)
+        char.add_portal(1, 2, w=2)
+    handle.get_slow_delta()
+    delta = handle.set_subscription(
+        {'a': {'nodes': [0, 1], 'stats': ['x', 'w']}})
+    assert list(delta) == ['a']
+    assert 's' not in delta['a']
+    assert delta['a']['nodes'] == {0: True, 1: True}
+    assert {node: vals['x'] for (node, vals)
+            in delta['a']['node_val'].items()} == {0: 0, 1: 1}
+    assert delta['a']['edge_val'] == {0: {1: {'w': 1}}}
+    eng.next_turn()
+    for name in ('a', 'b'):
+        char = eng.character[name]
+        char.stat['s'] = 1
+        char.place[0]['x'] = 10
+        char.place[0]['y'] = 10
+        char.place[2]['x'] = 10
+        char.portal[0][1]['w'] = 3
+    assert handle.get_char_deltas('all') == {
+        'a': {'node_val': {0: {'x': 10}}, 'edge_val': {0: {1: {'w': 3}}}}}
+    assert handle.time_travel('trunk', 0)[1] == {
+        'a': {'node_val': {0: {'x': 0}}, 'edge_val': {0: {1: {'w': 1}}}}}
+    # only the characters whose subscriptions changed come back
+    delta = handle.set_subscription({
+        'a': {'nodes': [0, 1], 'stats': ['x', 'w']}, 'b': None})
+    assert list(delta) == ['b']
+    assert delta['b']['s'] == 0
+    assert set(handle.set_subscription(None)) == {'a'}
+    # a deleted character's delta
+    assert handle._filter_char_delta(None, {0}, {'x'}) is None
+
+
+def test_proxy_subscribe(tempdir):
+    manager = EngineProcessManager()
+    engine = manager.start(tempdir, connect_string='sqlite:///:memory:')
+    try:
+        for name in ('a', 'b'):
+            engine.add_character(name, data={'place': {
+                'here': {'x': 0, 'y': 0}, 'there': {'x': 1, 'y': 1}}},
+                block=True)
+        engine.subscribe({'a': {'nodes': ['here']}})
+        assert list(engine.character) == ['a']
+        assert list(engine.character['a'].place) == ['here']
+        engine.subscribe({'a': {'stats': ['x']}, 'b': None})
+        assert set(engine.character) == {'a', 'b'}
+        assert set(engine.character['a'].place) == {'here', 'there'}
+        assert 'y' not in engine.character['a'].place['there']
+        assert engine.character['b'].place['there']['y'] == 1
+    finally:
+        manager.shutdown()
+
+
+def test_delta_codec(handle_initialized):
+    from LiSE.wire import DeltaCodec
+    eng = handle_initialized._real
+    enc, dec = DeltaCodec(), DeltaCodec()
+    for i in range(3):
+        btt = eng._btt()
+        eng.next_turn()
+        delta = eng.get_delta(*btt, *eng._btt()[1:])
+        assert dec.decode(eng.unpack(eng.pack(enc.encode(delta)))) == delta
+    # decoding out of order would get the names wrong
+    enc.encode({'kobold': {'node_val': {'kobold': {'new_stat': 1}}}})
+    with pytest.raises(ValueError):
+        dec.decode(enc.encode({'physical': {}}))
+    delta = eng.get_delta('trunk', 0, 0, *eng._btt()[1:])
+    compact = eng.pack(DeltaCodec().encode(delta))
+    assert DeltaCodec().decode(eng.unpack(compact)) == delta
+    assert len(compact) < len(eng.pack(delta))
+
+
+def test_proxy_compact_delta(tempdir):
+    manager = EngineProcessManager()
+    engine = manager.start(
+        tempdir, connect_string='sqlite:///:memory:',
+        delta_format='compact')
+    try:
+        engine.add_character('a', data={'place': {
+            'here': {'x': 0}, 'there': {'x': 1}}}, block=True)
+        char = engine.character['a']
+        char.stat['s'] = 0
+        char.add_portal('here', 'there', w=1)
+        engine.next_turn()
+        char.stat['s'] = 1
+        char.place['here']['x'] = 2
+        char.portal['here']['there']['w'] = 2
+        engine.next_turn()
+        engine.time_travel('trunk', 0)
+        assert char.stat['s'] == 0
+        assert char.place['here']['x'] == 0
+        assert char.portal['here']['there']['w'] == 1
+        engine.time_travel('trunk', 2)
+        assert char.stat['s'] == 1
+        assert char.place['here']['x'] == 2
+        assert char.portal['here']['there']['w'] == 2
+    finally:
+        manager.shutdown()
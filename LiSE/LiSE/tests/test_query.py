@@ -147,4 +147,122 @@ def noncollision(college24_premade):
 
 
 def test_noncollision_premade(college24_premade):
-    noncollision(college24_premade)
\ No newline at end of file
+    noncollision(college24_premade)
+
+
+def test_windows_when(engy):
+    from LiSE.query import slow_iter_turns_eval_cmp
+    phys = engy.new_character('physical')
+    for i in range(4):
+        phys.new_place(i)
+    thing = phys.new_thing('thing', 0)
+    place = phys.place[1]
+    place['hunger'] = 0
+    phys.stat['temp'] = 20
+    for turn in range(1, 20):
+        engy.turn = turn
+        place['hunger'] = turn % 7 * 3
+        if turn % 3 == 0:
+            thing['location'] = turn % 4
+        if turn % 5 == 0:
+            phys.stat['temp'] += 1
+    queries = [
+        place.historical('hunger') > 10,
+        place.historical('hunger') == engy.alias(9),
+        place.historical('hunger') < phys.historical('temp'),
+        thing.historical('location') == engy.alias(3),
+        thing.historical('location') == place.historical('hunger')
+    ]
+    for qry in queries:
+        windows = qry.windows_when()
+        assert windows is not None
+        assert list(engy.turns_when(qry)) == [
+            turn for (branch, turn) in slow_iter_turns_eval_cmp(
+                qry, qry.oper, engine=engy)
+        ]
+    assert queries[0].windows_when() == [
+        (4, 6), (11, 13), (18, 19)]
+    assert queries[0].between(5, 12).windows_when() == [(5, 6), (11, 12)]
+    assert engy.turn == 19
+    engy.turn = 12
+    engy.branch = 'b'
+    place['hunger'] = 100
+    engy.turn = 15
+    assert queries[0].windows_when() == [(4, 6), (11, 15)]
+
+
+def test_windows_when_keyframe(tempdir):
+    import networkx as nx
+    data = nx.DiGraph(temp=20)
+    data.add_node('p', hunger=5)
+    data.add_node('q')
+    data.add_edge('p', 'q', cost=2)
+    with Engine(tempdir) as eng:
+        char = eng.new_character('c', data=data)
+        place = char.place['p']
+        portal = char.portal['p']['q']
+        for turn in range(1, 7):
+            eng.turn = turn
+            if turn == 3:
+                place['hunger'] = 20
+                portal['cost'] = 4
+                char.stat['temp'] = 30
+            if turn == 5:
+                eng.snap_keyframe()
+        queries = [
+            place.historical('hunger') < 10,
+            portal.historical('cost') == eng.alias(2),
+            char.historical('temp') == eng.alias(20)
+        ]
+        for qry in queries:
+            assert qry.windows_when() == [(0, 2)]
+        assert list(eng.turns_when(queries[0])) == [0, 1, 2]
+        assert list(place.historical('hunger').iter_history(0, 5)) \
+            == [5, 5, 5, 20, 20, 20]
+    with Engine(tempdir, history_window=1) as eng:
+        assert eng._loaded['trunk'] > 0
+        char = eng.character['c']
+        assert (char.place['p'].historical('hunger') < 10).windows_when() \
+            == [(0, 2)]
+        assert (
+            char.portal['p']['q'].historical('cost') == eng.alias(2)
+        ).windows_when() == [(0, 2)]
+        assert (char.historical('temp') == eng.alias(20)).windows_when() \
+            == [(0, 2)]
+
+
+def test_windows_when_in_memory(tempdir):
+    from LiSE.util import EntityStatAccessor
+    with Engine(tempdir) as eng:
+        phys = eng.new_character('physical')
+        place = phys.new_place(0)
+        thing = phys.new_thing('thing', 0)
+        phys.new_place(1)
+        for turn in range(1, 20):
+            eng.turn = turn
+            place['hunger'] = turn % 7 * 3
+            if turn % 4 == 0:
+                thing['location'] = turn % 8 // 4
+            if turn == 10:
+                eng.snap_keyframe()
+        hungry = place.historical('hunger') > 10
+        home = thing.historical('location') == eng.alias(0)
+        start = eng._btt()
+        eng._set_turn = eng._set_tick = eng._set_branch = None  # no time travel
+        hungry_windows = hungry.windows_when()
+        home_windows = home.windows_when()
+        history = list(place.historical('hunger').iter_history(0, 19))
+        del eng._set_turn, eng._set_tick, eng._set_branch
+        assert eng._btt() == start
+        assert hungry_windows == [(4, 6), (11, 13), (18, 19)]
+        assert home_windows == [(0, 3), (8, 11), (16, 19)]
+        assert history == list(EntityStatAccessor.iter_history(
+            place.historical('hunger'), 0, 19))
+    with Engine(tempdir, history_window=2) as eng:
+        assert eng._loaded['trunk'] > 0
+        place = eng.character['physical'].place[0]
+        thing = eng.character['physical'].thing['thing']
+        assert (place.historical('hunger') > 10).windows_when() \
+            == hungry_windows
+        assert (thing.historical('location') == eng.alias(0)).windows_when() \
+            == home_windows
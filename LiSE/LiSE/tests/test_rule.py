@@ -145,4 +145,277 @@ def test_portal_dot_rule(engy):
     character.new_place(1)
     port = character.new_portal(0, 1)
     rule = something_dot_rule_test(port, engy)
-    assert port.rulebook[0] == rule
\ No newline at end of file
+    assert port.rulebook[0] == rule
+
+
+def test_parallel_triggers(tempdir, monkeypatch):
+    """Read-only triggers checked in worker processes give the same
+    results as when checked serially"""
+    import LiSE.engine
+    pools = []
+
+    class CountingPool(LiSE.engine.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(LiSE.engine, 'ProcessPoolExecutor', CountingPool)
+    results = []
+    for workers in (None, 2):
+        prefix = os.path.join(tempdir, str(workers))
+        os.mkdir(prefix)
+        with Engine(prefix, random_seed=0, trigger_workers=workers,
+                    trigger_workers_threshold=0) as eng:
+            for i in range(12):
+                eng.new_character(i, n=i)
+
+            @eng.rule
+            def increment(character):
+                character.stat['n'] += 3
+
+            @increment.trigger(read_only=True)
+            def odd(character):
+                return character.stat['n'] % 2
+
+            @eng.rule
+            def mark(character):
+                character.stat['marked'] = True
+
+            @mark.trigger
+            def big(character):
+                return character.stat['n'] > 10
+
+            for i in range(12):
+                eng.character[i].rulebook.extend(['increment', 'mark'])
+            for i in range(4):
+                eng.next_turn()
+            results.append({
+                name: dict(char.stat) for name, char in eng.character.items()
+            })
+            assert eng._read_only_triggers == {'odd'}
+        with Engine(prefix) as eng:
+            assert eng._read_only_triggers == {'odd'}
+    assert results[0] == results[1]
+    assert len(pools) == 4
+
+
+def test_parallel_triggers_database(tempdir):
+    """Read-only triggers that need the database get checked serially"""
+    with Engine(tempdir, random_seed=0, trigger_workers=2,
+                trigger_workers_threshold=0) as eng:
+        for i in range(4):
+            eng.new_character(i, n=i)
+
+        @eng.rule
+        def increment(character):
+            character.stat['n'] += 1
+
+        @increment.trigger(read_only=True)
+        def in_database(character):
+            return character.engine.query.have_graph(character.name)
+
+        for i in range(4):
+            eng.character[i].rulebook.append('increment')
+        eng.next_turn()
+        assert [eng.character[i].stat['n'] for i in range(4)] \
+            == [1, 2, 3, 4]
+
+
+def test_parallel_triggers_random(tempdir):
+    """Read-only triggers that use randomness draw the same numbers as
+    when checked serially, and aren't sent to workers again"""
+    results = []
+    for workers in (None, 2):
+        prefix = os.path.join(tempdir, str(workers))
+        os.mkdir(prefix)
+        with Engine(prefix, random_seed=0, trigger_workers=workers,
+                    trigger_workers_threshold=0) as eng:
+            for i in range(6):
+                eng.new_character(i, n=0)
+
+            @eng.rule
+            def increment(character):
+                character.stat['n'] += 1
+
+            @increment.trigger(read_only=True)
+            def lucky(character):
+                return character.engine.coinflip()
+
+            for i in range(6):
+                eng.character[i].rulebook.append('increment')
+            for i in range(4):
+                eng.next_turn()
+            results.append({
+                name: char.stat['n'] for name, char in eng.character.items()
+            })
+            if workers:
+                assert eng._serial_triggers == {'increment'}
+    assert results[0] == results[1]
+
+
+def test_parallel_triggers_threshold(tempdir, monkeypatch):
+    """Workers only get forked for triggers that took long enough"""
+    import LiSE.engine
+    pools = []
+
+    class CountingPool(LiSE.engine.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(LiSE.engine, 'ProcessPoolExecutor', CountingPool)
+    with Engine(tempdir, random_seed=0, trigger_workers=2) as eng:
+        for i in range(4):
+            eng.new_character(i, n=i)
+
+        @eng.rule
+        def increment(character):
+            character.stat['n'] += 1
+
+        @increment.trigger(read_only=True)
+        def cheap(character):
+            return True
+
+        for i in range(4):
+            eng.character[i].rulebook.append('increment')
+        eng.next_turn()
+        eng.next_turn()
+        assert not pools
+        assert eng._trigger_costs['increment'] < 0.1
+        eng._trigger_costs['increment'] = 0.1
+        eng.next_turn()
+        assert len(pools) == 1
+        assert [eng.character[i].stat['n'] for i in range(4)] \
+            == [3, 4, 5, 6]
+
+
+def test_trigger_workers_write_behind(tempdir):
+    with pytest.raises(ValueError):
+        Engine(tempdir, trigger_workers=2, write_behind=True)
+
+
+def test_watched_triggers(tempdir, monkeypatch):
+    """Triggers that watch some stats aren't checked again until those
+    stats change"""
+    import LiSE.engine
+    checked = []
+    triggered = LiSE.engine._triggered
+
+    def counting_triggered(rule, entity):
+        checked.append(entity.name)
+        return triggered(rule, entity)
+
+    monkeypatch.setattr(LiSE.engine, '_triggered', counting_triggered)
+    with Engine(tempdir, random_seed=0) as eng:
+        for i in range(6):
+            eng.new_character(i, hungry=False)
+
+        @eng.rule
+        def eat(character):
+            character.stat['hungry'] = False
+            character.stat['fed'] = character.stat.get('fed', 0) + 1
+
+        @eat.trigger(watch=['hungry'])
+        def hungry(character):
+            return character.stat['hungry']
+
+        for i in range(6):
+            eng.character[i].rulebook.append('eat')
+        phys = eng.new_character('physical')
+        phys.new_place('here')
+        phys.new_place('there')
+        phys.new_portal('here', 'there')
+        phys.place['there'].new_thing('guest')
+
+        @phys.place.rule
+        def greet(place):
+            place['greeted'] = place.get('greeted', 0) + 1
+
+        @greet.trigger(watch=['contents'])
+        def occupied(place):
+            return bool(place.content)
+
+        eng.next_turn()
+        assert sorted(map(str, checked)) == [
+            '0', '1', '2', '3', '4', '5', 'here', 'there']
+        assert phys.place['there']['greeted'] == 1
+        del checked[:]
+        eng.next_turn()
+        assert checked == ['there']
+        del checked[:]
+        eng.next_turn()
+        assert checked == ['there']
+        del checked[:]
+        eng.character[3].stat['hungry'] = True
+        phys.thing['guest'].location = phys.place['here']
+        eng.next_turn()
+        assert sorted(map(str, checked)) == ['3', 'here', 'there']
+        assert eng.character[3].stat['fed'] == 1
+        assert phys.place['here']['greeted'] == 1
+        del checked[:]
+        eng.next_turn()
+        # 3 got fed, so its hunger changed
+        assert sorted(map(str, checked)) == ['3', 'here']
+        del checked[:]
+        eng.next_turn()
+        assert checked == ['here']
+        assert eng._trigger_watches == {
+            'hungry': ('hungry',), 'occupied': ('contents',)}
+    with Engine(tempdir) as eng:
+        assert eng._trigger_watches == {
+            'hungry': ('hungry',), 'occupied': ('contents',)}
+
+
+def test_watched_parallel_triggers(tempdir, monkeypatch):
+    """Read-only triggers checked in worker processes aren't checked
+    again until their stats change, either"""
+    import LiSE.engine
+    pools = []
+
+    class CountingPool(LiSE.engine.ProcessPoolExecutor):
+        def __init__(self, *args, **kwargs):
+            pools.append(self)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(LiSE.engine, 'ProcessPoolExecutor', CountingPool)
+    with Engine(tempdir, random_seed=0, trigger_workers=2,
+                trigger_workers_threshold=0) as eng:
+        for i in range(4):
+            eng.new_character(i, hungry=False)
+
+        @eng.rule
+        def eat(character):
+            character.stat['hungry'] = False
+
+        @eat.trigger(read_only=True, watch=['hungry'])
+        def hungry(character):
+            return character.stat['hungry']
+
+        for i in range(4):
+            eng.character[i].rulebook.append('eat')
+        eng.next_turn()
+        assert len(pools) == 1
+        assert len(eng._quiet_triggers) == 4
+        eng.next_turn()
+        assert len(pools) == 1
+
+
+def test_unwatched_changes(tempdir):
+    """Without any watched triggers, changes aren't kept track of"""
+    with Engine(tempdir, random_seed=0) as eng:
+        char = eng.new_character('c', n=0)
+
+        @eng.rule
+        def increment(character):
+            character.stat['n'] += 1
+
+        @increment.trigger
+        def always(character):
+            return True
+
+        char.rulebook.append('increment')
+        for i in range(5):
+            eng.next_turn()
+        assert char.stat['n'] == 5
+        assert not eng._watched_changes
+        assert eng._node_val_cache.watcher is None
@@ -0,0 +1,110 @@
+# This file is part of LiSE, a framework for life simulation games.
+# Copyright (c) Zachary Spector, public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+import asyncio
+import shutil
+import tempfile
+from functools import partial
+
+import pytest
+
+import LiSE.examples.kobold as kobold
+
+pytest.importorskip('websockets.asyncio.server')
+from LiSE.server.stream import LiSEStreamServer, connect
+from websockets.exceptions import InvalidStatus
+
+
+@pytest.fixture(scope='function')
+def tempdirs():
+    directories = [tempfile.mkdtemp(dir='.') for _ in range(2)]
+    yield directories
+    for directory in directories:
+        shutil.rmtree(directory)
+
+
+def test_stream_server(tempdirs):
+    async def main():
+        server = LiSEStreamServer(port=0)
+        for name, prefix in zip(('one', 'two'), tempdirs):
+            server.add_engine(
+                name, prefix, connect_string='sqlite:///:memory:',
+                random_seed=69105, setup=partial(
+                    kobold.inittest, shrubberies=5, kobold_sprint_chance=.9))
+        async with server:
+            uri = 'ws://127.0.0.1:{}/'.format(server.port)
+            with pytest.raises(InvalidStatus):
+                await connect(uri + 'three')
+            mover = await connect(uri + 'one')
+            watcher = await connect(uri + 'one')
+            bystander = await connect(uri + 'two')
+            watched = []
+            watcher.delta.connect(
+                lambda sender, **kwargs: watched.append(kwargs), weak=False)
+            bystanded = []
+            bystander.delta.connect(
+                lambda sender, **kwargs: bystanded.append(kwargs),
+                weak=False)
+            assert 'location' in await watcher.handle(
+                'node_stat_copy', node_or_char='physical', node='kobold')
+            ret, delta = await mover.handle('next_turn')
+            assert mover.turn == 1
+            results = await mover.batch([
+                {'command': 'get_watched_btt'},
+                {'command': 'set_universal', 'k': 'foo', 'v': 'bar',
+                 'silent': True},
+                {'command': 'get_universal', 'k': 'foo'},
+                {'command': 'no_such_command'},
+                {'command': 'close'}
+            ])
+            btt = results[0]
+            assert btt[:2] == ('trunk', 1)
+            assert results[1:3] == [None, 'bar']
+            assert isinstance(results[3], AttributeError)
+            assert isinstance(results[4], ValueError)
+            # the watcher's reply comes after the delta was sent to it
+            assert await watcher.handle('get_watched_btt') == (
+                'trunk', 1, mover.tick)
+            assert watched == [{
+                'command': 'next_turn', 'branch': 'trunk', 'turn': 1,
+                'tick': btt[2], 'delta': delta}]
+            assert watcher.turn == 1
+            assert not bystanded
+            assert (await bystander.handle('get_watched_btt'))[:2] == (
+                'trunk', 0)
+            for client in (mover, watcher, bystander):
+                await client.close()
+    asyncio.run(main())
+
+
+def test_stream_turn_interval(tempdirs):
+    async def main():
+        server = LiSEStreamServer(port=0, turn_interval=.1)
+        server.add_engine(
+            'kobold', tempdirs[0], connect_string='sqlite:///:memory:',
+            random_seed=69105, setup=partial(
+                kobold.inittest, shrubberies=5, kobold_sprint_chance=.9))
+        async with server:
+            client = await connect(
+                'ws://127.0.0.1:{}/kobold'.format(server.port))
+            turns = []
+            client.delta.connect(
+                lambda sender, **kwargs: turns.append(kwargs['turn']),
+                weak=False)
+            while len(turns) < 3:
+                await asyncio.sleep(.1)
+            assert turns == sorted(turns)
+            await client.close()
+    asyncio.run(main())
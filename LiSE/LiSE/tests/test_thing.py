@@ -14,6 +14,7 @@
 # You should have received a copy of the GNU Affero General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 from LiSE import Engine
+from LiSE.exc import TravelException
 import pytest
 import networkx as nx
 
@@ -70,3 +71,114 @@ def test_travel(engy):
     engy.turn = 14
     assert thing1.location == phys.place[7, 7]
     assert thing2.location == phys.place[0, 7]
+
+
+def test_path_cache(engy):
+    phys = engy.new_character('physical', data=nx.grid_2d_graph(5, 5))
+    for orig, dest in phys.edges:
+        phys.portal[orig][dest]['cost'] = 1
+    start = phys.place[0, 0]
+
+    def live_length():
+        return nx.shortest_path_length(phys, (0, 0), (4, 4), 'cost')
+
+    path = start.shortest_path((4, 4), 'cost')
+    assert len(path) == 9
+    assert start.shortest_path_length((4, 4), 'cost') == live_length() == 8
+    snap = engy._path_cache.snapshot('physical', 'cost')
+    engy.next_turn()
+    # nothing changed, so the same snapshot serves
+    assert engy._path_cache.snapshot('physical', 'cost') is snap
+    assert start.shortest_path((4, 4), 'cost') == path
+    for a, b in zip(path, path[1:]):
+        phys.portal[a][b]['cost'] = 10
+    newpath = start.shortest_path((4, 4), 'cost')
+    assert not set(zip(path, path[1:])).intersection(
+        zip(newpath, newpath[1:]))
+    assert start.shortest_path_length((4, 4), 'cost') == live_length() == 8
+    del phys.portal[newpath[0]][newpath[1]]
+    assert newpath[:2] != start.shortest_path((4, 4), 'cost')[:2]
+    assert start.shortest_path_length((4, 4), 'cost') == live_length()
+    engy.turn = 0
+    assert start.shortest_path((4, 4), 'cost') == path
+    engy.turn = 1
+    phys.new_place('island')
+    assert start.path_exists((4, 4))
+    with pytest.raises(nx.NetworkXNoPath):
+        start.shortest_path('island')
+
+
+def test_landmarks(engy):
+    phys = engy.new_character('physical', data=nx.grid_2d_graph(6, 6))
+    for orig, dest in phys.edges:
+        phys.portal[orig][dest]['cost'] = 2
+    phys.add_landmarks('cost', 3)
+    index = engy._path_cache._landmarks['physical', 'cost']
+    assert len(index.landmarks) == 3
+    start = phys.place[0, 0]
+
+    def check():
+        snap = engy._path_cache.snapshot('physical', 'cost')
+        for dest in [(5, 5), (0, 5), (3, 2)]:
+            length = nx.shortest_path_length(snap, (0, 0), dest, 'cost')
+            path = start.shortest_path(dest, 'cost')
+            assert start.shortest_path_length(dest, 'cost') == length
+            assert sum(snap[a][b]['cost']
+                       for (a, b) in zip(path, path[1:])) == length
+
+    check()
+    engy.next_turn()
+    # heavier portals leave the landmarks good enough
+    phys.portal[0, 0][1, 0]['cost'] = 5
+    check()
+    assert engy._path_cache._landmarks['physical', 'cost'] is index
+    # a shortcut makes them overestimate, unless repaired
+    phys.new_portal((0, 0), (5, 5), cost=1)
+    check()
+    assert start.shortest_path((5, 5), 'cost') == [(0, 0), (5, 5)]
+    thing = start.new_thing('traveler')
+    assert thing.travel_to((5, 5), 'cost') == 1
+    engy.turn = 0
+    check()
+    phys.del_landmarks('cost')
+    check()
+
+
+def test_follow_paths(engy):
+    phys = engy.new_character('physical', data=nx.grid_2d_graph(4, 4))
+    for orig, dest in phys.edges:
+        phys.portal[orig][dest]['cost'] = 2
+    one = phys.place[0, 0].new_thing('one')
+    two = phys.place[3, 0].new_thing('two')
+    three = phys.place[3, 3].new_thing('three')
+    with pytest.raises(TravelException):
+        phys.follow_paths([
+            (one, [(0, 0), (0, 1)], None),
+            ('two', [(3, 0), (1, 1)], None)
+        ])
+    with pytest.raises(ValueError):
+        phys.follow_paths([(one, [(0, 1), (0, 2)], None)])
+    assert engy.turn == 0
+    engy.turn = 1
+    assert one.location.name == (0, 0)
+    engy.turn = 0
+    assert phys.follow_paths([
+        (one, [(0, 0), (0, 1), (0, 2)], None),
+        ('two', [(3, 0), (2, 0), (1, 0)], 'cost'),
+        (three, [(3, 3), (3, 2)], 'cost')
+    ]) == {'one': 2, 'two': 4, 'three': 2}
+    assert engy.turn == 0
+    assert one.location.name == (0, 0)
+    for turn, locs in [
+        (1, [(0, 1), (3, 0), (3, 3)]),
+        (2, [(0, 2), (2, 0), (3, 2)]),
+        (4, [(0, 2), (1, 0), (3, 2)])
+    ]:
+        engy.turn = turn
+        assert [thing.location.name for thing in (one, two, three)] == locs
+    # each thing's travel is its own plan
+    engy.turn = 0
+    two.location = (3, 1)
+    engy.turn = 4
+    assert [thing.location.name for thing in (one, two, three)] == [
+        (0, 2), (3, 1), (3, 2)]
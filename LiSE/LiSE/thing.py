@@ -26,7 +26,6 @@ contained by Places, or possibly other Things.
 """
 import networkx as nx
 from .node import Node
-from .exc import TravelException
 from .allegedb import HistoryError
 
 
@@ -201,44 +200,8 @@ class Thing(Node):
         scheduled to be somewhere else.
 
         """
-        if len(path) < 2:
-            raise ValueError("Paths need at least 2 nodes")
-        eng = self.character.engine
-        turn_now, tick_now = eng.time
-        with eng.plan():
-            prevplace = path.pop(0)
-            if prevplace != self['location']:
-                raise ValueError("Path does not start at my present location")
-            subpath = [prevplace]
-            for place in path:
-                if (
-                        prevplace not in self.character.portal or
-                        place not in self.character.portal[prevplace]
-                ):
-                    raise TravelException(
-                        "Couldn't follow portal from {} to {}".format(
-                            prevplace,
-                            place
-                        ),
-                        path=subpath,
-                        traveller=self
-                    )
-                subpath.append(place)
-                prevplace = place
-            turns_total = 0
-            prevsubplace = subpath.pop(0)
-            subsubpath = [prevsubplace]
-            for subplace in subpath:
-                portal = self.character.portal[prevsubplace][subplace]
-                turn_inc = portal.get(weight, 1)
-                eng.turn += turn_inc
-                self.location = subplace
-                turns_total += turn_inc
-                subsubpath.append(subplace)
-                prevsubplace = subplace
-            self.location = subplace
-            eng.time = turn_now, tick_now
-        return turns_total
+        return self.character.follow_paths(
+            [(self, path, weight)])[self.name]
 
     def travel_to(self, dest, weight=None, graph=None):
         """Find the shortest path to the given :class:`Place` from where I am
@@ -264,6 +227,9 @@ class Thing(Node):
         destn = dest.name if hasattr(dest, 'name') else dest
         if destn == self.location.name:
             raise ValueError("I'm already at {}".format(destn))
-        graph = self.character if graph is None else graph
-        path = nx.shortest_path(graph, self["location"], destn, weight)
+        if graph is None:
+            path = self.engine._path_cache.shortest_path(
+                self.character.name, self["location"], destn, weight)
+        else:
+            path = nx.shortest_path(graph, self["location"], destn, weight)
         return self.follow_path(path, weight)
\ No newline at end of file
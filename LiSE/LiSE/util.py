@@ -78,8 +78,14 @@ class EntityStatAccessor(object):
         else:
             branc, trn, tck = self.engine._btt()
             self.engine.branch = branch or self.branch
-            self.engine.turn = turn or self.turn
-            self.engine.tick = tick or self.tick
+            if turn is None:
+                self.engine.turn = self.turn
+                self.engine.tick = self.tick if tick is None else tick
+            else:
+                # end of the turn, unless asked for a tick
+                self.engine.turn = turn
+                if tick is not None:
+                    self.engine.tick = tick
             res = self.entity[self.stat]
             self.engine.branch = branc
             self.engine.turn = trn
@@ -0,0 +1,318 @@
+# This file is part of LiSE, a framework for life simulation games.
+# Copyright (c) Zachary Spector, public@zacharyspector.com
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU Affero General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU Affero General Public License for more details.
+#
+# You should have received a copy of the GNU Affero General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""A compact form for deltas, to send them between processes
+
+Deltas from :meth:`LiSE.Engine.get_delta` repeat the same character,
+node, and stat names over and over. :class:`DeltaCodec` replaces every
+name with its index in a symbol table, which the encoding and decoding
+ends build up in step with one another, so each name only goes over the
+wire once per session. Whether nodes and portals exist is a bitset, and
+stat changes are flat columns of node, stat, and value.
+
+"""
+from array import array
+from itertools import chain
+
+WORLD_KEYS = frozenset({'eternal', 'universal', 'rules', 'rulebooks'})
+"""Keys of a delta that aren't characters"""
+_char_entity_keys = frozenset({
+    'nodes', 'node_val', 'edges', 'edge_val', 'avatars'})
+_bit_chars = bytes.maketrans(b'\x00\x01', b'01')
+# keys of the columns in an encoded character
+_STATS, _NODES, _AVATARS, _EDGES, _NODE_VAL, _EDGE_VAL = range(6)
+
+
+def _typecode(top):
+    """Return the typecode of the smallest array that fits ``top``"""
+    for typecode in 'BHI':
+        if top < 256 ** array(typecode).itemsize:
+            return typecode
+    return 'Q'
+
+
+def _ids(ids):
+    """Pack integers into bytes, each as small as the biggest allows
+
+    The first byte is the typecode of the :class:`array.array`.
+
+    """
+    ids = list(ids)
+    typecode = _typecode(max(ids, default=0))
+    return typecode.encode() + array(typecode, ids).tobytes()
+
+
+def _unids(b):
+    arr = array(chr(b[0]))
+    arr.frombytes(b[1:])
+    return arr
+
+
+def _bits(bools):
+    """Pack booleans into bytes, the first in the lowest bit"""
+    if not bools:
+        return b''
+    bits = bytes(map(bool, bools)).translate(_bit_chars)[::-1]
+    return int(bits, 2).to_bytes((len(bools) + 7) // 8, 'little')
+
+
+def _unbits(bits, n):
+    if not n:
+        return []
+    return [c == '1' for c in format(
+        int.from_bytes(bits, 'little'), '0{}b'.format(n))[::-1]]
+
+
+class DeltaCodec(object):
+    """Translate deltas to and from a compact, columnar form
+
+    Each end of a connection needs its own codec, and every delta
+    that one encodes must be decoded by the other, in the same order,
+    or their symbol tables will disagree. :meth:`decode` raises
+    ``ValueError`` when that happens.
+
+    The encoded deltas are made of lists, bytes, and the values in
+    the original delta, so you still need to pack them, with
+    :meth:`LiSE.Engine.pack` or the like.
+
+    Values that are strings or tuples, such as locations and the names
+    of rulebooks, go in the symbol table too.
+
+    """
+    def __init__(self):
+        self._symbols = []
+        self._ids = {}
+
+    def _intern_all(self, syms, new):
+        """Return a list of the symbols' IDs, assigning new ones as needed
+
+        Raise ``TypeError`` if some symbol is unhashable.
+
+        """
+        get = self._ids.get
+        # 1 == True, but they're different names, so only strings,
+        # by far the most common, are keyed by themselves
+        ret = [get(sym) if type(sym) is str else get((type(sym), sym))
+               for sym in syms]
+        if None not in ret:
+            return ret
+        ids = self._ids
+        symbols = self._symbols
+        for i, (sym, id_) in enumerate(zip(syms, ret)):
+            if id_ is None:
+                key = sym if type(sym) is str else (type(sym), sym)
+                if key not in ids:
+                    ids[key] = len(symbols)
+                    symbols.append(sym)
+                    new.append(sym)
+                ret[i] = ids[key]
+        return ret
+
+    def encode(self, delta):
+        """Return a compact version of ``delta``"""
+        base = len(self._symbols)
+        new = []
+        world = {}
+        chars = []
+        for k, v in delta.items():
+            if k in WORLD_KEYS:
+                world[k] = v
+            else:
+                chars.append((k, v))
+        names = self._intern_all([k for (k, v) in chars], new)
+        return [base, new, world, [
+            self._encode_char(name, chardelta, new)
+            for (name, (_, chardelta)) in zip(names, chars)
+        ]]
+
+    def _encode_vals(self, vals, new):
+        """Intern the values that are names, and leave the rest literal
+
+        Return a bitset of which are interned, their symbols, and the
+        literal values.
+
+        """
+        interned = [type(v) in (str, tuple) for v in vals]
+        names = [v for (v, is_sym) in zip(vals, interned) if is_sym]
+        try:
+            ids = self._intern_all(names, new)
+        except TypeError:  # a tuple with something unhashable
+            ids = []
+            for i, v in enumerate(vals):
+                if interned[i]:
+                    try:
+                        ids.extend(self._intern_all([v], new))
+                    except TypeError:
+                        interned[i] = False
+        return [_bits(interned), _ids(ids), [
+            v for (v, is_sym) in zip(vals, interned) if not is_sym]]
+
+    @staticmethod
+    def _decode_vals(n, encoded, symbols):
+        interned, ids, literals = encoded
+        ids = iter(_unids(ids))
+        literals = iter(literals)
+        return [symbols[next(ids)] if is_sym else next(literals)
+                for is_sym in _unbits(interned, n)]
+
+    def _encode_existence(self, outer, new):
+        """Flatten ``{a: {b: bool}}`` into runs of ``a``, ``b``, and a bitset"""
+        return [
+            _ids(self._intern_all(list(outer), new)),
+            _ids(map(len, outer.values())),
+            _ids(self._intern_all(
+                list(chain.from_iterable(outer.values())), new)),
+            _bits(list(chain.from_iterable(
+                bs.values() for bs in outer.values())))
+        ]
+
+    @staticmethod
+    def _decode_existence(encoded, symbols):
+        runs, lengths, inner, extant = encoded
+        inner = _unids(inner)
+        extant = _unbits(extant, len(inner))
+        ret = {}
+        i = 0
+        for a, n in zip(_unids(runs), _unids(lengths)):
+            ret[symbols[a]] = {
+                symbols[b]: ex for (b, ex) in zip(
+                    inner[i:i+n], extant[i:i+n])}
+            i += n
+        return ret
+
+    def _encode_char(self, char, delta, new):
+        """Return ``[char, columns]``, omitting the empty columns
+
+        ``columns`` is keyed by the ``_STATS``, ``_NODES``, etc.
+        constants at the top of this module.
+
+        """
+        intern_all = self._intern_all
+        encode_vals = self._encode_vals
+        encode_existence = self._encode_existence
+        columns = {}
+        stats = [k for k in delta if k not in _char_entity_keys]
+        if stats:
+            columns[_STATS] = [
+                _ids(intern_all(stats, new)),
+                encode_vals([delta[k] for k in stats], new)]
+        nodes = delta.get('nodes')
+        if nodes:
+            columns[_NODES] = [
+                _ids(intern_all(list(nodes), new)),
+                _bits(list(nodes.values()))]
+        for key, col in (('avatars', _AVATARS), ('edges', _EDGES)):
+            if delta.get(key):
+                columns[col] = encode_existence(delta[key], new)
+        node_val = delta.get('node_val')
+        if node_val:
+            columns[_NODE_VAL] = [
+                _ids(intern_all(list(node_val), new)),
+                _ids(map(len, node_val.values())),
+                _ids(intern_all(
+                    list(chain.from_iterable(node_val.values())), new)),
+                encode_vals(list(chain.from_iterable(
+                    vals.values() for vals in node_val.values())), new)]
+        edge_val = delta.get('edge_val')
+        if edge_val:
+            ev_dicts = [vals for dests in edge_val.values()
+                        for vals in dests.values()]
+            columns[_EDGE_VAL] = [
+                encode_existence({
+                    orig: dict.fromkeys(dests, True)
+                    for (orig, dests) in edge_val.items()}, new),
+                _ids(map(len, ev_dicts)),
+                _ids(intern_all(list(chain.from_iterable(ev_dicts)), new)),
+                encode_vals(list(chain.from_iterable(
+                    vals.values() for vals in ev_dicts)), new)]
+        return [char, columns]
+
+    def decode(self, encoded):
+        """Return the delta that ``encoded`` was made from"""
+        base, new, world, chars = encoded
+        symbols = self._symbols
+        if base != len(symbols):
+            raise ValueError(
+                "Expected a delta starting at symbol {}, got {}".format(
+                    len(symbols), base))
+        symbols.extend(new)
+        decode_vals = self._decode_vals
+        decode_existence = self._decode_existence
+        delta = dict(world)
+        for char, columns in chars:
+            chardelta = delta[symbols[char]] = {}
+            if _STATS in columns:
+                stat_keys, stat_vals = columns[_STATS]
+                stat_keys = _unids(stat_keys)
+                chardelta.update(zip(
+                    map(symbols.__getitem__, stat_keys),
+                    decode_vals(len(stat_keys), stat_vals, symbols)))
+            if _NODES in columns:
+                nodes, node_bits = columns[_NODES]
+                nodes = _unids(nodes)
+                chardelta['nodes'] = {
+                    symbols[node]: ex for (node, ex)
+                    in zip(nodes, _unbits(node_bits, len(nodes)))
+                }
+            if _AVATARS in columns:
+                chardelta['avatars'] = decode_existence(
+                    columns[_AVATARS], symbols)
+            if _EDGES in columns:
+                chardelta['edges'] = decode_existence(
+                    columns[_EDGES], symbols)
+            if _NODE_VAL in columns:
+                nv_nodes, nv_lengths, nv_keys, nv_vals = columns[_NODE_VAL]
+                nv_keys = _unids(nv_keys)
+                vals = decode_vals(len(nv_keys), nv_vals, symbols)
+                keys = list(map(symbols.__getitem__, nv_keys))
+                node_val = chardelta['node_val'] = {}
+                i = 0
+                for node, n in zip(_unids(nv_nodes), _unids(nv_lengths)):
+                    node_val[symbols[node]] = dict(zip(
+                        keys[i:i+n], vals[i:i+n]))
+                    i += n
+            if _EDGE_VAL in columns:
+                ev_ports, ev_lengths, ev_keys, ev_vals = columns[_EDGE_VAL]
+                ev_keys = _unids(ev_keys)
+                vals = decode_vals(len(ev_keys), ev_vals, symbols)
+                keys = list(map(symbols.__getitem__, ev_keys))
+                lengths = iter(_unids(ev_lengths))
+                edge_val = chardelta['edge_val'] = {}
+                i = 0
+                for orig, dests in decode_existence(
+                        ev_ports, symbols).items():
+                    ev = edge_val[orig] = {}
+                    for dest in dests:
+                        n = next(lengths)
+                        ev[dest] = dict(zip(keys[i:i+n], vals[i:i+n]))
+                        i += n
+        return delta
+
+
+class CompactDelta(object):
+    """A delta to be encoded with a :class:`DeltaCodec` when it's packed
+
+    Encoding when packing, rather than before, keeps the codec from
+    interning symbols in deltas that are never sent.
+
+    """
+    __slots__ = ('codec', 'delta')
+
+    def __init__(self, codec, delta):
+        self.codec = codec
+        self.delta = delta
+
+    def encode(self):
+        return self.codec.encode(self.delta)
@@ -20,7 +20,7 @@ from types import MethodType
 from inspect import getsource
 from ast import parse, Expr, Module
 import json
-import importlib
+import importlib.util
 import sys, os
 
 from blinker import Signal
@@ -145,16 +145,12 @@ class FunctionStore(Signal):
         super().__init__()
         self._filename = fullname = os.path.abspath(os.path.realpath(filename))
         path, filename = os.path.split(fullname)
-        modname = filename[:-3]
         if sys.path[0] != path:
             if path in sys.path:
                 sys.path.remove(path)
             sys.path.insert(0, path)
         try:
-            if modname in sys.modules:
-                self._module = sys.modules[modname]
-            else:
-                self._module = importlib.import_module(modname)
+            self._module = self._import()
             self._ast = parse(self._module.__loader__.get_data(fullname))
             self._ast_idx = {}
             for i, node in enumerate(self._ast.body):
@@ -166,6 +162,19 @@ class FunctionStore(Signal):
         self._need_save = False
         self._locl = {}
 
+    def _import(self):
+        """Load my module from my file
+
+        The module doesn't go in ``sys.modules``, so that engines in the
+        same process can each have their own.
+
+        """
+        spec = importlib.util.spec_from_file_location(
+            os.path.basename(self._filename)[:-3], self._filename)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        return module
+
     def __getattr__(self, k):
         if self._need_save:
             self.save()
@@ -211,12 +220,7 @@ class FunctionStore(Signal):
         with open(self._filename, 'w') as outf:
             Unparser(self._ast, outf)
         if reimport:
-            importlib.invalidate_caches()
-            path, filename = os.path.split(self._filename)
-            modname = filename[:-3]
-            if modname in sys.modules:
-                del sys.modules[modname]
-            self._module = importlib.import_module(filename[:-3])
+            self._module = self._import()
         self._need_save = False
 
     def iterplain(self):
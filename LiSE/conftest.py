@@ -0,0 +1,21 @@
+import pytest
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        '--runslow', action='store_true', default=False,
+        help='run the benchmarks and other slow tests')
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        'markers', 'slow: benchmark or other slow test, run with --runslow')
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption('--runslow', default=False):
+        return
+    skip_slow = pytest.mark.skip(reason='slow; use --runslow to run')
+    for item in items:
+        if 'slow' in item.keywords:
+            item.add_marker(skip_slow)
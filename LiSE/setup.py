@@ -47,6 +47,10 @@ setup(
         "blinker",
         "networkx==2.4"
     ],
+    extras_require={
+        "server": ["websockets>=13"],
+        "numpy": ["numpy"]
+    },
     project_urls={
         "Documentation": "https://logicaldash.github.io/LiSE"
     }